@@ -0,0 +1,57 @@
+"""
+benchmark of the time the websocket reader thread spends per message when
+the callback is slow
+
+compares running the callback inline with handing it to the executor of
+the subscription
+
+$ PYTHONPATH=. python benchmarks/callback_executor_benchmark.py
+"""
+
+
+import time
+
+from streamr.client.subscription import Subscription
+from streamr.protocol.payload import StreamMessage
+
+
+NUMBER = 200
+
+
+def slow_callback(content, msg):
+    """
+    callback doing 1 ms of work
+    :param content: parsed content
+    :param msg: StreamMessage
+    :return: None
+    """
+    time.sleep(0.001)
+
+
+def run(executor):
+    """
+    hand NUMBER messages to a subscription
+    :param executor: executor argument of the subscription
+    :return: seconds spent by the reader, seconds until every callback ran
+    """
+    sub = Subscription('stream_id', 0, 'api_key', slow_callback, executor=executor)
+    messages = [StreamMessage('stream_id', 0, 1529549961116, 0, i, i - 1 if i else None, 27, '{"i": %d}' % i)
+                for i in range(NUMBER)]
+    start = time.perf_counter()
+    for msg in messages:
+        sub.handle_message(msg)
+    read = time.perf_counter() - start
+    if sub.executor is not None:
+        sub.executor.shutdown()
+    return read, time.perf_counter() - start
+
+
+def main():
+    for executor in ('inline', 'thread'):
+        read, done = run(executor)
+        print('%-6s reader %.1f us/message, callbacks done after %.0f ms' % (
+            executor, read / NUMBER * 1e6, done * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+benchmark of keeping the message content as a slice of the frame
+
+compares decoding a large BroadcastMessage frame with and without
+Option.content_slice, both when the content is parsed and when the
+message is dropped before its content is used
+
+$ PYTHONPATH=. python benchmarks/content_slice_benchmark.py
+"""
+
+
+import json
+import timeit
+
+from streamr.protocol.response import Response
+
+
+CONTENT = json.dumps({'values': [{'id': i, 'name': 'sensor "%d"' % i, 'value': i * 0.5} for i in range(500)]})
+FRAME = json.dumps([0, 0, None, [28, 'TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116, 0,
+                                 941516902, 941499898, 27, CONTENT]])
+NUMBER = 2000
+
+
+def run(content_slice, parse):
+    """
+    decode the frame and optionally parse its content
+    :param content_slice: bool
+    :param parse: bool
+    :return: None
+    """
+    msg = Response.deserialize(FRAME, content_slice)
+    if parse:
+        msg.payload.get_parsed_content()
+
+
+if __name__ == '__main__':
+    print('frame size: %d bytes' % len(FRAME))
+    for parse in (False, True):
+        for content_slice in (False, True):
+            seconds = min(timeit.repeat(lambda: run(content_slice, parse), number=NUMBER, repeat=3))
+            print('content_slice=%-5s parse=%-5s %8.2f us/frame' % (
+                content_slice, parse, seconds / NUMBER * 1e6))
@@ -0,0 +1,62 @@
+"""
+benchmark of dispatching a decoded response to its handler
+
+compares emitting under the response name with the handler table
+indexed by response type that Connection uses
+
+$ PYTHONPATH=. python benchmarks/dispatch_benchmark.py
+"""
+
+
+import logging
+import timeit
+
+from streamr.client.event import Event
+from streamr.client.connection import Connection
+from streamr.util.option import Option
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.response import BroadcastMessage
+
+
+MSG = BroadcastMessage(StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, 27, '{}'))
+NUMBER = 200000
+
+
+def handler(_):
+    """
+    handler doing nothing
+    :param _: response
+    :return: None
+    """
+    pass
+
+
+event = Event()
+event.on('BroadcastMessage', handler)
+
+connection = Connection(Option(url='ws://127.0.0.1:1'))
+connection.on('BroadcastMessage', handler)
+
+
+def by_name():
+    """
+    dispatch as the connection did before, emitting under the response name
+    :return: None
+    """
+    event.emit(MSG.get_response_name(), MSG)
+    logging.info('get %s response' % (MSG.get_response_name()))
+
+
+def by_type():
+    """
+    dispatch through the handler table
+    :return: None
+    """
+    for h in connection.handlers_by_response_type[MSG.response_type]:
+        h(MSG)
+
+
+if __name__ == '__main__':
+    for name, func in (('by name', by_name), ('by type', by_type)):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print('%-8s %8.3f us/msg  %10.0f msgs/s' % (name, seconds / NUMBER * 1e6, NUMBER / seconds))
@@ -0,0 +1,63 @@
+"""
+benchmark of Event.emit
+
+compares the list based Event the client used before, which logged every
+emit, with the Event emitting tuples of listeners, for an event with one
+listener as emitted per message and for an event without listeners
+
+$ PYTHONPATH=. python benchmarks/event_emit_benchmark.py
+"""
+
+
+import logging
+import timeit
+from collections import defaultdict
+
+from streamr.client.event import Event
+
+
+NUMBER = 200000
+
+
+class ListEvent:
+    """
+    the list based Event, kept for comparison
+    """
+
+    def __init__(self):
+        self.eventList = defaultdict(list)
+        self.eventListOnce = defaultdict(list)
+
+    def on(self, eventname, callback):
+        if callback not in self.eventList[eventname]:
+            self.eventList[eventname].append(callback)
+
+    def emit(self, eventname, *args):
+        if eventname in self.eventList.keys():
+            list(map(lambda x: x(*args), self.eventList[eventname]))
+        if eventname in self.eventListOnce.keys():
+            list(map(lambda x: x(*args), self.eventListOnce[eventname]))
+            self.eventListOnce[eventname].clear()
+        logging.info('received eventname %s ' % eventname)
+
+
+def handler(_):
+    """
+    handler doing nothing
+    :param _: message
+    :return: None
+    """
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    for name, clazz in (('list', ListEvent), ('tuple', Event)):
+        event = clazz()
+        event.on('message', handler)
+        for eventname in ('message', 'no_listener'):
+            seconds = min(timeit.repeat(lambda: event.emit(eventname, None), number=NUMBER, repeat=3))
+            print('%-6s %-12s %.0f emits/s' % (name, eventname, NUMBER / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+benchmark of the memory held by buffered messages
+
+decodes signed frames of one stream and keeps the messages, as a
+subscription queue does, with and without interning the stream id and
+the publisher address
+
+$ PYTHONPATH=. python benchmarks/intern_memory_benchmark.py
+"""
+
+
+import json
+import tracemalloc
+
+from streamr.protocol.response import Response
+from streamr.protocol.util.intern import get_intern_table, MAX_INTERNED
+
+
+STREAM_ID = 'TsvTbqshTsuLg_HyUjxigA'
+ADDRESS = '0xf915ed664e43c50eb7b9ca7cfeb992703ede55c4'
+FRAMES = [json.dumps([0, 0, None, [29, STREAM_ID, 0, 1529549961116 + i, 0, i, i - 1, 27,
+                                   json.dumps({'t': 21.5, 'i': i}), 1, ADDRESS, '0x%064x' % i]])
+          for i in range(1, 20001)]
+
+
+def buffered_bytes():
+    """
+    decode every frame and measure the memory held by the messages
+    :return: bytes per message
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buffer = [Response.deserialize(frame).payload for frame in FRAMES]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(buffer)
+
+
+if __name__ == '__main__':
+    for name, size in (('no interning', 0), ('interned', MAX_INTERNED)):
+        get_intern_table().resize(size)
+        print('%-13s %8.1f bytes/message' % (name, buffered_bytes()))
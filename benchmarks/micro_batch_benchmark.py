@@ -0,0 +1,58 @@
+"""
+benchmark of delivering live messages one by one or grouped into batches
+
+compares a callback per message with a batch callback receiving groups of
+max_batch messages, both reading the parsed contents
+
+$ PYTHONPATH=. python benchmarks/micro_batch_benchmark.py
+"""
+
+
+import time
+
+from streamr.client.subscription import Subscription
+from streamr.protocol.payload import StreamMessage
+
+
+NUMBER = 20000
+
+
+def messages():
+    """
+    create the messages of a run
+    :return: list of StreamMessage
+    """
+    return [StreamMessage('stream_id', 0, 1529549961116, 0, i, i - 1 if i else None, 27, '{"i": %d}' % i)
+            for i in range(NUMBER)]
+
+
+def run(max_batch):
+    """
+    hand NUMBER messages to a subscription
+    :param max_batch: None for a callback per message
+    :return: seconds
+    """
+    received = []
+    if max_batch is None:
+        sub = Subscription('stream_id', 0, 'api_key', lambda content, msg: received.append(content))
+    else:
+        sub = Subscription('stream_id', 0, 'api_key', batch_callback=lambda batch: received.extend(
+            batch.parsed_contents()), max_batch=max_batch, max_delay_ms=1000)
+    msgs = messages()
+    start = time.perf_counter()
+    for msg in msgs:
+        sub.handle_message(msg)
+    sub.flush_pending()
+    seconds = time.perf_counter() - start
+    assert len(received) == NUMBER
+    return seconds
+
+
+def main():
+    for max_batch in (None, 10, 100, 1000):
+        seconds = run(max_batch)
+        print('max_batch %-5s %.2f us/message' % (max_batch, seconds / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+benchmark of offloading decoding and a cpu heavy callback to worker processes
+
+compares handling the frames in the client process with a ProcessOffload
+of 1, 2 and 4 processes. the scaling depends on the cores of the machine
+
+$ PYTHONPATH=. python benchmarks/process_offload_benchmark.py
+"""
+
+
+import json
+import os
+import time
+
+from streamr.client.offload import ProcessOffload
+from streamr.protocol.batch import MessageBatch
+from streamr.protocol.response import Response
+
+
+NUMBER = 4000
+FRAMES = [json.dumps([0, 0, None, [28, 'stream_id', 0, 1529549961116, 0, i, i - 1, 27,
+                                   json.dumps({'values': list(range(i % 50, i % 50 + 200))})]])
+          for i in range(1, NUMBER + 1)]
+
+
+def enrich(content, msg):
+    """
+    cpu heavy callback
+    :param content: parsed content
+    :param msg: StreamMessage
+    :return: int
+    """
+    total = 0
+    for value in content['values']:
+        total += value * value % 7
+    return total
+
+
+def run_inline():
+    """
+    decode and run the callback in this process
+    :return: list of results
+    """
+    results = []
+    for frame in FRAMES:
+        payload = Response.deserialize(frame).payload
+        results.append(enrich(payload.get_parsed_content(), payload))
+    return results
+
+
+def run_offload(processes):
+    """
+    ship the frames to worker processes
+    :param processes: int
+    :return: list of results
+    """
+    results = []
+    offload = ProcessOffload(enrich, processes, results.extend, batch_size=200)
+    offload.executor.submit(int).result()
+    messages = []
+    for frame in FRAMES:
+        payload = Response.deserialize(frame, True).payload
+        payload.raw_frame = frame
+        messages.append(payload)
+    start = time.perf_counter()
+    offload.submit(MessageBatch.from_messages(messages))
+    offload.shutdown()
+    return results, time.perf_counter() - start
+
+
+def main():
+    print('%d cores' % os.cpu_count())
+    start = time.perf_counter()
+    expected = run_inline()
+    seconds = time.perf_counter() - start
+    print('inline       %8.0f messages/s' % (NUMBER / seconds))
+    for processes in (1, 2, 4):
+        results, seconds = run_offload(processes)
+        assert results == expected
+        print('%d processes  %8.0f messages/s' % (processes, NUMBER / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+benchmark of serializing PublishRequest frames
+
+compares encoding the merged request dict with the cached per-stream
+serializer used by PublishRequest.serialize
+
+$ PYTHONPATH=. python benchmarks/publish_serialize_benchmark.py
+"""
+
+
+import timeit
+
+from streamr.protocol.request import PublishRequest
+from streamr.protocol.util.codec import get_codec
+
+
+REQUEST = PublishRequest('TsvTbqshTsuLg_HyUjxigA', '27ogvnHOQhGFQGETwjf1dAWFd2wXHbTlKCj_uEUTESXw',
+                         'sessionToken', {'temperature': 21.5, 'id': 'sensor-1'}, 1533924184016, 'sensor-1')
+NUMBER = 100000
+
+
+def generic():
+    """
+    encode the merged request dict
+    :return: str
+    """
+    return get_codec().dumps(REQUEST.to_object())
+
+
+def cached():
+    """
+    encode with the cached serializer of the stream
+    :return: str
+    """
+    return REQUEST.serialize()
+
+
+if __name__ == '__main__':
+    assert generic() == cached()
+    for name, func in (('to_object', generic), ('serializer', cached)):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print('%-10s %8.2f us/publish' % (name, seconds / NUMBER * 1e6))
@@ -0,0 +1,47 @@
+"""
+benchmark of decoding BroadcastMessage frames
+
+compares the generic Response path with the data frame fast path
+
+$ PYTHONPATH=. python benchmarks/response_decode_benchmark.py
+"""
+
+
+import json
+import timeit
+
+from streamr.protocol.response import Response
+from streamr.protocol.util.parser import jparser
+
+
+FRAME = json.dumps([0, 0, None, [28, 'TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116, 0,
+                                 941516902, 941499898, 27,
+                                 json.dumps({'temperature': 21.5, 'humidity': 40, 'id': 'sensor-1'})]])
+NUMBER = 100000
+
+
+def generic():
+    """
+    decode the frame through the generic class lookup path
+    :return: response object
+    """
+    version, response_type, sub_id, payload_msg = jparser(FRAME)
+    Response.check_version(version)
+    return Response.deserialize_payload(response_type, sub_id, payload_msg)
+
+
+def fast():
+    """
+    decode the frame through Response.deserialize
+    :return: response object
+    """
+    return Response.deserialize(FRAME)
+
+
+if __name__ == '__main__':
+    expected, decoded = generic(), fast()
+    decoded.payload.get_parsed_content()
+    assert expected == decoded
+    for name, func in (('generic', generic), ('fast path', fast)):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print('%-10s %8.2f us/frame  %10.0f frames/s' % (name, seconds / NUMBER * 1e6, NUMBER / seconds))
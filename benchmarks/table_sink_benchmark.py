@@ -0,0 +1,60 @@
+"""
+benchmark of accumulating flat contents as columns
+
+compares parsing every content to a dict in a callback and building the
+columns from the dicts, with passing the batches to a TableSink and
+flushing its columns
+
+$ PYTHONPATH=. python benchmarks/table_sink_benchmark.py
+"""
+
+
+import json
+import timeit
+
+import numpy as np
+
+from streamr.protocol.batch import MessageBatch
+from streamr.protocol.table import TableSink
+
+
+PAYLOADS = [[28, 'TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116 + i, 0, i, i - 1 if i else None, 27,
+             json.dumps({'temperature': i * 0.5, 'humidity': i % 100, 'on': i % 2 == 0, 'device': 'd%d' % (i % 8)})]
+            for i in range(10000)]
+NUMBER = 20
+
+
+def run_dicts():
+    """
+    parse every content to a dict and build the columns row by row
+    :return: dict of columns
+    """
+    batch = MessageBatch.from_payloads(PAYLOADS)
+    rows = [json.loads(content) for content in batch.contents]
+    columns = {'offset': np.array(batch.offsets, dtype=np.int64)}
+    for name in rows[0]:
+        columns[name] = [row.get(name) for row in rows]
+    columns['temperature'] = np.array(columns['temperature'], dtype=np.float64)
+    columns['humidity'] = np.array(columns['humidity'], dtype=np.float64)
+    return columns
+
+
+def run_sink():
+    """
+    accumulate the batch in a TableSink and flush it
+    :return: dict of columns
+    """
+    sink = TableSink()
+    sink.add_batch(MessageBatch.from_payloads(PAYLOADS))
+    return sink.to_columns()
+
+
+def main():
+    assert run_dicts()['temperature'].tolist() == run_sink()['temperature'].tolist()
+    for name, func in (('dicts', run_dicts), ('sink', run_sink)):
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print('%-6s %.2f us/message' % (name, seconds / NUMBER / len(PAYLOADS) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
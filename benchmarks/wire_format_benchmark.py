@@ -0,0 +1,41 @@
+"""
+benchmark of the json and msgpack wire formats
+
+compares the size of a BroadcastMessage frame and the time to decode it,
+including its content, in both formats
+
+$ PYTHONPATH=. python benchmarks/wire_format_benchmark.py
+"""
+
+
+import timeit
+
+from streamr.protocol.response import Response, BroadcastMessage
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.util.codec import get_codec, available_codecs
+
+
+CONTENT = {'temperature': 21.5, 'humidity': 40, 'id': 'sensor-1',
+           'readings': [i * 0.25 for i in range(32)]}
+MESSAGE = BroadcastMessage(StreamMessage('TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116, 0,
+                                         941516902, 941499898, StreamMessage.ContentType.JSON, CONTENT))
+NUMBER = 50000
+
+
+def decode(frame, codec):
+    """
+    decode the frame and its content
+    :param frame: str or bytes
+    :param codec: codec or None for json
+    :return: None
+    """
+    Response.deserialize(frame, codec=codec).payload.get_parsed_content()
+
+
+if __name__ == '__main__':
+    formats = [('json', None)] + [(name, get_codec(name)) for name in available_codecs(True)]
+    for name, codec in formats:
+        frame = MESSAGE.serialize(codec=codec)
+        size = len(frame.encode('utf-8')) if isinstance(frame, str) else len(frame)
+        seconds = min(timeit.repeat(lambda: decode(frame, codec), number=NUMBER, repeat=3))
+        print('%-8s %5d bytes/frame %8.2f us/frame' % (name, size, seconds / NUMBER * 1e6))
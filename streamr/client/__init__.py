@@ -1,8 +1,12 @@
 """
 client package
 
+buffer module: bounded message buffers and their overflow policies
 client module:  Client class
 connection module: Connection class
 event module: Event class
+executor module: executors running the subscription callbacks
+offload module: decoding messages and running a callback in worker processes
 subscription module: subscription class
+timer module: TimerService running delayed calls
 """
\ No newline at end of file
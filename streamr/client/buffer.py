@@ -0,0 +1,386 @@
+"""
+provide MessageBuffer, a queue bounded in messages or bytes with a policy
+applied when it is full
+
+a subscription buffers messages in two places: its queue, holding the
+live messages received during a resend or after a gap, and the queue of
+the thread created by subscribe(executor='thread'), holding the messages
+waiting for the callback. QueueLimit bounds either of them, and a
+BufferBudget shared by the buffers of a client bounds them all together.
+
+the policies applied when a buffer is full:
+  'block': the websocket thread waits for the callback thread, so the
+           server is slowed down by TCP backpressure. delivery queues only
+  'drop_oldest': the oldest buffered message is dropped
+  'drop_newest': the new message is dropped
+  'conflate': the buffered message with the key of the new message is
+              replaced, the oldest one is dropped when there is none
+  'spill': the new messages go to a temporary file until the buffer is
+           drained. subscription queues only
+
+a message dropped or conflated in a subscription queue leaves a gap which
+is resent when the queue is handled; in a delivery queue it is lost.
+"""
+
+
+import logging
+import pickle
+import tempfile
+import threading
+import time
+from collections import deque
+
+from streamr.protocol.batch import MessageBatch
+from streamr.protocol.payload import StreamMessage
+from streamr.util.constant import OverflowConstant
+
+
+__all__ = ['QueueLimit', 'BufferBudget', 'MessageBuffer', 'message_size']
+
+logger = logging.getLogger(__name__)
+
+
+# an entry conflated out of the buffer
+REMOVED = object()
+
+# a blocked put waits at most this long before checking the buffer again
+BLOCK_POLL = 0.05
+
+COUNTERS = ('overflows', 'dropped', 'conflated', 'spilled', 'blocked')
+
+
+def message_size(message):
+    """
+    approximate size of the content of a message, a batch or a response
+    :param message: StreamMessage, MessageBatch, Response or other
+    :return: int, 0 for other objects
+    """
+    if isinstance(message, StreamMessage):
+        return message.content_size()
+    if isinstance(getattr(message, 'payload', None), StreamMessage):
+        return message.payload.content_size()
+    if isinstance(message, MessageBatch):
+        return message.content_size()
+    return 0
+
+
+def _check_bound(name, value):
+    if value is not None and (not isinstance(value, int) or value <= 0):
+        raise ValueError('%s should be a positive int. Given : %s' % (name, value))
+
+
+class QueueLimit:
+    """
+    bound and overflow policy of a MessageBuffer
+    """
+
+    def __init__(self, max_messages=None, max_bytes=None, policy=None, conflate_key=None, spill_dir=None):
+        """
+        init function
+        :param max_messages: int, None for no bound on the number of messages
+        :param max_bytes: int, None for no bound on the size of the contents
+        :param policy: one of OverflowConstant.POLICIES, the default policy
+                       of the buffer when None
+        :param conflate_key: function(StreamMessage) returning the key of a
+                             message, required by the 'conflate' policy
+        :param spill_dir: directory of the 'spill' file, the system one when None
+        """
+        _check_bound('max_messages', max_messages)
+        _check_bound('max_bytes', max_bytes)
+        if policy is not None and policy not in OverflowConstant.POLICIES:
+            raise ValueError('policy should be one of %s. Given : %s' % (OverflowConstant.POLICIES, policy))
+        if policy == OverflowConstant.CONFLATE and not hasattr(conflate_key, '__call__'):
+            raise ValueError('conflate policy needs a conflate_key')
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.conflate_key = conflate_key
+        self.spill_dir = spill_dir
+
+
+class BufferBudget:
+    """
+    bound shared by the buffers of a client. a buffer over the budget
+    applies its policy, except 'block' which only waits for its own limit:
+    the memory of the other buffers may only be freed once the websocket
+    thread goes on
+    """
+
+    def __init__(self, max_messages=None, max_bytes=None):
+        """
+        init function
+        :param max_messages: int, None for no bound on the number of messages
+        :param max_bytes: int, None for no bound on the size of the contents
+        """
+        _check_bound('max_messages', max_messages)
+        _check_bound('max_bytes', max_bytes)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+
+    def fits(self, size):
+        """
+        whether a message of the given size can be buffered
+        :param size: int
+        :return: bool
+        """
+        return (self.max_messages is None or self.messages < self.max_messages) \
+            and (self.max_bytes is None or self.bytes + size <= self.max_bytes)
+
+    def add(self, count, size):
+        """
+        account for messages buffered, or taken out when negative
+        :param count: int
+        :param size: int
+        :return: None
+        """
+        with self.lock:
+            self.messages += count
+            self.bytes += size
+
+
+class MessageBuffer:
+    """
+    thread safe queue bounded by a QueueLimit and a BufferBudget.
+    the websocket thread puts, and the buffer is either drained at once or
+    consumed by a thread calling get
+    """
+
+    def __init__(self, limit=None, budget=None, name='buffer', default_policy=OverflowConstant.DROP_OLDEST,
+                 policies=OverflowConstant.POLICIES):
+        """
+        init function
+        :param limit: QueueLimit, None for no bound of its own
+        :param budget: BufferBudget shared with other buffers, or None
+        :param name: name of the buffer in the logs
+        :param default_policy: policy when the limit has none
+        :param policies: policies supported by the buffer
+        """
+        self.limit = limit if limit is not None else QueueLimit()
+        self.policy = self.limit.policy or default_policy
+        if self.policy not in policies:
+            raise ValueError('policy of %s should be one of %s. Given : %s' % (name, policies, self.policy))
+        self.budget = budget
+        self.name = name
+        self.bounded = self.limit.max_messages is not None or self.limit.max_bytes is not None \
+            or budget is not None
+        self.measure = self.limit.max_bytes is not None or (budget is not None and budget.max_bytes is not None)
+        self.conflate_key = self.limit.conflate_key if self.policy == OverflowConstant.CONFLATE else None
+        self.condition = threading.Condition()
+        # [item, size, key] entries in order, item is REMOVED once conflated
+        self.entries = deque()
+        self.entry_by_key = {}
+        self.count = 0
+        self.bytes = 0
+        # items put after the buffer started to spill, in order
+        self.spill_file = None
+        self.spill_count = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.blocked_seconds = 0.0
+        self.high_water = 0
+        self.last_overflow = None
+
+    def __len__(self):
+        return self.count + self.spill_count
+
+    def __iter__(self):
+        with self.condition:
+            items = [entry[0] for entry in self.entries if entry[0] is not REMOVED]
+            items.extend(self.__read_spill())
+        return iter(items)
+
+    def qsize(self):
+        """
+        return the number of buffered items
+        :return: int
+        """
+        return len(self)
+
+    def append(self, msg):
+        """
+        buffer a message
+        :param msg: StreamMessage
+        :return: None
+        """
+        self.put(msg)
+
+    def extend(self, messages):
+        """
+        buffer messages in order
+        :param messages: list of StreamMessage
+        :return: None
+        """
+        for msg in messages:
+            self.put(msg)
+
+    def put(self, item, message=None, force=False):
+        """
+        buffer an item, applying the policy when the buffer is full
+        :param item: object
+        :param message: StreamMessage or MessageBatch the item carries, the
+                        item itself when None. measured and conflated by key
+        :param force: buffer the item even when the buffer is full
+        :return: bool, False when the item was dropped
+        """
+        if not self.bounded:
+            with self.condition:
+                self.entries.append([item, 0, None])
+                self.count += 1
+                if self.count > self.high_water:
+                    self.high_water = self.count
+                self.condition.notify()
+            return True
+        if message is None:
+            message = item
+        size = message_size(message) if self.measure else 0
+        key = self.conflate_key(message) \
+            if self.conflate_key is not None and isinstance(message, StreamMessage) else None
+        with self.condition:
+            if force:
+                self.__push(item, size, None)
+                return True
+            if self.spill_file is not None and self.spill_count:
+                # once spilling, the items go to the file to keep their order
+                self.__spill(item)
+                return True
+            if self.__fits(size, True):
+                self.__push(item, size, key)
+                return True
+            return self.__overflow(item, size, key)
+
+    def get(self):
+        """
+        take the oldest item, waiting for one
+        :return: object
+        """
+        with self.condition:
+            while not self.count:
+                self.condition.wait()
+            item = self.__pop_left()
+            self.condition.notify_all()
+            return item
+
+    def drain(self):
+        """
+        take all the buffered items, the spilled ones included
+        :return: list
+        """
+        with self.condition:
+            items = [entry[0] for entry in self.entries if entry[0] is not REMOVED]
+            if self.budget is not None:
+                self.budget.add(-self.count, -self.bytes)
+            self.entries.clear()
+            self.entry_by_key.clear()
+            self.count = 0
+            self.bytes = 0
+            if self.spill_file is not None:
+                items.extend(self.__read_spill())
+                self.spill_file.close()
+                self.spill_file = None
+                self.spill_count = 0
+            self.condition.notify_all()
+        return items
+
+    def metrics(self):
+        """
+        return the state of the buffer and how often its policy was applied
+        :return: dict
+        """
+        with self.condition:
+            metrics = dict(self.counters)
+            metrics.update(policy=self.policy, messages=self.count, bytes=self.bytes,
+                           spilled_messages=self.spill_count, high_water=self.high_water,
+                           blocked_seconds=self.blocked_seconds, last_overflow=self.last_overflow)
+        return metrics
+
+    def __fits(self, size, use_budget):
+        limit = self.limit
+        if self.count and (limit.max_messages is not None and self.count >= limit.max_messages
+                           or limit.max_bytes is not None and self.bytes + size > limit.max_bytes):
+            return False
+        return not use_budget or self.budget is None or self.budget.fits(size)
+
+    def __push(self, item, size, key):
+        entry = [item, size, key]
+        self.entries.append(entry)
+        if key is not None:
+            self.entry_by_key[key] = entry
+        self.count += 1
+        self.bytes += size
+        if self.budget is not None:
+            self.budget.add(1, size)
+        if self.count > self.high_water:
+            self.high_water = self.count
+        # only get waits for an item: a put waits while the buffer is not empty
+        self.condition.notify()
+
+    def __release(self, entry):
+        self.count -= 1
+        self.bytes -= entry[1]
+        if self.budget is not None:
+            self.budget.add(-1, -entry[1])
+        key = entry[2]
+        if key is not None and self.entry_by_key.get(key, None) is entry:
+            del self.entry_by_key[key]
+
+    def __pop_left(self):
+        entry = self.entries.popleft()
+        while entry[0] is REMOVED:
+            entry = self.entries.popleft()
+        self.__release(entry)
+        return entry[0]
+
+    def __overflow(self, item, size, key):
+        self.counters['overflows'] += 1
+        self.last_overflow = time.time()
+        if self.counters['overflows'] == 1:
+            logger.warning('%s is full, applying the %s policy', self.name, self.policy)
+        policy = self.policy
+        if policy == OverflowConstant.BLOCK:
+            self.counters['blocked'] += 1
+            start = time.monotonic()
+            while not self.__fits(size, False):
+                self.condition.wait(BLOCK_POLL)
+            self.blocked_seconds += time.monotonic() - start
+            self.__push(item, size, None)
+            return True
+        if policy == OverflowConstant.SPILL:
+            self.__spill(item)
+            return True
+        if policy == OverflowConstant.DROP_NEWEST:
+            self.counters['dropped'] += 1
+            return False
+        if key is not None:
+            entry = self.entry_by_key.get(key, None)
+            if entry is not None:
+                self.__release(entry)
+                entry[0] = REMOVED
+                self.counters['conflated'] += 1
+        while self.count and not self.__fits(size, True):
+            self.__pop_left()
+            self.counters['dropped'] += 1
+        if not self.__fits(size, True):
+            # the budget is used up by the other buffers
+            self.counters['dropped'] += 1
+            return False
+        self.__push(item, size, key)
+        return True
+
+    def __spill(self, item):
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile(dir=self.limit.spill_dir)
+        pickle.dump(item, self.spill_file, pickle.HIGHEST_PROTOCOL)
+        self.spill_count += 1
+        self.counters['spilled'] += 1
+
+    def __read_spill(self):
+        if self.spill_file is None:
+            return []
+        items = []
+        self.spill_file.seek(0)
+        for _ in range(self.spill_count):
+            items.append(pickle.load(self.spill_file))
+        self.spill_file.seek(0, 2)
+        return items
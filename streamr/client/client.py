@@ -12,13 +12,23 @@ import threading
 from streamr.client.event import Event
 from streamr.client.connection import Connection
 from streamr.client.subscription import Subscription
+from streamr.client.history import MessageHistory
+from streamr.client.buffer import BufferBudget
+from streamr.client.executor import ShardedExecutor
 from streamr.util.option import Option
 from streamr.util.constant import EventConstant
 from streamr.client.errors.error import ConnectionErr
 from streamr.rest.session import get_session_token_by_api_key
 from streamr.rest.stream import creating, getting_by_name, getting_by_id
-from streamr.protocol.request import PublishRequest, ResendRequest, SubscribeRequest, UnsubscribeRequest
+from streamr.protocol.request import PublishRequest, ResendRequest, SubscribeRequest, UnsubscribeRequest, \
+    invalidate_publish_serializers
 from streamr.protocol.errors.error import InvalidJsonError
+from streamr.protocol.columnar import ColumnarMessages
+from streamr.protocol.batch import MessageBatch
+from streamr.protocol.response import UnicastMessage
+from streamr.protocol.schema import ContentSchema
+from streamr.protocol.util.codec import set_codec
+from streamr.protocol.util.content import ContentType
 
 __all___ = ['Client']
 
@@ -37,6 +47,11 @@ class Client(Event):
         self.subs_by_stream_id = defaultdict(list)
         self.sub_by_sub_id = {}
         self.publish_queue = []
+        self.content_schema_by_stream_id = {}
+        self.relay_sinks_by_stream_id = defaultdict(list)
+        self.relay_sub_by_stream_id = {}
+        # ids of the subscriptions using the received frames, raw or offloaded
+        self.raw_frame_sub_ids = set()
 
         if not isinstance(option, Option):
             raise ValueError('First parameter should be an Option object.')
@@ -46,6 +61,9 @@ class Client(Event):
         self.option.check_api()
         self.option.check_url()
 
+        if self.option.json_codec is not None:
+            set_codec(self.option.json_codec)
+
         self.session_thread = None
         self.session_token = None
         self.session_thread_lock = threading.Lock()
@@ -57,6 +75,35 @@ class Client(Event):
 
         self.connection = connection if connection is not None else Connection(self.option)
 
+        # bound of the messages buffered by all the subscriptions together
+        self.buffer_budget = BufferBudget(self.option.max_queued_messages, self.option.max_queued_bytes) \
+            if self.option.max_queued_messages or self.option.max_queued_bytes else None
+        # worker threads handling the data and control responses by stream partition
+        self.dispatcher = ShardedExecutor(self.option.dispatch_shards, self.option.dispatch_queue_size,
+                                          budget=self.buffer_budget) \
+            if self.option.dispatch_shards else None
+
+        def sharded(handler):
+            """
+            run a response handler on the worker of the stream partition of the response
+            :param handler: callback function of a response
+            :return: callback function
+            """
+            if self.dispatcher is None:
+                return handler
+
+            def run(msg):
+                # errors reach the ERROR listeners of the connection, as on the websocket thread
+                try:
+                    handler(msg)
+                except Exception as e:
+                    self.connection.emit(EventConstant.ERROR, e)
+
+            def dispatch(msg):
+                payload = msg.payload
+                self.dispatcher.submit((payload.stream_id, payload.stream_partition), run, msg)
+            return dispatch
+
         def broadcast_msg(msg):
             """
             callback function of broadcast response
@@ -70,7 +117,7 @@ class Client(Event):
             else:
                 logger.debug(
                     'WARN: message received for stream with no subscriptions: %s' % msg.stream_id)
-        self.connection.on('BroadcastMessage', broadcast_msg)
+        self.connection.on('BroadcastMessage', sharded(broadcast_msg))
 
         def unicast_msg(msg):
             """
@@ -83,7 +130,7 @@ class Client(Event):
             else:
                 logger.debug('WARN: subscription not found for stream: %s, sub: %s' % (
                     msg.stream_id, msg.sub_id))
-        self.connection.on('UnicastMessage', unicast_msg)
+        self.connection.on('UnicastMessage', sharded(unicast_msg))
 
         def subscribe_response(msg):
             """
@@ -97,7 +144,7 @@ class Client(Event):
                     if sub.resending is False:
                         sub.set_state(EventConstant.SUBSCRIBED)
             logger.debug('Client subscribed :%s' % msg.payload)
-        self.connection.on('SubscribeResponse', subscribe_response)
+        self.connection.on('SubscribeResponse', sharded(subscribe_response))
 
         def unsubscribe_response(msg):
             """
@@ -112,7 +159,7 @@ class Client(Event):
                     sub.set_state(EventConstant.UNSUBSCRIBED)
             self.__check_auto_disconnect()
             logger.debug('Client unsubscribed :%s' % msg.payload)
-        self.connection.on('UnsubscribeResponse', unsubscribe_response)
+        self.connection.on('UnsubscribeResponse', sharded(unsubscribe_response))
 
         def resend_response_resending(msg):
             """
@@ -125,7 +172,7 @@ class Client(Event):
             else:
                 logger.debug('resent: Subscription %s is gone already' %
                              msg.payload.sub_id)
-        self.connection.on('ResendResponseResending', resend_response_resending)
+        self.connection.on('ResendResponseResending', sharded(resend_response_resending))
 
         def resend_response_resent(msg):
             """
@@ -134,11 +181,12 @@ class Client(Event):
             :return: None
             """
             if self.sub_by_sub_id.get(msg.payload.sub_id, None) is not None:
+                self.__flush_resend_batch(self.sub_by_sub_id[msg.payload.sub_id])
                 self.sub_by_sub_id[msg.payload.sub_id].emit(EventConstant.RESENT, msg.payload)
             else:
                 logger.debug(
                     'resent: Subscription %s is gone already', msg.payload.sub_id)
-        self.connection.on('ResendResponseResent', resend_response_resent)
+        self.connection.on('ResendResponseResent', sharded(resend_response_resent))
 
         def resend_response_no_resend(msg):
             """
@@ -147,11 +195,12 @@ class Client(Event):
             :return: None
             """
             if self.sub_by_sub_id.get(msg.payload.sub_id, None) is not None:
+                self.__flush_resend_batch(self.sub_by_sub_id[msg.payload.sub_id])
                 self.sub_by_sub_id[msg.payload.sub_id].emit(EventConstant.NO_RESEND, msg.payload)
             else:
                 logger.debug('resent: Subscription %s is gone already' %
                              msg.payload.sub_id)
-        self.connection.on('ResendResponseNoResend', resend_response_no_resend)
+        self.connection.on('ResendResponseNoResend', sharded(resend_response_no_resend))
 
         def connected_listener():
             """
@@ -199,9 +248,53 @@ class Client(Event):
                 logger.error(err.with_traceback(err.__traceback__))
         self.connection.on(EventConstant.ERROR, error)
 
+        def stale_frame(response_type, sub_id, stream_id, _, offset, previous_offset):
+            """
+            frame filter dropping the data frames every subscription would ignore
+            :param response_type: BroadcastMessage.TYPE or UnicastMessage.TYPE
+            :param sub_id: str or None
+            :param stream_id: str
+            :param _: stream_partition
+            :param offset: int
+            :param previous_offset: int or None
+            :return: bool
+            """
+            if response_type == UnicastMessage.TYPE:
+                sub = self.sub_by_sub_id.get(sub_id, None)
+                return sub is not None and sub.is_duplicate(offset, previous_offset, True)
+            subs = self.subs_by_stream_id.get(stream_id, None)
+            if not subs:
+                return False
+            for sub in subs:
+                if not sub.is_duplicate(offset, previous_offset, False):
+                    return False
+            return True
+        if self.option.skip_duplicate_frames is True:
+            self.connection.frame_filter = stale_frame
+
+    def dispatch_queue_depths(self):
+        """
+        return the number of responses waiting on each dispatch worker
+        :return: list of int, empty when the responses are handled on the websocket thread
+        """
+        return self.dispatcher.queue_depths() if self.dispatcher is not None else []
+
+    def queue_metrics(self):
+        """
+        return the metrics of the bounded buffers: how many messages they
+        hold and how often their overflow policy was applied
+        :return: dict of 'subscriptions', sub_id to Subscription.queue_metrics,
+                 and 'dispatch', the metrics of each dispatch worker queue
+        """
+        return {'subscriptions': {sub_id: sub.queue_metrics() for sub_id, sub in list(self.sub_by_sub_id.items())},
+                'dispatch': self.dispatcher.metrics() if self.dispatcher is not None else []}
+
     def __auto_update_session_token(self):
         self.session_thread_lock.acquire()
+        old_session_token = self.session_token
         self.session_token = get_session_token_by_api_key(self.option.api_key)
+        if old_session_token is not None and old_session_token != self.session_token:
+            invalidate_publish_serializers(old_session_token)
         t = threading.Timer(self.option.session_token_refresh_interval, self.__auto_update_session_token)
         t.start()
         self.session_thread = t
@@ -214,6 +307,12 @@ class Client(Event):
     def __remove_subscription(self, sub):
         if sub.sub_id in self.sub_by_sub_id.keys():
             self.sub_by_sub_id.pop(sub.sub_id)
+        if sub.resend_batch_callback is not None or sub.batch_callback is not None:
+            self.connection.pop_payloads(sub.sub_id)
+        if sub.sub_id in self.raw_frame_sub_ids:
+            self.raw_frame_sub_ids.discard(sub.sub_id)
+            self.connection.keep_raw_frame = len(self.raw_frame_sub_ids) != 0
+        sub.close()
         subs = self.subs_by_stream_id.get(sub.stream_id, [])
         if len(subs) != 0:
             for i in sorted(range(len(subs)), reverse=True):
@@ -221,12 +320,14 @@ class Client(Event):
                     subs.pop(i)
             self.subs_by_stream_id[sub.stream_id] = subs
 
-    def publish(self, object_or_id, data, api_key=None):
+    def publish(self, object_or_id, data, api_key=None, content_type=ContentType.JSON):
         """
         publish function
         :param object_or_id: str contains streamId or a object contains a attribute of stream_id
         :param data: data need be published
         :param api_key: api_key
+        :param content_type: StreamMessage.ContentType, e.g. RAW for bytes or TEXT
+                             for a str that are sent without a json pass
         :return: None
         """
         if hasattr(object_or_id, 'stream_id'):
@@ -239,13 +340,13 @@ class Client(Event):
         if api_key is None:
             api_key = self.option.api_key
 
-        if not isinstance(data, (list, dict)):
+        if content_type == ContentType.JSON and not isinstance(data, (list, dict)):
             raise ValueError('data must be an dict or list ! Given: %s' % (type(data)))
 
         if self.is_connected() is True:
-            self.__request_publish(stream_id, data, api_key)
+            self.__request_publish(stream_id, data, api_key, content_type)
         elif self.option.auto_connect is True:
-            self.publish_queue.append([stream_id, data, api_key])
+            self.publish_queue.append([stream_id, data, api_key, content_type])
             try:
                 self.connect()
             except Exception as e:
@@ -269,12 +370,42 @@ class Client(Event):
             self.__auto_update_session_token()
         self.connection.connect()
 
-    def subscribe(self, stream, callback, legacy_option=None):
+    def subscribe(self, stream, callback, legacy_option=None, resend_batch_callback=None,
+                  typed_content=False, raw=False, batch_callback=None, history_size=0,
+                  history_bytes=None, executor=None, offload=None, max_batch=None, max_delay_ms=None,
+                  queue_limit=None, delivery_limit=None):
         """
         subscribe to stream with given id
         :param stream: object or dict contains stream_id and stream_partition
         :param callback: callback function when subscribed
         :param legacy_option: backward compatibility
+        :param resend_batch_callback: receives the messages of each resend at once,
+                                      as numpy columns (ColumnarMessages)
+        :param typed_content: decode the content into records following the
+                              field config of the stream, see get_content_schema
+        :param raw: call the callback with the received frame (str, or bytes of a
+                    binary frame) instead of the parsed content
+        :param batch_callback: receives the messages as MessageBatch instead of
+                               calling callback per message. resends arrive as one batch
+        :param history_size: number of recent messages kept to serve the resends
+                             of later local subscriptions to the stream, 0 keeps none
+        :param history_bytes: bound of the content size kept, None for no bound
+        :param executor: where the callbacks run: 'inline' on the websocket reader
+                         thread, 'thread' on a thread of the subscription, or a
+                         concurrent.futures.Executor or CallbackExecutor. the
+                         messages of a stream partition are delivered in order
+        :param offload: ProcessOffload decoding the new messages and running its
+                        callback in worker processes, instead of callback.
+                        it is shut down when the subscription is removed
+        :param max_batch: group the new messages into batches of up to max_batch
+                          messages for batch_callback
+        :param max_delay_ms: deliver a partial batch this long after its first
+                             message, 100 by default when max_batch is given
+        :param queue_limit: QueueLimit of the live messages queued during a resend,
+                            unbounded by default. its policy is 'drop_oldest' by
+                            default, 'block' is not supported
+        :param delivery_limit: QueueLimit of the messages waiting for the callback
+                               with executor='thread', 'block' by default
         :return: subscription
         """
         if hasattr(stream, 'stream_id'):
@@ -293,7 +424,21 @@ class Client(Event):
         else:
             opt = Option()
 
-        sub = Subscription(stream_id, opt.stream_partition or 0, self.option.api_key, callback, opt)
+        if resend_batch_callback is not None and not ColumnarMessages.is_available():
+            raise ImportError('numpy is required for resend_batch_callback')
+
+        content_schema = self.get_content_schema(stream_id) if typed_content else None
+        if offload is not None:
+            batch_callback = offload.submit
+
+        sub = Subscription(stream_id, opt.stream_partition or 0, self.option.api_key, callback, opt,
+                           resend_batch_callback, content_schema, raw, batch_callback,
+                           MessageHistory(history_size, history_bytes) if history_size else None,
+                           executor, max_batch, max_delay_ms, queue_limit, delivery_limit, self.buffer_budget,
+                           offload)
+        if raw is True or offload is not None:
+            self.raw_frame_sub_ids.add(sub.sub_id)
+            self.connection.keep_raw_frame = True
 
         def gap_handler(from_, to_):
             """
@@ -330,6 +475,48 @@ class Client(Event):
 
         return sub
 
+    def add_relay_sink(self, stream, sink):
+        """
+        forward the frames of a stream to a sink as they were received,
+        without parsing or serializing the messages again
+        :param stream: str or object with a stream_id, as for subscribe
+        :param sink: function called with (frame, stream_message)
+        :return: the subscription shared by the sinks of the stream
+        """
+        if not hasattr(sink, '__call__'):
+            raise ValueError('sink should be callable. Given : %s' % type(sink))
+        stream_id = stream.stream_id if hasattr(stream, 'stream_id') else stream
+        sinks = self.relay_sinks_by_stream_id[stream_id]
+        sinks.append(sink)
+        if stream_id not in self.relay_sub_by_stream_id:
+
+            def relay(frame, msg):
+                """
+                call every sink of the stream with the frame
+                :param frame: str or bytes
+                :param msg: StreamMessage
+                :return: None
+                """
+                for s in tuple(sinks):
+                    s(frame, msg)
+            self.relay_sub_by_stream_id[stream_id] = self.subscribe(stream_id, relay, raw=True)
+        return self.relay_sub_by_stream_id[stream_id]
+
+    def remove_relay_sink(self, stream_id, sink):
+        """
+        stop forwarding frames to a sink, the relay subscription is
+        unsubscribed with the last sink of the stream
+        :param stream_id: str
+        :param sink: function given to add_relay_sink
+        :return: None
+        """
+        sinks = self.relay_sinks_by_stream_id.get(stream_id, [])
+        if sink in sinks:
+            sinks.remove(sink)
+        if len(sinks) == 0 and stream_id in self.relay_sub_by_stream_id:
+            self.relay_sinks_by_stream_id.pop(stream_id, None)
+            self.unsubscribe(self.relay_sub_by_stream_id.pop(stream_id))
+
     def unsubscribe(self, sub):
         """
         unsubscribe stream
@@ -399,6 +586,9 @@ class Client(Event):
         disconnect from server
         :return: None
         """
+        # closes the subscriptions and drops the payloads of their pending resends
+        for sub in list(self.sub_by_sub_id.values()):
+            self.__remove_subscription(sub)
         self.subs_by_stream_id = defaultdict(list)
         self.sub_by_sub_id = {}
         self.connection.disconnect()
@@ -449,8 +639,26 @@ class Client(Event):
         self.connection.send(UnsubscribeRequest(
             stream_id, partition, api_key if api_key is not None else self.option.api_key, self.session_token))
 
+    def __local_history(self, sub):
+        for other in self.subs_by_stream_id.get(sub.stream_id, []):
+            if other is not sub and other.history is not None and len(other.history) != 0 \
+                    and other.stream_partition == sub.stream_partition:
+                return other.history
+        return None
+
     def __request_resend(self, sub, resend_option=None):
+        if resend_option is None:
+            history = self.__local_history(sub)
+            if history is not None:
+                messages, resend_option = history.split_resend(sub.get_effective_resend_option())
+                if resend_option is None:
+                    logger.debug('resend of sub %s served from local history' % sub.sub_id)
+                    sub.replay_history(messages)
+                    return
+                sub.queue.extend(messages)
         sub.set_resending(True)
+        if sub.resend_batch_callback is not None or sub.batch_callback is not None:
+            self.connection.collect_payloads(sub.sub_id)
         request = ResendRequest(sub.stream_id, sub.stream_partition, sub.sub_id,
                                 resend_option if isinstance(resend_option, Option)
                                 else sub.get_effective_resend_option(),
@@ -458,8 +666,16 @@ class Client(Event):
         logger.debug('__request_resend :%s' % request)
         self.connection.send(request)
 
-    def __request_publish(self, stream_id, data, api_key):
-        request = PublishRequest(stream_id, api_key, self.session_token, data)
+    def __flush_resend_batch(self, sub):
+        if sub.resend_batch_callback is not None:
+            payloads = self.connection.pop_payloads(sub.sub_id)
+            sub.handle_resend_batch(ColumnarMessages.from_payloads(payloads, sub.stream_id))
+        elif sub.batch_callback is not None:
+            payloads = self.connection.pop_payloads(sub.sub_id)
+            sub.handle_batch(MessageBatch.from_payloads(payloads, sub.stream_id), True)
+
+    def __request_publish(self, stream_id, data, api_key, content_type=ContentType.JSON):
+        request = PublishRequest(stream_id, api_key, self.session_token, data, content_type=content_type)
         logger.debug('__request_publish :%s' % request)
         self.connection.send(request)
 
@@ -498,6 +714,28 @@ class Client(Event):
         """
         return getting_by_id(stream_id, self.session_token)
 
+    def get_content_schema(self, stream_id):
+        """
+        fetch the field config of a stream once and compile it.
+        the session token is fetched first when there is none
+        :param stream_id: str
+        :return: ContentSchema or None if the stream has no field config
+        """
+        if stream_id not in self.content_schema_by_stream_id:
+            if self.session_token is None:
+                # the token is fetched lazily as connect does, a missing field config must not pass silently
+                if self.session_thread is None or self.session_thread.is_alive() is False:
+                    self.__auto_update_session_token()
+                if self.session_token is None:
+                    raise ConnectionErr('Get session token failed, the field config of stream: %s '
+                                        'cannot be fetched' % stream_id)
+            stream = self.get_stream_by_id(stream_id)
+            if stream is None:
+                logger.error('stream: %s could not be fetched, content is not typed' % stream_id)
+                return None
+            self.content_schema_by_stream_id[stream_id] = ContentSchema.from_stream(stream)
+        return self.content_schema_by_stream_id[stream_id]
+
     def get_or_create_stream(self, stream_name):
         """
         create stream or get a stream
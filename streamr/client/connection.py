@@ -5,19 +5,52 @@ this module provide the connection class
 
 from streamr.client.event import Event
 from streamr.util.option import Option
-from streamr.util.constant import EventConstant
-from streamr.protocol.response import Response
+from streamr.util.constant import EventConstant, WireConstant
+from streamr.protocol.response import Response, UnicastMessage, MESSAGE_RESPONSE_TYPES
+from streamr.protocol.util.parser import jparser
+from streamr.protocol.util.frame import peek_message_header
+from streamr.protocol.util.source import iter_frames, CHUNK_SIZE
+from streamr.protocol.util.codec import get_codec
 from streamr.client.errors.error import ConnectionErr
 from streamr.client.util.websock import MyWebSocket
 
+import functools
 import logging
 import threading
 
+from websocket._abnf import ABNF
 
-__all___ = ['Connection']
+
+__all___ = ['Connection', 'DecodeStats']
 
 logger = logging.getLogger(__name__)
 
+RESPONSE_TYPE_BY_NAME = {clazz.get_response_name(): response_type
+                         for response_type, clazz in enumerate(Response.response_classes)
+                         if clazz is not None}
+
+
+class DecodeStats:
+    """
+    counters of the frames received by a connection
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.peeked = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+
+    def to_object(self):
+        """
+        convert DecodeStats to dict
+        :return: dict
+        """
+        return {'received': self.received,
+                'peeked': self.peeked,
+                'skipped': self.skipped,
+                'skippedBytes': self.skipped_bytes}
+
 
 class Connection(Event):
     """
@@ -38,6 +71,30 @@ class Connection(Event):
         self.socket = socket if isinstance(socket, MyWebSocket) \
             else MyWebSocket(self.option.url)
 
+        # binary codec negotiated with the server, None for json text frames
+        self.wire_codec = None
+        if self.option.wire_format is not None and self.option.wire_format != WireConstant.JSON:
+            if not get_codec(self.option.wire_format).BINARY:
+                raise ValueError('wire_format should be a binary codec. Given : %s' % self.option.wire_format)
+            self.socket.subprotocols = [
+                WireConstant.SUBPROTOCOL_BY_WIRE_FORMAT[self.option.wire_format],
+                WireConstant.SUBPROTOCOL_BY_WIRE_FORMAT[WireConstant.JSON]]
+
+        # UnicastMessage payload lists collected per sub_id, see collect_payloads
+        self.payloads_by_sub_id = {}
+
+        # called with the peeked header of each data frame, the frame is
+        # dropped without being decoded when it returns True
+        self.frame_filter = None
+        self.decode_stats = DecodeStats()
+
+        # keep the received frame on the payload of each data message, see StreamMessage.raw_frame
+        self.keep_raw_frame = False
+
+        # handlers of the responses indexed by response type, kept in sync
+        # with the listeners registered under the response names
+        self.handlers_by_response_type = [()] * len(Response.response_classes)
+
         def socket_open_callback(_):
             """
             callback function of socket open event
@@ -45,6 +102,7 @@ class Connection(Event):
             :return: None
             """
             logger.debug('Connected to %s' % self.option.url)
+            self.wire_codec = self.__negotiated_codec()
             self.update_state(EventConstant.CONNECTED)
         self.socket.on_open = socket_open_callback
 
@@ -71,13 +129,38 @@ class Connection(Event):
             """
             callback function of socket message event
             :param _: websock object
-            :param orig_msg: message in json format
+            :param orig_msg: message in json format, or bytes of a binary frame
             :return:
             """
             try:
-                msg = Response.deserialize(orig_msg)
-                self.emit(msg.get_response_name(), msg)
-                logger.info('get %s response' % (msg.get_response_name()))
+                self.decode_stats.received += 1
+                header = None
+                if self.frame_filter is not None and isinstance(orig_msg, str):
+                    header = peek_message_header(orig_msg)
+                    if header is not None:
+                        self.decode_stats.peeked += 1
+                        if self.frame_filter(*header):
+                            self.decode_stats.skipped += 1
+                            self.decode_stats.skipped_bytes += len(orig_msg)
+                            return
+                codec = self.wire_codec if isinstance(orig_msg, bytes) else None
+                raw_frame = orig_msg
+                if self.payloads_by_sub_id:
+                    # only the frames of a collecting resend, or the ones the
+                    # header scanner does not understand, are decoded here
+                    if header is None and codec is None:
+                        header = peek_message_header(orig_msg)
+                    if header is None or header[0] == UnicastMessage.TYPE and header[1] in self.payloads_by_sub_id:
+                        frame = jparser(orig_msg, codec)
+                        if frame[1] == UnicastMessage.TYPE and frame[2] in self.payloads_by_sub_id:
+                            self.payloads_by_sub_id[frame[2]].append(frame[3])
+                            return
+                        orig_msg = frame
+                msg = Response.deserialize(orig_msg, self.option.content_slice, codec)
+                if self.keep_raw_frame and msg.response_type in MESSAGE_RESPONSE_TYPES:
+                    msg.payload.raw_frame = raw_frame
+                for handler in self.handlers_by_response_type[msg.response_type]:
+                    handler(msg)
             except Exception as e:
                 self.emit(EventConstant.ERROR, e)
         self.socket.on_message = socket_message_callback
@@ -95,6 +178,32 @@ class Connection(Event):
         if option.auto_connect is True:
             self.connect()
 
+    def __negotiated_codec(self):
+        sock = self.socket.sock
+        subprotocol = sock.getsubprotocol() if sock is not None else None
+        for wire_format, name in WireConstant.SUBPROTOCOL_BY_WIRE_FORMAT.items():
+            if subprotocol == name and wire_format != WireConstant.JSON:
+                logger.debug('Negotiated %s wire format' % wire_format)
+                return get_codec(wire_format)
+        return None
+
+    def _update_handlers(self, eventname):
+        # the listeners of a response name are also indexed by response type
+        # for dispatching received responses
+        super()._update_handlers(eventname)
+        response_type = RESPONSE_TYPE_BY_NAME.get(eventname, None)
+        if response_type is None:
+            return
+        handlers = self.handlers_by_event[eventname]
+        if self.once_listeners_by_event.get(eventname, None):
+            handlers += (functools.partial(self.__emit_once, eventname),)
+        self.handlers_by_response_type[response_type] = handlers
+
+    def __emit_once(self, eventname, msg):
+        callbacks = self._pop_once_listeners(eventname)
+        for callback in callbacks or ():
+            callback(msg)
+
     def update_state(self, state):
         """
         update the state of connection
@@ -148,6 +257,38 @@ class Connection(Event):
         self.update_state(EventConstant.DISCONNECTING)
         self.socket.close()
 
+    def collect_payloads(self, sub_id):
+        """
+        keep the payload lists of the UnicastMessages of a subscription
+        instead of emitting them one by one
+        :param sub_id: str
+        :return: None
+        """
+        self.payloads_by_sub_id[sub_id] = []
+
+    def pop_payloads(self, sub_id):
+        """
+        stop collecting the UnicastMessages of a subscription
+        :param sub_id: str
+        :return: list of payload lists collected since collect_payloads
+        """
+        return self.payloads_by_sub_id.pop(sub_id, [])
+
+    def replay(self, source, chunk_size=CHUNK_SIZE):
+        """
+        feed the frames of a capture to the handlers of the connection, as if
+        they were received from the socket. the capture is read incrementally
+        :param source: file-like object, socket-like object or iterable of
+                       chunks holding json frames, see iter_frames
+        :param chunk_size: number of characters or bytes read at once
+        :return: number of frames replayed
+        """
+        count = 0
+        for frame in iter_frames(source, chunk_size):
+            self.socket.on_message(self.socket, frame)
+            count += 1
+        return count
+
     def send(self, request):
         """
         send request to server by websocket
@@ -155,6 +296,9 @@ class Connection(Event):
         :return:
         """
         try:
-            self.socket.send(request.serialize())
+            if self.wire_codec is not None:
+                self.socket.send(request.serialize(self.wire_codec), ABNF.OPCODE_BINARY)
+            else:
+                self.socket.send(request.serialize())
         except Exception as e:
             self.emit(EventConstant.ERROR, e)
@@ -1,10 +1,18 @@
 """
 Event class
+
+the listeners of an event are kept in an OrderedDict keyed by callback, so
+on and off do not scan a list and the listeners are called in registration
+order, which plain dicts only keep from python 3.7. emit calls an immutable
+tuple of the listeners. on, off and once replace the tuple while holding a
+lock, so emit only reads it and may run on another thread; a listener added
+or removed during an emit takes effect from the next emit.
 """
 
 
-from collections import defaultdict
 import logging
+import threading
+from collections import OrderedDict
 
 
 class Event:
@@ -13,8 +21,13 @@ class Event:
     """
 
     def __init__(self):
-        self.eventList = defaultdict(list)
-        self.eventListOnce = defaultdict(list)
+        # listeners by event name, OrderedDicts keyed by callback
+        self.listeners_by_event = {}
+        self.once_listeners_by_event = {}
+        # tuples of listeners emitted, replaced when the listeners of the event change
+        self.handlers_by_event = {}
+        # held while the listeners change, emit does not take it
+        self.listeners_lock = threading.Lock()
 
     def on(self, eventname, callback):
         """
@@ -23,10 +36,13 @@ class Event:
         :param callback: callback func
         :return: None
         """
-        if callback in self.eventList[eventname]:
-            logging.warning('Event %s has been added' % callback)
-        else:
-            self.eventList[eventname].append(callback)
+        with self.listeners_lock:
+            listeners = self.listeners_by_event.setdefault(eventname, OrderedDict())
+            if callback in listeners:
+                logging.warning('Event %s has been added', callback)
+                return
+            listeners[callback] = callback
+            self._update_handlers(eventname)
 
     def off(self, eventname, callback):
         """
@@ -35,11 +51,25 @@ class Event:
         :param callback:  callback func
         :return:  None
         """
-        if callback in self.eventList[eventname]:
-            self.eventList[eventname].remove(callback)
-        else:
-            logging.warning('Event: %s has no callback function: %s' %
-                            (eventname, callback))
+        with self.listeners_lock:
+            listeners = self.listeners_by_event.get(eventname, None)
+            if listeners is None or callback not in listeners:
+                logging.warning('Event: %s has no callback function: %s', eventname, callback)
+                return
+            del listeners[callback]
+            self._update_handlers(eventname)
+
+    def _update_handlers(self, eventname):
+        # called with listeners_lock held
+        self.handlers_by_event[eventname] = tuple(self.listeners_by_event.get(eventname, ()))
+
+    def handlers(self, eventname):
+        """
+        return the listeners of an event, without the once listeners
+        :param eventname: str
+        :return: tuple of callback func
+        """
+        return self.handlers_by_event.get(eventname, ())
 
     def emit(self, eventname, *args):
         """
@@ -48,12 +78,20 @@ class Event:
         :param args: args of callback func
         :return:
         """
-        if eventname in self.eventList.keys():
-            list(map(lambda x: x(*args), self.eventList[eventname]))
-        if eventname in self.eventListOnce.keys():
-            list(map(lambda x: x(*args), self.eventListOnce[eventname]))
-            self.eventListOnce[eventname].clear()
-        logging.info('received eventname %s ' % eventname)
+        handlers = self.handlers_by_event.get(eventname, ())
+        once = self._pop_once_listeners(eventname) if self.once_listeners_by_event else None
+        for handler in handlers:
+            handler(*args)
+        if once is not None:
+            for handler in once:
+                handler(*args)
+
+    def _pop_once_listeners(self, eventname):
+        with self.listeners_lock:
+            once = self.once_listeners_by_event.pop(eventname, None)
+            if once is not None:
+                self._update_handlers(eventname)
+        return once
 
     def once(self, eventname, callback):
         """
@@ -62,8 +100,10 @@ class Event:
         :param callback: callback function
         :return: None
         """
-        if callback in self.eventListOnce[eventname]:
-            logging.warning(
-                'Event %s has been added in list_once' % callback)
-        else:
-            self.eventListOnce[eventname].append(callback)
+        with self.listeners_lock:
+            listeners = self.once_listeners_by_event.setdefault(eventname, OrderedDict())
+            if callback in listeners:
+                logging.warning('Event %s has been added in list_once', callback)
+                return
+            listeners[callback] = callback
+            self._update_handlers(eventname)
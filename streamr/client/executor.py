@@ -0,0 +1,275 @@
+"""
+provide the executors running subscription callbacks off the websocket
+reader thread
+
+the reader thread keeps decoding frames and checking duplicates and gaps,
+and hands the content parsing and the callback of each delivered message
+to the executor of its subscription. every executor runs the tasks of one
+key, a (stream_id, stream_partition) pair, in submission order.
+
+subscribe(executor=...) accepts
+  'inline' or None: the callback runs on the reader thread
+  'thread': a dedicated thread for the subscription, its queue may be
+            bounded by a QueueLimit, see streamr.client.buffer
+  a concurrent.futures.Executor: shared pool, see OrderedPoolExecutor
+  a CallbackExecutor instance, which may be shared by subscriptions
+"""
+
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from streamr.client.buffer import MessageBuffer, QueueLimit
+from streamr.protocol.errors.error import AbstractFunctionError
+from streamr.util.constant import OverflowConstant
+
+
+__all__ = ['CallbackExecutor', 'ThreadExecutor', 'OrderedPoolExecutor', 'ShardedExecutor', 'get_executor']
+
+logger = logging.getLogger(__name__)
+
+# the tasks hold callbacks, they cannot be spilled to a file
+DELIVERY_POLICIES = tuple(policy for policy in OverflowConstant.POLICIES if policy != OverflowConstant.SPILL)
+
+
+def run_task(key, fn, args):
+    """
+    run a task, logging the error it raises instead of stopping the worker
+    :param key: key of the task
+    :param fn: function
+    :param args: tuple
+    :return: None
+    """
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception('Callback for %s failed' % (key,))
+
+
+class CallbackExecutor:
+    """
+    base class of the executors
+    """
+
+    def submit(self, key, fn, *args):
+        """
+        run fn(*args) after the tasks submitted before with the same key
+        :param key: hashable, (stream_id, stream_partition)
+        :param fn: function
+        :param args: args of fn
+        :return: None
+        """
+        raise AbstractFunctionError(type(self))
+
+    def shutdown(self, wait=True):
+        """
+        stop once the submitted tasks are done
+        :param wait: wait for the submitted tasks
+        :return: None
+        """
+
+
+class ThreadExecutor(CallbackExecutor):
+    """
+    runs the tasks on one dedicated thread
+    """
+
+    STOP = object()
+
+    def __init__(self, name=None, max_queue=0, limit=None, budget=None):
+        """
+        init function
+        :param name: name of the thread
+        :param max_queue: bound of the waiting tasks, submit waits when it is
+                          reached. 0 for no bound
+        :param limit: QueueLimit of the waiting tasks instead of max_queue,
+                      measuring the message or batch each task delivers.
+                      its policy is 'block' by default, 'spill' is not supported
+        :param budget: BufferBudget shared with other buffers, or None
+        """
+        if limit is None and max_queue:
+            limit = QueueLimit(max_messages=max_queue)
+        self.tasks = MessageBuffer(limit, budget, 'queue of thread %s' % name, OverflowConstant.BLOCK,
+                                   DELIVERY_POLICIES)
+        self.thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self.thread.start()
+
+    def __run(self):
+        while True:
+            task = self.tasks.get()
+            if task is self.STOP:
+                return
+            run_task(*task)
+
+    def submit(self, key, fn, *args):
+        self.tasks.put((key, fn, args), args[0] if args else None)
+
+    def qsize(self):
+        """
+        return the number of tasks waiting
+        :return: int
+        """
+        return self.tasks.qsize()
+
+    def metrics(self):
+        """
+        return the metrics of the queue of the waiting tasks
+        :return: dict, see MessageBuffer.metrics
+        """
+        return self.tasks.metrics()
+
+    def shutdown(self, wait=True):
+        self.tasks.put(self.STOP, force=True)
+        if wait and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class OrderedPoolExecutor(CallbackExecutor):
+    """
+    runs the tasks on a thread pool. different keys run in parallel, the
+    tasks of one key run one at a time in submission order
+    """
+
+    # tasks a worker runs for a key before letting other keys have the worker
+    MAX_TASKS_PER_TURN = 64
+
+    def __init__(self, max_workers=None, executor=None):
+        """
+        init function
+        :param max_workers: size of the thread pool created when executor is None
+        :param executor: concurrent.futures.Executor running the tasks
+        """
+        self.owns_executor = executor is None
+        self.executor = ThreadPoolExecutor(max_workers) if executor is None else executor
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        # waiting tasks by key, a key is present while a worker has its turn
+        self.tasks_by_key = {}
+
+    def submit(self, key, fn, *args):
+        with self.lock:
+            tasks = self.tasks_by_key.get(key, None)
+            if tasks is not None:
+                tasks.append((fn, args))
+                return
+            self.tasks_by_key[key] = deque([(fn, args)])
+        self.executor.submit(self.__run_key, key)
+
+    def __run_key(self, key):
+        for _ in range(self.MAX_TASKS_PER_TURN):
+            with self.lock:
+                tasks = self.tasks_by_key[key]
+                if not tasks:
+                    self.__end_turn(key)
+                    return
+                fn, args = tasks.popleft()
+            run_task(key, fn, args)
+        with self.lock:
+            if not self.tasks_by_key[key]:
+                self.__end_turn(key)
+                return
+        self.executor.submit(self.__run_key, key)
+
+    def __end_turn(self, key):
+        del self.tasks_by_key[key]
+        if not self.tasks_by_key:
+            self.idle.notify_all()
+
+    def qsize(self):
+        """
+        return the number of tasks waiting
+        :return: int
+        """
+        with self.lock:
+            return sum(len(tasks) for tasks in self.tasks_by_key.values())
+
+    def shutdown(self, wait=True):
+        if wait:
+            with self.lock:
+                self.idle.wait_for(lambda: not self.tasks_by_key)
+        if self.owns_executor:
+            self.executor.shutdown(wait)
+
+
+class ShardedExecutor(CallbackExecutor):
+    """
+    runs the tasks on a fixed number of threads, each key always on the
+    same thread, so the tasks of a key run in order and keys of different
+    threads run in parallel. each thread has its own bounded queue
+    """
+
+    def __init__(self, shards, max_queue=1000, name='streamr-shard', budget=None):
+        """
+        init function
+        :param shards: number of threads
+        :param max_queue: bound of the queue of each thread, submit waits when it is reached
+        :param name: prefix of the thread names
+        :param budget: BufferBudget counting the queued tasks with the other buffers, or None
+        """
+        if not isinstance(shards, int) or shards <= 0:
+            raise ValueError('shards should be a positive int. Given : %s' % shards)
+        self.shards = [ThreadExecutor('%s-%d' % (name, i), max_queue, budget=budget) for i in range(shards)]
+
+    def shard(self, key):
+        """
+        return the thread running the tasks of a key
+        :param key: hashable
+        :return: ThreadExecutor
+        """
+        return self.shards[hash(key) % len(self.shards)]
+
+    def submit(self, key, fn, *args):
+        self.shards[hash(key) % len(self.shards)].submit(key, fn, *args)
+
+    def queue_depths(self):
+        """
+        return the number of tasks waiting on each thread
+        :return: list of int
+        """
+        return [shard.qsize() for shard in self.shards]
+
+    def qsize(self):
+        """
+        return the number of tasks waiting
+        :return: int
+        """
+        return sum(self.queue_depths())
+
+    def metrics(self):
+        """
+        return the metrics of the queue of each thread
+        :return: list of dict, see MessageBuffer.metrics
+        """
+        return [shard.metrics() for shard in self.shards]
+
+    def shutdown(self, wait=True):
+        for shard in self.shards:
+            shard.shutdown(False)
+        if wait:
+            for shard in self.shards:
+                if shard.thread is not threading.current_thread():
+                    shard.thread.join()
+
+
+def get_executor(executor, limit=None, budget=None):
+    """
+    resolve the executor argument of subscribe
+    :param executor: None, 'inline', 'thread', concurrent.futures.Executor or CallbackExecutor
+    :param limit: QueueLimit of the queue of a 'thread' executor
+    :param budget: BufferBudget of the queue of a 'thread' executor
+    :return: (CallbackExecutor or None for inline, whether the subscription owns it)
+    """
+    if limit is not None and executor != 'thread':
+        raise ValueError('delivery_limit needs executor="thread". Given : %s' % executor)
+    if executor is None or executor == 'inline':
+        return None, False
+    if executor == 'thread':
+        return ThreadExecutor(limit=limit, budget=budget), True
+    if isinstance(executor, CallbackExecutor):
+        return executor, False
+    if isinstance(executor, Executor):
+        return OrderedPoolExecutor(executor=executor), False
+    raise ValueError('executor should be "inline", "thread", a concurrent.futures.Executor '
+                     'or a CallbackExecutor. Given : %s' % executor)
@@ -0,0 +1,103 @@
+"""
+provide the history kept by a subscription for local replay
+
+a subscription created with a history keeps its most recent messages in a
+ring buffer bounded by message count and content bytes. a new local
+subscription to the same stream partition asking for a resend is served
+from that buffer, and only the part the buffer does not cover is asked
+from the server.
+"""
+
+
+from collections import deque
+
+from streamr.util.option import Option
+
+
+__all__ = ['MessageHistory']
+
+
+class MessageHistory:
+    """
+    ring buffer of the last messages delivered to a subscription
+    """
+
+    def __init__(self, max_messages, max_bytes=None):
+        """
+        init function
+        :param max_messages: number of messages kept
+        :param max_bytes: total content size kept, None for no limit
+        """
+        if not isinstance(max_messages, int) or max_messages <= 0:
+            raise ValueError('max_messages should be a positive int. Given : %s' % max_messages)
+        if max_bytes is not None and (not isinstance(max_bytes, int) or max_bytes <= 0):
+            raise ValueError('max_bytes should be a positive int. Given : %s' % max_bytes)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.messages = deque()
+        self.sizes = deque()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, msg):
+        """
+        keep a delivered message, dropping the oldest ones over the bounds
+        :param msg: StreamMessage
+        :return: None
+        """
+        size = msg.content_size()
+        self.messages.append(msg)
+        self.sizes.append(size)
+        self.bytes += size
+        while len(self.messages) > self.max_messages or \
+                (self.max_bytes is not None and self.bytes > self.max_bytes and len(self.messages) > 1):
+            self.messages.popleft()
+            self.bytes -= self.sizes.popleft()
+
+    def extend(self, messages):
+        """
+        keep delivered messages
+        :param messages: list of StreamMessage
+        :return: None
+        """
+        for msg in messages:
+            self.append(msg)
+
+    def split_resend(self, option):
+        """
+        split a resend between the buffer and the server
+        :param option: Option with the resend fields of a subscription
+        :return: (messages served from the buffer, Option of the resend still
+                  needed from the server or None when the buffer covers it)
+        """
+        if len(self.messages) == 0 or option.resend_to is not None:
+            return [], option
+        first = self.messages[0]
+
+        if option.resend_last is not None:
+            if option.resend_last <= len(self.messages):
+                return list(self.messages)[len(self.messages) - option.resend_last:], None
+            return [], option
+
+        if option.resend_from is not None:
+            messages = [msg for msg in self.messages if msg.offset >= option.resend_from]
+            if first.offset <= option.resend_from or \
+                    (first.previous_offset is not None and first.previous_offset < option.resend_from):
+                return messages, None
+            if first.previous_offset is None:
+                return [], option
+            return messages, Option(resend_from=option.resend_from, resend_to=first.previous_offset)
+
+        if option.resend_from_time is not None:
+            if first.timestamp < option.resend_from_time:
+                return [msg for msg in self.messages if msg.timestamp >= option.resend_from_time], None
+            return [], option
+
+        if option.resend_all:
+            if first.previous_offset is None:
+                return list(self.messages), None
+            return list(self.messages), Option(resend_from=0, resend_to=first.previous_offset)
+
+        return [], option
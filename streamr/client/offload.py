@@ -0,0 +1,243 @@
+"""
+provide ProcessOffload, decoding data frames and running a callback in a
+pool of worker processes
+
+a subscription created with an offload keeps its duplicate and gap
+bookkeeping in the client process, which only splits the frames with the
+header scanner when Option(content_slice=True) is used. the frames of the
+new messages are gathered into batches, copied into a shared memory block
+and the worker processes get the name of the block, the frame lengths and
+the bounds of the contents in the frames, so the client process never
+unescapes a content. a worker decodes the frames, parses the contents and
+calls the callback, and the values the callback returns come back to the
+client process, where they are passed to result_callback in the order of
+the batches. the subscription shuts the offload down when it is closed.
+
+the callback is sent to the workers once when they start, so it has to be
+picklable, e.g. a module level function. callbacks of different batches
+run in parallel, the messages of a batch are handled in order.
+
+shared memory blocks need python 3.8 or later.
+"""
+
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    resource_tracker = shared_memory = None
+
+from streamr.protocol.response import Response, UnicastMessage
+from streamr.protocol.util.codec import get_codec
+
+
+__all__ = ['ProcessOffload']
+
+logger = logging.getLogger(__name__)
+
+
+# how a frame is stored in the shared memory block
+TEXT_FRAME = 0
+BINARY_FRAME = 1
+
+_worker_callback = None
+_worker_codec = None
+
+
+def _init_worker(callback, wire_format):
+    global _worker_callback, _worker_codec
+    _worker_callback = callback
+    _worker_codec = get_codec(wire_format) if wire_format is not None else None
+
+
+def _decode_frame(frame, kind, bounds):
+    if kind == BINARY_FRAME:
+        return Response.deserialize(frame, codec=_worker_codec)
+    text = frame.decode('utf-8')
+    if bounds is None:
+        return Response.deserialize(text)
+    # the header is decoded with an empty content, which stays a slice of the frame
+    start, end = bounds
+    msg = Response.deserialize(text[:start] + text[end:])
+    msg.payload.set_content_slice(text, start, end)
+    return msg
+
+
+def _run_batch(name, lengths, kinds, bounds):
+    """
+    worker side: decode the frames of a shared memory block and call the callback
+    :param name: name of the shared memory block
+    :param lengths: list of frame lengths in bytes
+    :param kinds: list of TEXT_FRAME or BINARY_FRAME
+    :param bounds: list of (start, end) of the content in a text frame, or None
+    :return: list of the values returned by the callback
+    """
+    # the workers share the resource tracker of the client process, the
+    # block stays registered once and is unlinked by the client process
+    shm = shared_memory.SharedMemory(name)
+    try:
+        buf = shm.buf
+        results = []
+        start = 0
+        for length, kind, content_bounds in zip(lengths, kinds, bounds):
+            frame = bytes(buf[start:start + length])
+            start += length
+            payload = _decode_frame(frame, kind, content_bounds).payload
+            results.append(_worker_callback(payload.get_parsed_content(), payload))
+        del buf
+        return results
+    finally:
+        shm.close()
+
+
+class ProcessOffload:
+    """
+    ships the frames of a subscription to worker processes.
+    pass it as offload to Client.subscribe
+    """
+
+    def __init__(self, callback, processes=None, result_callback=None, batch_size=256,
+                 max_delay_ms=50, wire_format=None):
+        """
+        init function
+        :param callback: picklable function(content, msg) run in the workers
+        :param processes: number of worker processes, the number of cores by default
+        :param result_callback: function(list) receiving the values returned by
+                                callback for each batch, in order
+        :param batch_size: number of frames shipped together
+        :param max_delay_ms: time after which a partial batch is shipped
+        :param wire_format: binary codec of the frames, the wire_format option of the client
+        """
+        if shared_memory is None:
+            raise ImportError('ProcessOffload requires python 3.8 or later (multiprocessing.shared_memory)')
+        if not hasattr(callback, '__call__'):
+            raise ValueError('No callback given')
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            raise ValueError('batch_size should be a positive int. Given : %s' % batch_size)
+        self.result_callback = result_callback
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000
+        # started before the workers so that they share it, see _run_batch
+        resource_tracker.ensure_running()
+        self.executor = ProcessPoolExecutor(processes, initializer=_init_worker,
+                                            initargs=(callback, wire_format))
+        self.lock = threading.Lock()
+        self.result_lock = threading.Lock()
+        # (frame, content bounds or None) of the messages not shipped yet
+        self.frames = []
+        self.timer = None
+        # (future, shared memory block) of the shipped batches, in order
+        self.shipped = deque()
+        self.shipped_batches = 0
+        self.shipped_frames = 0
+
+    def submit(self, batch):
+        """
+        batch callback of the subscription: queue the frames of new messages
+        :param batch: MessageBatch
+        :return: None
+        """
+        if batch.rows_are_payloads:
+            codec = get_codec()
+            frames = [(codec.dumps([0, UnicastMessage.TYPE, None, payload]), None) for payload in batch.rows]
+        else:
+            frames = [self.frame_of(msg) for msg in batch.rows]
+        futures = []
+        with self.lock:
+            self.frames.extend(frames)
+            while len(self.frames) >= self.batch_size:
+                futures.append(self.__ship(self.frames[:self.batch_size]))
+                del self.frames[:self.batch_size]
+            if self.frames and self.timer is None:
+                self.timer = threading.Timer(self.max_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        for future in futures:
+            future.add_done_callback(self.__batch_done)
+
+    @staticmethod
+    def frame_of(msg):
+        """
+        the frame of a message as received, with the bounds of its content
+        when it is still a slice of the frame
+        :param msg: StreamMessage
+        :return: (frame, (start, end) or None)
+        """
+        if msg.raw_frame is None:
+            return UnicastMessage(msg, None).serialize(), None
+        content_slice = msg.get_content_slice()
+        if content_slice is not None and content_slice[0] is msg.raw_frame:
+            return msg.raw_frame, content_slice[1:]
+        return msg.raw_frame, None
+
+    def flush(self):
+        """
+        ship the queued frames now
+        :return: None
+        """
+        future = None
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.frames:
+                future = self.__ship(self.frames)
+                self.frames = []
+        if future is not None:
+            future.add_done_callback(self.__batch_done)
+
+    def __ship(self, frames):
+        bounds = [content_bounds for _, content_bounds in frames]
+        frames = [frame for frame, _ in frames]
+        encoded = [frame.encode('utf-8') if isinstance(frame, str) else frame for frame in frames]
+        kinds = [TEXT_FRAME if isinstance(frame, str) else BINARY_FRAME for frame in frames]
+        lengths = [len(frame) for frame in encoded]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(lengths)))
+        start = 0
+        for frame, length in zip(encoded, lengths):
+            shm.buf[start:start + length] = frame
+            start += length
+        future = self.executor.submit(_run_batch, shm.name, lengths, kinds, bounds)
+        self.shipped.append((future, shm))
+        self.shipped_batches += 1
+        self.shipped_frames += len(frames)
+        return future
+
+    def __batch_done(self, _):
+        # batches may complete in any order, the results are passed on in shipping order
+        with self.result_lock:
+            while True:
+                with self.lock:
+                    if not self.shipped or not self.shipped[0][0].done():
+                        return
+                    future, shm = self.shipped.popleft()
+                shm.close()
+                shm.unlink()
+                try:
+                    results = future.result()
+                except Exception:
+                    logger.exception('Offloaded batch failed')
+                    continue
+                if self.result_callback is not None:
+                    self.result_callback(results)
+
+    def pending(self):
+        """
+        return the number of batches shipped and not done yet
+        :return: int
+        """
+        with self.lock:
+            return len(self.shipped)
+
+    def shutdown(self, wait=True):
+        """
+        ship the queued frames and stop the workers
+        :param wait: wait for the shipped batches
+        :return: None
+        """
+        self.flush()
+        self.executor.shutdown(wait)
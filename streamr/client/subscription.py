@@ -3,11 +3,17 @@ provide the subscription class
 """
 
 import logging
+import threading
 
+from streamr.client.buffer import MessageBuffer
 from streamr.client.event import Event
+from streamr.client.executor import ThreadExecutor, get_executor
+from streamr.client.timer import get_timer_service
 from streamr.util.option import Option
-from streamr.util.constant import EventConstant
+from streamr.util.constant import EventConstant, OverflowConstant, StreamMessageConstant
 from streamr.protocol.errors.error import InvalidJsonError
+from streamr.protocol.response import BroadcastMessage
+from streamr.protocol.batch import MessageBatch
 
 __all__ = ['Subscription']
 
@@ -15,6 +21,12 @@ logger = logging.getLogger(__name__)
 
 SUB_ID_COUNTS = 0
 
+# delay of a partial batch when only max_batch is given
+DEFAULT_MAX_DELAY_MS = 100
+
+# the queue is handled by the websocket thread, which cannot wait for itself
+QUEUE_POLICIES = tuple(policy for policy in OverflowConstant.POLICIES if policy != OverflowConstant.BLOCK)
+
 
 def generate_subscription_id():
     """
@@ -31,14 +43,17 @@ class Subscription(Event):
     subscription class
     """
 
-    def __init__(self, stream_id=None, stream_partition=0, api_key=None, callback=None, option=None):
+    def __init__(self, stream_id=None, stream_partition=0, api_key=None, callback=None, option=None,
+                 resend_batch_callback=None, content_schema=None, raw=False, batch_callback=None,
+                 history=None, executor=None, max_batch=None, max_delay_ms=None, queue_limit=None,
+                 delivery_limit=None, budget=None, offload=None):
         super().__init__()
 
         if stream_id is None:
             raise ValueError('No stream_id given!')
         if api_key is None:
             raise ValueError('No api_key given!')
-        if not hasattr(callback, '__call__'):
+        if not hasattr(callback, '__call__') and not hasattr(batch_callback, '__call__'):
             raise ValueError('No callback given')
 
         self.sub_id = generate_subscription_id()
@@ -46,14 +61,48 @@ class Subscription(Event):
         self.stream_partition = stream_partition
         self.api_key = api_key
         self.callback = callback if hasattr(callback, '__call__') else lambda x, y: None
+        # receives resent messages as ColumnarMessages instead of one by one
+        self.resend_batch_callback = resend_batch_callback
+        # ContentSchema decoding the content into records, None for plain json
+        self.content_schema = content_schema
+        # the callback receives the received frame instead of the parsed content
+        self.raw = raw
+        # receives the messages as MessageBatch instead of calling callback one by one
+        self.batch_callback = batch_callback
+        # ProcessOffload whose submit is the batch_callback, shut down with the subscription
+        self.offload = offload
+        # MessageHistory of the delivered messages, serving the resends of new local subscriptions
+        self.history = history
+        # CallbackExecutor running the callbacks off the reader thread, None to run them inline
+        self.executor, self.owns_executor = get_executor(executor, delivery_limit, budget)
+        self.key = (stream_id, stream_partition)
+        # new messages are grouped into batches of up to max_batch messages,
+        # a partial batch is delivered max_delay after its first message
+        if (max_batch is not None or max_delay_ms is not None) and not hasattr(batch_callback, '__call__'):
+            raise ValueError('max_batch and max_delay_ms need a batch_callback')
+        if max_batch is not None and (not isinstance(max_batch, int) or max_batch <= 0):
+            raise ValueError('max_batch should be a positive int. Given : %s' % max_batch)
+        if max_batch is not None and max_delay_ms is None:
+            max_delay_ms = DEFAULT_MAX_DELAY_MS
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000 if max_delay_ms is not None else None
+        self.pending = []
+        self.pending_lock = threading.RLock()
+        self.flush_timer = None
         if isinstance(option, Option):
             self.option = option
         else:
             self.option = Option()
-        self.queue = []
+        # live messages waiting for a resend, bounded by queue_limit and the budget of the client
+        self.queue = MessageBuffer(queue_limit, budget, 'queue of subscription %s' % self.sub_id,
+                                   policies=QUEUE_POLICIES)
         self.state = EventConstant.UNSUBSCRIBED
         self.resending = False
         self.last_received_offset = None
+        # (from, to) offsets of a resend batch to ask again after a gap, once the resend is done
+        self.resend_gap = None
+        # whether the current resend asks a resend gap again
+        self.gap_retry = False
 
         if self.option.check_resend() > 1:
             raise ValueError('Multiple resend option active! Please use only one: %s' % self.option)
@@ -70,6 +119,8 @@ class Subscription(Event):
             :return:
             """
             self.set_resending(False)
+            # the queued messages are resent with the next subscription
+            self.queue.drain()
 
         self.on(EventConstant.UNSUBSCRIBED, unsubscribed)
 
@@ -80,8 +131,7 @@ class Subscription(Event):
             :return:
             """
             logger.debug('Sub %s no_resend:%s' % (self.sub_id, response))
-            self.set_resending(False)
-            self.check_queue()
+            self.finish_resend()
 
         self.on(EventConstant.NO_RESEND, no_resend)
 
@@ -92,8 +142,7 @@ class Subscription(Event):
             :return:
             """
             logger.debug('Sub %s resent: %s' % (self.sub_id, response))
-            self.set_resending(False)
-            self.check_queue()
+            self.finish_resend()
 
         self.on(EventConstant.RESENT, resent)
 
@@ -113,6 +162,8 @@ class Subscription(Event):
             """
             self.set_state(EventConstant.UNSUBSCRIBED)
             self.set_resending(False)
+            self.resend_gap = None
+            self.queue.drain()
 
         self.on(EventConstant.DISCONNECTED, disconnected)
 
@@ -126,6 +177,21 @@ class Subscription(Event):
             and self.last_received_offset is not None \
             and previous_offset > self.last_received_offset
 
+    def is_duplicate(self, offset, previous_offset, is_resend=False):
+        """
+        whether handle_message would ignore a message with these offsets
+        :param offset: int
+        :param previous_offset: int or None
+        :param is_resend: bool
+        :return: bool
+        """
+        if self.resending is True and is_resend is False:
+            return False
+        if self.check_for_gap(previous_offset) is True and self.resending is False:
+            return False
+        return self.last_received_offset is not None and offset is not None \
+            and offset <= self.last_received_offset
+
     def handle_message(self, msg, is_resend=False):
         """
         handle the message received from server
@@ -134,8 +200,8 @@ class Subscription(Event):
         :return:
         """
         if msg.previous_offset is None:
-            logger.debug(
-                'handle_message: prev_offset is null, gap detection is impossible! message no. %s' % msg.serialize())
+            logger.debug('handle_message: prev_offset is null, gap detection is impossible! message no. %s',
+                         msg.offset)
 
         if self.resending is True and is_resend is False:
             self.queue.append(msg)
@@ -153,9 +219,252 @@ class Subscription(Event):
                 self.sub_id, msg.offset, self.last_received_offset))
         else:
             self.last_received_offset = msg.offset
-            self.callback(msg.get_parsed_content(), msg)
-            if msg.is_bye_message():
-                self.emit(EventConstant.DONE)
+            if self.history is not None:
+                self.history.append(msg)
+            if self.batch_callback is not None:
+                if self.max_delay is None:
+                    self.dispatch_batch(MessageBatch.from_messages([msg]))
+                else:
+                    self.add_pending([msg])
+            elif self.executor is None:
+                self.deliver(msg)
+            else:
+                self.executor.submit(self.key, self.deliver, msg)
+
+    def deliver(self, msg):
+        """
+        parse the content of a new message and call the callback, on the executor
+        :param msg: StreamMessage
+        :return: None
+        """
+        if self.raw is True:
+            self.handle_raw_message(msg)
+            return
+        try:
+            content = msg.get_parsed_content(self.content_schema)
+        except InvalidJsonError as e:
+            if self.executor is None:
+                self.handle_error(e)
+            else:
+                # the offsets belong to the reader thread, which advanced them before submitting
+                self.emit(EventConstant.ERROR, e)
+            return
+        self.callback(content, msg)
+        # a BYE message never matches a content schema, it is parsed as a dict
+        if isinstance(content, dict) and content.get(StreamMessageConstant.BYE, False):
+            self.emit(EventConstant.DONE)
+
+    def handle_raw_message(self, msg):
+        """
+        pass the frame of a message to the callback without parsing its content.
+        the content is only parsed when it may be a BYE message
+        :param msg: StreamMessage
+        :return: None
+        """
+        frame = msg.raw_frame
+        if frame is None:
+            frame = BroadcastMessage(msg).serialize()
+        self.callback(frame, msg)
+        if isinstance(frame, str) and StreamMessageConstant.BYE not in frame:
+            return
+        try:
+            bye = msg.is_bye_message()
+        except (InvalidJsonError, ValueError):
+            return
+        if bye:
+            self.emit(EventConstant.DONE)
+
+    def handle_batch(self, batch, is_resend=False):
+        """
+        handle consecutive messages at once. duplicates are dropped and gaps
+        are checked once for the batch, the messages after a gap are queued
+        until it is resent
+        :param batch: MessageBatch
+        :param is_resend: bool
+        :return: None
+        """
+        if self.resending is True and is_resend is False:
+            self.queue.extend(batch.get_messages())
+            return
+
+        batch = batch.take(batch.new_message_indexes(self.last_received_offset))
+        gap = batch.first_gap(self.last_received_offset)
+        if gap is not None and is_resend:
+            index, from_index, to_index = gap
+            if self.hold_resend_gap(from_index, batch.offsets[-1] if batch.offsets[-1] is not None else to_index):
+                batch = batch.take(range(index))
+            gap = None
+        elif gap is not None:
+            index, from_index, to_index = gap
+            self.queue.extend(batch.take(range(index, len(batch))).get_messages())
+            batch = batch.take(range(index))
+
+        if len(batch) != 0:
+            self.last_received_offset = batch.offsets[-1]
+            if self.history is not None:
+                self.history.extend(batch.get_messages())
+            if self.max_delay is None:
+                self.dispatch_batch(batch)
+            else:
+                self.add_pending(batch.get_messages())
+
+        if gap is not None:
+            logger.debug('Gap detected, requesting resend for stream %s from %d to %d' % (
+                self.stream_id, from_index, to_index))
+            self.emit(EventConstant.GAP, from_index, to_index)
+
+    def dispatch_batch(self, batch):
+        """
+        deliver new messages inline or on the executor
+        :param batch: MessageBatch
+        :return: None
+        """
+        if self.executor is None:
+            self.deliver_batch(batch)
+        else:
+            self.executor.submit(self.key, self.deliver_batch, batch)
+
+    def add_pending(self, messages):
+        """
+        add new messages to the batch being grouped, delivering it once it
+        has max_batch messages. the messages passed the duplicate and gap
+        checks, so the grouped batches keep the offset order
+        :param messages: list of StreamMessage
+        :return: None
+        """
+        with self.pending_lock:
+            self.pending.extend(messages)
+            while self.max_batch is not None and len(self.pending) >= self.max_batch:
+                ready = self.pending[:self.max_batch]
+                del self.pending[:self.max_batch]
+                self.dispatch_batch(MessageBatch.from_messages(ready))
+            if not self.pending and self.flush_timer is not None:
+                get_timer_service().cancel(self.flush_timer)
+                self.flush_timer = None
+            elif self.pending and self.flush_timer is None:
+                self.flush_timer = get_timer_service().schedule(self.max_delay, self.flush_pending)
+
+    def flush_pending(self):
+        """
+        deliver the messages being grouped now
+        :return: None
+        """
+        with self.pending_lock:
+            if self.flush_timer is not None:
+                get_timer_service().cancel(self.flush_timer)
+                self.flush_timer = None
+            ready, self.pending = self.pending, []
+            if ready:
+                self.dispatch_batch(MessageBatch.from_messages(ready))
+
+    def deliver_batch(self, batch):
+        """
+        call the batch callback with new messages, on the executor
+        :param batch: MessageBatch
+        :return: None
+        """
+        self.batch_callback(batch)
+        if batch.has_bye_message():
+            self.emit(EventConstant.DONE)
+
+    def replay_history(self, messages):
+        """
+        deliver messages served from a local history as a completed resend
+        :param messages: list of StreamMessage
+        :return: None
+        """
+        self.set_resending(True)
+        if self.batch_callback is not None:
+            self.handle_batch(MessageBatch.from_messages(messages), True)
+        else:
+            for msg in messages:
+                self.handle_message(msg, True)
+        self.emit(EventConstant.RESENT)
+
+    def handle_resend_batch(self, batch):
+        """
+        handle the messages of a resend collected as columns. duplicates are
+        dropped and gaps are checked over the offset column at once
+        :param batch: ColumnarMessages
+        :return: None
+        """
+        batch = batch.take(batch.new_message_mask(self.last_received_offset))
+        if len(batch) == 0:
+            return
+
+        gaps = batch.gaps(self.last_received_offset)
+        if gaps and self.hold_resend_gap(gaps[0][0], int(batch.offset[-1])):
+            batch = batch.take(batch.offset < gaps[0][0])
+            if len(batch) == 0:
+                return
+
+        self.last_received_offset = int(batch.offset[-1])
+        if self.executor is None:
+            self.deliver_resend_batch(batch)
+        else:
+            self.executor.submit(self.key, self.deliver_resend_batch, batch)
+
+    def deliver_resend_batch(self, batch):
+        """
+        call the resend batch callback, on the executor
+        :param batch: ColumnarMessages
+        :return: None
+        """
+        self.resend_batch_callback(batch)
+        if batch.has_bye_message():
+            self.emit(EventConstant.DONE)
+
+    def hold_resend_gap(self, from_index, to_index):
+        """
+        note a gap found in resent messages. the messages from the gap on are
+        dropped and asked again with the gap once the resend is done. a gap
+        found again while asking a gap again is only logged, the storage may
+        miss these messages
+        :param from_index: first missing offset
+        :param to_index: last offset of the resent messages
+        :return: bool, whether the messages from the gap on are dropped
+        """
+        if self.gap_retry:
+            logger.debug('Gap in resent messages for stream %s from %d' % (self.stream_id, from_index))
+            return False
+        if self.resend_gap is None:
+            self.resend_gap = (from_index, to_index)
+        else:
+            self.resend_gap = (self.resend_gap[0], max(self.resend_gap[1], to_index))
+        logger.debug('Gap in resent messages for stream %s from %d, asking again up to %d after the resend' % (
+            self.stream_id, self.resend_gap[0], self.resend_gap[1]))
+        return True
+
+    def finish_resend(self):
+        """
+        end the resend: ask again the messages after a gap of the resent
+        batches, or handle the messages queued during the resend
+        :return: None
+        """
+        self.set_resending(False)
+        gap, self.resend_gap = self.resend_gap, None
+        self.gap_retry = gap is not None
+        if gap is not None:
+            self.emit(EventConstant.GAP, gap[0], gap[1])
+            if self.resending:
+                return
+        self.check_queue()
+
+    def close(self):
+        """
+        deliver the messages being grouped, drop the queued ones so they no
+        longer count in the budget, and stop the executor created for the
+        subscription and the offload once their callbacks are done
+        :return: None
+        """
+        self.flush_pending()
+        self.queue.drain()
+        if self.offload is not None:
+            self.offload.shutdown(wait=False)
+            self.offload = None
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+            self.owns_executor = False
 
     def check_queue(self):
         """
@@ -165,12 +474,25 @@ class Subscription(Event):
         logger.debug('Attempting to process %s queued messages for stream %s' % (
             len(self.queue), self.stream_id))
 
-        orig = self.queue
-        self.queue = []
+        orig = self.queue.drain()
 
+        if self.batch_callback is not None:
+            if orig:
+                self.handle_batch(MessageBatch.from_messages(orig), False)
+            return
         for msg in orig:
             self.handle_message(msg, False)
 
+    def queue_metrics(self):
+        """
+        return the metrics of the queue, and of the delivery queue of a ThreadExecutor
+        :return: dict of 'queue' and 'delivery' to dict, see MessageBuffer.metrics
+        """
+        metrics = {'queue': self.queue.metrics()}
+        if isinstance(self.executor, ThreadExecutor):
+            metrics['delivery'] = self.executor.metrics()
+        return metrics
+
     def has_resend_option(self):
         """
         check whether subscription has a resend option
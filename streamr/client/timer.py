@@ -0,0 +1,90 @@
+"""
+provide TimerService, one thread running delayed calls
+
+subscriptions delivering their messages in batches schedule a flush of
+their partial batch, and the service runs it when the delay has elapsed
+even if no other message arrives. the scheduled calls run one at a time
+on the thread of the service and should return quickly, e.g. by handing
+the work to an executor.
+"""
+
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+__all__ = ['TimerService', 'get_timer_service']
+
+logger = logging.getLogger(__name__)
+
+
+class TimerService:
+    """
+    runs scheduled calls on a single daemon thread, started on first use
+    """
+
+    def __init__(self, name='streamr-timer'):
+        """
+        init function
+        :param name: name of the thread
+        """
+        self.name = name
+        self.condition = threading.Condition()
+        # [deadline, sequence, fn, args] entries, fn is None once cancelled
+        self.heap = []
+        self.sequence = itertools.count()
+        self.thread = None
+
+    def schedule(self, delay, fn, *args):
+        """
+        call fn(*args) after delay seconds
+        :param delay: float, seconds
+        :param fn: function
+        :param args: args of fn
+        :return: handle to pass to cancel
+        """
+        entry = [time.monotonic() + delay, next(self.sequence), fn, args]
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__run, name=self.name, daemon=True)
+                self.thread.start()
+            heapq.heappush(self.heap, entry)
+            if self.heap[0] is entry:
+                self.condition.notify()
+        return entry
+
+    def cancel(self, handle):
+        """
+        cancel a scheduled call that has not run yet
+        :param handle: returned by schedule
+        :return: None
+        """
+        with self.condition:
+            handle[2] = None
+
+    def __run(self):
+        while True:
+            with self.condition:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.condition.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, fn, args = heapq.heappop(self.heap)
+            if fn is None:
+                continue
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception('Scheduled call %s failed' % fn)
+
+
+_timer_service = TimerService()
+
+
+def get_timer_service():
+    """
+    return the timer service shared by the subscriptions
+    :return: TimerService
+    """
+    return _timer_service
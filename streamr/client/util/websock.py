@@ -51,7 +51,8 @@ class MyWebSocket(object):
         on_message: callable object which is called when received data.
          on_message has 2 arguments.
          The 1st argument is this class object.
-         The 2nd argument is utf-8 string which we get from the server.
+         The 2nd argument is utf-8 string which we get from the server,
+         or bytes when the server sent a binary frame.
         on_error: callable object which is called when we get error.
          on_error has 2 arguments.
          The 1st argument is this class object.
@@ -189,6 +190,7 @@ class MyWebSocket(object):
                 self._callback(self.on_cont_message,
                                frame.data, frame.fin)
             else:
+                # binary frames are handed over as bytes, without utf-8 decoding
                 data = frame.data
                 if six.PY3 and op_code == ABNF.OPCODE_TEXT:
                     data = data.decode("utf-8")
@@ -4,4 +4,7 @@ protocol package
 request module: the classes for all types of request
 response module: the classes for all types of response
 payload module: the classes for all types of payload
+columnar module: columnar decoding of resent messages
+schema module: typed content decoding from the field config of a stream
+table module: accumulating messages as columns for Arrow and pandas
 """
\ No newline at end of file
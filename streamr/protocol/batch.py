@@ -0,0 +1,227 @@
+"""
+provide MessageBatch, consecutive StreamMessages of one subscription held
+as parallel lists
+
+a batch callback receives the offsets, timestamps and contents of many
+messages at once, and duplicate and gap checks run once per batch instead
+of once per message. unlike ColumnarMessages it needs no numpy.
+"""
+
+
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.errors.error import InvalidJsonError, UnsupportedVersionError
+from streamr.protocol.util.codec import get_codec
+from streamr.protocol.util.content import ContentType, get_content_decoder
+from streamr.protocol.util.intern import intern_string
+from streamr.util.constant import StreamMessageConstant
+
+
+__all__ = ['MessageBatch', 'has_bye_content']
+
+
+def has_bye_content(contents, content_types):
+    """
+    whether one of the contents is a BYE message. json text is only parsed
+    when it contains the BYE key
+    :param contents: list of contents
+    :param content_types: list of int
+    :return: bool
+    """
+    for content, content_type in zip(contents, content_types):
+        if content_type != ContentType.JSON:
+            continue
+        if isinstance(content, str):
+            if StreamMessageConstant.BYE not in content:
+                continue
+            try:
+                content = get_codec().loads(content)
+            except ValueError:
+                continue
+        if isinstance(content, dict) and content.get(StreamMessageConstant.BYE, False):
+            return True
+    return False
+
+
+class MessageBatch:
+    """
+    StreamMessages of one stream held as parallel lists.
+    rows are the StreamMessages, or the payload lists the batch was built
+    from; StreamMessages are only created by get_messages. the contents of
+    StreamMessage rows are only taken, and unescaped, when first used
+    """
+
+    __slots__ = ('stream_id', 'offsets', 'previous_offsets', 'timestamps',
+                 'content_types', '_contents', 'rows', 'rows_are_payloads')
+
+    def __init__(self, stream_id, offsets, previous_offsets, timestamps, content_types,
+                 contents, rows, rows_are_payloads=False):
+        self.stream_id = stream_id
+        self.offsets = offsets
+        self.previous_offsets = previous_offsets
+        self.timestamps = timestamps
+        self.content_types = content_types
+        # None until the contents of StreamMessage rows are used
+        self._contents = contents
+        self.rows = rows
+        self.rows_are_payloads = rows_are_payloads
+
+    @classmethod
+    def from_messages(cls, messages, stream_id=None):
+        """
+        build a batch from StreamMessages
+        :param messages: list of StreamMessage
+        :param stream_id: stream id to use when messages is empty
+        :return: MessageBatch
+        """
+        return cls(messages[0].stream_id if messages else stream_id,
+                   [msg.offset for msg in messages],
+                   [msg.previous_offset for msg in messages],
+                   [msg.timestamp for msg in messages],
+                   [msg.content_type for msg in messages],
+                   None,
+                   list(messages))
+
+    @classmethod
+    def from_payloads(cls, payloads, stream_id=None):
+        """
+        build a batch from StreamMessage payload lists, without creating a
+        StreamMessage per payload
+        :param payloads: list of [version, stream_id, partition, ...] lists
+        :param stream_id: stream id to use when payloads is empty
+        :return: MessageBatch
+        """
+        if not payloads:
+            return cls(stream_id, [], [], [], [], [], [], True)
+        columns = list(zip(*payloads))
+        for version in set(columns[0]):
+            if version not in (28, 29):
+                raise UnsupportedVersionError(version, 'Supported version: [ 28, 29]')
+        return cls(intern_string(columns[1][0]), list(columns[5]), list(columns[6]), list(columns[3]),
+                   list(columns[7]), list(columns[8]), list(payloads), True)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def contents(self):
+        """
+        contents of the rows, unescaped from their frames on first access
+        :return: list of str or dict or list
+        """
+        if self._contents is None:
+            self._contents = [msg.content for msg in self.rows]
+        return self._contents
+
+    def content_size(self):
+        """
+        approximate size of the contents, without unescaping them
+        :return: int
+        """
+        if self._contents is None:
+            return sum(msg.content_size() for msg in self.rows)
+        return sum(len(content) for content in self._contents if isinstance(content, (str, bytes)))
+
+    def take(self, indexes):
+        """
+        select rows
+        :param indexes: list or range of row indexes
+        :return: MessageBatch
+        """
+        return MessageBatch(self.stream_id,
+                            [self.offsets[i] for i in indexes],
+                            [self.previous_offsets[i] for i in indexes],
+                            [self.timestamps[i] for i in indexes],
+                            [self.content_types[i] for i in indexes],
+                            None if self._contents is None else [self._contents[i] for i in indexes],
+                            [self.rows[i] for i in indexes],
+                            self.rows_are_payloads)
+
+    def new_message_indexes(self, last_received_offset=None):
+        """
+        duplicate check: rows whose offset is above every offset received
+        before them, in this batch or earlier
+        :param last_received_offset: int or None
+        :return: list of int
+        """
+        last = -1 if last_received_offset is None else last_received_offset
+        indexes = []
+        for i, offset in enumerate(self.offsets):
+            if offset is None or offset > last:
+                indexes.append(i)
+                if offset is not None:
+                    last = offset
+        return indexes
+
+    def first_gap(self, last_received_offset=None):
+        """
+        gap check, assuming duplicates were removed
+        :param last_received_offset: int or None
+        :return: (row index, from, to) of the first missing offset range, or None
+        """
+        before = last_received_offset
+        for i, previous_offset in enumerate(self.previous_offsets):
+            if previous_offset is not None and before is not None and previous_offset > before:
+                return i, before + 1, previous_offset
+            if self.offsets[i] is not None:
+                before = self.offsets[i]
+        return None
+
+    def gaps(self, last_received_offset=None):
+        """
+        every gap, assuming duplicates were removed
+        :param last_received_offset: int or None
+        :return: list of (from, to) offset ranges missing before a row
+        """
+        found = []
+        before = last_received_offset
+        for i, previous_offset in enumerate(self.previous_offsets):
+            if previous_offset is not None and before is not None and previous_offset > before:
+                found.append((before + 1, previous_offset))
+            if self.offsets[i] is not None:
+                before = self.offsets[i]
+        return found
+
+    def get_messages(self):
+        """
+        return the rows as StreamMessages
+        :return: list of StreamMessage
+        """
+        if self.rows_are_payloads:
+            self.rows = [StreamMessage(*payload[1:]) for payload in self.rows]
+            self.rows_are_payloads = False
+        return self.rows
+
+    def parsed_contents(self, codec=None):
+        """
+        parse every content, json contents with the codec and the other
+        content types with their registered decoder
+        :param codec: decoder to use instead of the json codec, e.g. a ContentSchema
+        :return: list
+        """
+        codec = codec or get_codec()
+        loads = codec.loads
+        parsed = []
+        for content, content_type in zip(self.contents, self.content_types):
+            if content_type != ContentType.JSON:
+                decoder = get_content_decoder(content_type)
+                if decoder is None:
+                    raise ValueError('content type: %s cannot be parsed.' % content_type)
+                parsed.append(decoder(content))
+            elif not isinstance(content, str):
+                parsed.append(content)
+            else:
+                try:
+                    parsed.append(loads(content))
+                except codec.decode_error as e:
+                    raise InvalidJsonError(self.stream_id, content, e, None)
+        return parsed
+
+    def has_bye_message(self):
+        """
+        whether a message of the batch is a BYE message. the contents of
+        StreamMessage rows are only unescaped when their text has the BYE key
+        :return: bool
+        """
+        if self._contents is None:
+            return any(msg.content_type == ContentType.JSON and msg.is_bye_message() for msg in self.rows)
+        return has_bye_content(self._contents, self.content_types)
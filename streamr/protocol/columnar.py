@@ -0,0 +1,164 @@
+"""
+provide columnar decoding of UnicastMessage payloads for resend bursts
+
+numpy is an optional dependency, it is only needed when a subscription
+asks for its resends as columns
+"""
+
+
+from streamr.protocol.batch import has_bye_content
+from streamr.protocol.errors.error import InvalidJsonError, UnsupportedVersionError
+from streamr.protocol.util.codec import get_codec
+from streamr.protocol.util.content import ContentType, get_content_decoder
+from streamr.protocol.util.intern import intern_string
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+__all__ = ['ColumnarMessages']
+
+
+# position of the fields in a StreamMessage payload list
+_STREAM_ID, _PARTITION, _TIMESTAMP, _TTL, _OFFSET, _PREVIOUS_OFFSET, _CONTENT_TYPE, _CONTENT = range(1, 9)
+
+
+def _int_column(values):
+    if None in values:
+        values = [-1 if v is None else v for v in values]
+    return np.array(values, dtype=np.int64)
+
+
+class ColumnarMessages:
+    """
+    StreamMessages of one stream held as parallel columns.
+    offset, previous_offset, timestamp, ttl and partition are numpy arrays,
+    a missing offset or previous offset is stored as -1.
+    contents is a list of the still serialized contents
+    """
+
+    def __init__(self, stream_id, offset, previous_offset, timestamp, ttl,
+                 partition, content_type, contents):
+        if np is None:
+            raise ImportError('numpy is required for columnar message decoding')
+        self.stream_id = stream_id
+        self.offset = offset
+        self.previous_offset = previous_offset
+        self.timestamp = timestamp
+        self.ttl = ttl
+        self.partition = partition
+        self.content_type = content_type
+        self.contents = contents
+
+    @classmethod
+    def from_payloads(cls, payloads, stream_id=None):
+        """
+        build the columns from StreamMessage payload lists, without creating
+        a StreamMessage per payload
+        :param payloads: list of [version, stream_id, partition, ...] lists
+        :param stream_id: stream id to use when payloads is empty
+        :return: ColumnarMessages
+        """
+        if np is None:
+            raise ImportError('numpy is required for columnar message decoding')
+        if len(payloads) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(stream_id, empty, empty.copy(), empty.copy(), empty.copy(), empty.copy(), empty.copy(), [])
+
+        columns = list(zip(*payloads))
+        for version in set(columns[0]):
+            if version not in (28, 29):
+                raise UnsupportedVersionError(version, 'Supported version: [ 28, 29]')
+        return cls(intern_string(columns[_STREAM_ID][0]),
+                   _int_column(columns[_OFFSET]),
+                   _int_column(columns[_PREVIOUS_OFFSET]),
+                   np.array(columns[_TIMESTAMP]),
+                   _int_column(columns[_TTL]),
+                   _int_column(columns[_PARTITION]),
+                   _int_column(columns[_CONTENT_TYPE]),
+                   list(columns[_CONTENT]))
+
+    @classmethod
+    def is_available(cls):
+        """
+        whether numpy can be imported
+        :return: bool
+        """
+        return np is not None
+
+    def __len__(self):
+        return len(self.contents)
+
+    def has_bye_message(self):
+        """
+        whether a message of the batch is a BYE message
+        :return: bool
+        """
+        return has_bye_content(self.contents, self.content_type.tolist())
+
+    def take(self, mask):
+        """
+        select rows
+        :param mask: boolean numpy array or index array
+        :return: ColumnarMessages
+        """
+        indexes = np.flatnonzero(mask) if mask.dtype == np.bool_ else mask
+        return ColumnarMessages(self.stream_id, self.offset[indexes], self.previous_offset[indexes],
+                                self.timestamp[indexes], self.ttl[indexes], self.partition[indexes],
+                                self.content_type[indexes], [self.contents[i] for i in indexes])
+
+    def new_message_mask(self, last_received_offset=None):
+        """
+        vectorized duplicate check: rows whose offset is above every offset
+        received before them, in this batch or earlier
+        :param last_received_offset: int or None
+        :return: boolean numpy array
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.bool_)
+        running_max = np.maximum.accumulate(self.offset)
+        before = np.empty_like(running_max)
+        before[0] = -1 if last_received_offset is None else last_received_offset
+        np.maximum(running_max[:-1], before[0], out=before[1:])
+        return self.offset > before
+
+    def gaps(self, last_received_offset=None):
+        """
+        vectorized gap check, assuming duplicates were removed
+        :param last_received_offset: int or None
+        :return: list of (from, to) offset ranges missing before a row
+        """
+        if len(self) == 0:
+            return []
+        before = np.empty_like(self.offset)
+        before[0] = -1 if last_received_offset is None else last_received_offset
+        before[1:] = self.offset[:-1]
+        missing = (self.previous_offset >= 0) & (before >= 0) & (self.previous_offset > before)
+        return [(int(before[i]) + 1, int(self.previous_offset[i])) for i in np.flatnonzero(missing)]
+
+    def parsed_contents(self, codec=None):
+        """
+        parse every content, json contents with the codec and the other
+        content types with their registered decoder
+        :param codec: decoder to use instead of the json codec, e.g. a ContentSchema
+        :return: list of dict or list
+        """
+        codec = codec or get_codec()
+        loads = codec.loads
+        parsed = []
+        for content, content_type in zip(self.contents, self.content_type.tolist()):
+            if content_type != ContentType.JSON:
+                decoder = get_content_decoder(content_type)
+                if decoder is None:
+                    raise ValueError('content type: %s cannot be parsed.' % content_type)
+                parsed.append(decoder(content))
+            elif not isinstance(content, str):
+                parsed.append(content)
+            else:
+                try:
+                    parsed.append(loads(content))
+                except codec.decode_error as e:
+                    raise InvalidJsonError(self.stream_id, content, e, None)
+        return parsed
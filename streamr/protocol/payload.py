@@ -2,9 +2,12 @@
 This doc provides the payload classes
 """
 
-import json
 from streamr.util.compare import EqualFunc
 from streamr.protocol.util.parser import jparser
+from streamr.protocol.util.codec import get_codec
+from streamr.protocol.util.frame import unescape_content
+from streamr.protocol.util.intern import intern_string
+from streamr.protocol.util.content import ContentType, get_content_decoder, get_content_encoder
 from streamr.protocol.errors.error import InvalidJsonError, UnsupportedVersionError
 from streamr.util.constant import StreamMessageConstant, \
     StreamAndPartitionConstant, ResendResponsePayloadConstant, \
@@ -19,11 +22,19 @@ class StreamMessage(EqualFunc):
     StreamMessage class
     """
 
-    class ContentType:
-        """
-        store the constant value
-        """
-        JSON = 27
+    ContentType = ContentType
+
+    __slots__ = ('stream_id', 'stream_partition', 'timestamp', 'ttl', 'offset',
+                 'previous_offset', 'content_type', '_content', '_content_slice',
+                 'signature_type', 'publisher_address', 'signature', 'parsed_content',
+                 'raw_frame')
+
+    # the content is compared once unescaped, the received frame is a
+    # reference kept for relaying, not message state
+    eq_fields = ('stream_id', 'stream_partition', 'timestamp', 'ttl', 'offset',
+                 'previous_offset', 'content_type', 'content', 'signature_type',
+                 'publisher_address', 'signature', 'parsed_content')
+    hash_fields = ('stream_id', 'stream_partition', 'timestamp', 'offset', 'previous_offset')
 
     def __init__(self, stream_id, stream_partition, timestamp,
                  ttl, offset, previous_offset, content_type,
@@ -37,13 +48,13 @@ class StreamMessage(EqualFunc):
         :param ttl: int
         :param offset: int
         :param previous_offset: int
-        :param content_type: StreamMessage.ContentType.JSON
-        :param content: string or dict
+        :param content_type: StreamMessage.ContentType.JSON, RAW, TEXT or a registered content type
+        :param content: string or dict, or bytes for raw content
         :param signature_type:
         :param publisher_address:
         :param signature:
         """
-        self.stream_id = stream_id
+        self.stream_id = intern_string(stream_id)
         self.stream_partition = stream_partition
         self.timestamp = timestamp
         self.ttl = ttl
@@ -52,37 +63,108 @@ class StreamMessage(EqualFunc):
         self.content_type = content_type
         self.content = content
         self.signature_type = signature_type
-        self.publisher_address = publisher_address
+        self.publisher_address = intern_string(publisher_address)
         self.signature = signature
         self.parsed_content = None
+        # frame the message was received in, kept when the connection relays frames
+        self.raw_frame = None
 
-    def get_parsed_content(self):
+    @property
+    def content(self):
+        """
+        content of the message, unescaped from the received frame on first access
+        :return: str or dict or list
+        """
+        if self._content_slice is not None:
+            self._unslice_content()
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        self._content = content
+        self._content_slice = None
+
+    def content_size(self):
+        """
+        approximate size of the content, without unescaping or serializing it
+        :return: int, number of characters or bytes
+        """
+        if self._content_slice is not None:
+            return self._content_slice[2] - self._content_slice[1]
+        if isinstance(self._content, (str, bytes)):
+            return len(self._content)
+        return len(self.get_serialized_content())
+
+    def set_content_slice(self, frame, start, end):
+        """
+        keep the content as a slice of the frame it was received in
+        :param frame: str
+        :param start: index of the first character of the escaped content
+        :param end: index of the closing quote of the content
+        :return: None
         """
-        parse the content
+        self._content = None
+        self._content_slice = (frame, start, end)
+
+    def get_content_slice(self):
+        """
+        return the frame the content is still a slice of
+        :return: (frame, start, end) as given to set_content_slice, or None
+                 once the content is unescaped
+        """
+        return self._content_slice
+
+    def _unslice_content(self):
+        frame, start, end = self._content_slice
+        try:
+            self._content = unescape_content(frame, start, end)
+        except ValueError as e:
+            raise InvalidJsonError(self.stream_id, frame[start:end], e, self)
+        self._content_slice = None
+
+    def get_parsed_content(self, codec=None):
+        """
+        parse the content. the message may be shared by subscriptions, so only
+        the result of the json codec is kept on it; the result of another
+        decoder is only returned to the caller
+        :param codec: decoder to use instead of the json codec, e.g. a ContentSchema
         :return dict
         """
+        if codec is not None and codec is not get_codec() and self.content_type == StreamMessage.ContentType.JSON \
+                and isinstance(self.content, str):
+            try:
+                return codec.loads(self.content)
+            except codec.decode_error as e:
+                raise InvalidJsonError(self.stream_id, self.content, e, self)
         if self.parsed_content is not None:
             pass
         elif self.content_type == StreamMessage.ContentType.JSON and isinstance(self.content, (list, dict)):
             self.parsed_content = self.content
         elif self.content_type == StreamMessage.ContentType.JSON and isinstance(self.content, str):
+            codec = get_codec()
             try:
-                self.parsed_content = json.loads(self.content)
-            except json.JSONDecodeError as e:
+                self.parsed_content = codec.loads(self.content)
+            except codec.decode_error as e:
                 raise InvalidJsonError(self.stream_id, self.content, e, self)
+        elif get_content_decoder(self.content_type) is not None:
+            self.parsed_content = get_content_decoder(self.content_type)(self.content)
         else:
             raise ValueError('content type: %s cannot be parsed.' % type(self.content_type))
         return self.parsed_content
 
-    def get_serialized_content(self):
+    def get_serialized_content(self, binary=False):
         """
         serialize content
-        :return:str
+        :param binary: whether the content is carried by a binary wire format,
+                       raw content is then kept as bytes
+        :return:str, or bytes for raw content with binary
         """
         if isinstance(self.content, str):
             return self.content
         elif self.content_type == StreamMessage.ContentType.JSON and isinstance(self.content, (list, dict)):
-            return json.dumps(self.content)
+            return get_codec().dumps(self.content)
+        elif get_content_encoder(self.content_type) is not None:
+            return get_content_encoder(self.content_type)(self.content, binary)
         else:
             raise ValueError('content type %s cannot be serialized' % type(self.content_type))
 
@@ -123,24 +205,28 @@ class StreamMessage(EqualFunc):
             raise UnsupportedVersionError(
                 version, 'Supported version:[ 28, 29 ]')
 
-    def serialize(self, version=28):
+    def serialize(self, version=28, codec=None):
         """
         serialize StreamMessage
         :param version: 28 or 29
-        :return: str
+        :param codec: codec to use instead of the json one. a binary codec
+                      embeds the parsed content instead of a json string
+        :return: str, or bytes for a binary codec
         """
-        return json.dumps(self.to_object(version))
+        codec = codec or get_codec()
+        return codec.dumps(self.to_object(version, codec.BINARY))
 
     @classmethod
-    def deserialize(cls, ori_msg, parse_content=True):
+    def deserialize(cls, ori_msg, parse_content=True, codec=None):
         """
         convert a str or dict to a StreamMessage object
-        :param ori_msg:  str or list
+        :param ori_msg:  str or list, or bytes for a binary codec
         :param parse_content: whether parse content or not
+        :param codec: codec to use instead of the json one, e.g. msgpack
         :return: StreamMessage object
         """
 
-        msg = jparser(ori_msg)
+        msg = jparser(ori_msg, codec)
 
         # Version 28: [version, stream_id, stream_partition, timestamp,
         #  ttl, offset, previous_offset, content_type, content]
@@ -159,11 +245,18 @@ class StreamMessage(EqualFunc):
 
     def is_bye_message(self):
         """
-        test whether the message is a BYE message
+        test whether the message is a BYE message. a content without the BYE
+        key in its text is not parsed
         :return: bool
         """
-        bye = self.get_parsed_content().get(StreamMessageConstant.BYE, False)
-        return bye
+        if self._content_slice is not None:
+            frame, start, end = self._content_slice
+            if frame.find(StreamMessageConstant.BYE, start, end) == -1:
+                return False
+        elif isinstance(self._content, str) and StreamMessageConstant.BYE not in self._content:
+            return False
+        content = self.get_parsed_content()
+        return isinstance(content, dict) and content.get(StreamMessageConstant.BYE, False)
 
 
 class StreamAndPartition(EqualFunc):
@@ -171,6 +264,8 @@ class StreamAndPartition(EqualFunc):
     StreamAndPartition class
     """
 
+    __slots__ = ('stream_id', 'stream_partition')
+
     def __init__(self, stream_id, stream_partition):
         self.stream_id = stream_id
         self.stream_partition = stream_partition
@@ -189,7 +284,7 @@ class StreamAndPartition(EqualFunc):
         serialize StreamAndPartition
         :return: str
         """
-        return json.dumps(self.to_object())
+        return get_codec().dumps(self.to_object())
 
     @classmethod
     def deserialize(cls, msg):
@@ -209,6 +304,8 @@ class ResendResponsePayload(StreamAndPartition):
     ResendResponsePayload class
     """
 
+    __slots__ = ('sub_id',)
+
     def __init__(self, stream_id, stream_partition, sub_id):
         super().__init__(stream_id, stream_partition)
         self.sub_id = sub_id
@@ -241,6 +338,8 @@ class ErrorPayload(EqualFunc):
     ErrorPayload class
     """
 
+    __slots__ = ('error',)
+
     def __init__(self, error_string):
         self.error = error_string
 
@@ -261,6 +360,6 @@ class ErrorPayload(EqualFunc):
         msg = jparser(msg)
         if not msg.get(ErrorPayloadConstant.ERROR, False):
             raise ValueError('Invalid error payload. received : %s' %
-                             (json.dumps(msg)))
+                             (get_codec().dumps(msg)))
         else:
             return ErrorPayload(msg[ErrorPayloadConstant.ERROR])
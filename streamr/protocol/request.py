@@ -3,18 +3,19 @@ This doc provides the request classes
 """
 
 
-import json
-
 from streamr.util.compare import EqualFunc
 from streamr.util.option import Option
 from streamr.util.constant import RequestConstant
+from streamr.protocol.util.codec import get_codec
 from streamr.protocol.util.parser import jparser, tparser
 from streamr.protocol.util.meta import RequestMeta
+from streamr.protocol.util.content import ContentType, get_content_decoder, get_content_encoder
 from streamr.protocol.errors.error import UnsupportedVersionError
 
 
 __all__ = ['Request', 'PublishRequest', 'ResendRequest',
-           'SubscribeRequest', 'UnsubscribeRequest']
+           'SubscribeRequest', 'UnsubscribeRequest', 'PublishSerializer',
+           'get_publish_serializer', 'invalidate_publish_serializers']
 
 
 class Request(EqualFunc, metaclass=RequestMeta):
@@ -22,6 +23,11 @@ class Request(EqualFunc, metaclass=RequestMeta):
     base class of request
     """
 
+    __slots__ = ('request_type', 'stream_id', 'api_key', 'session_token')
+
+    # the content of a PublishRequest and the Option of a ResendRequest are not hashable
+    hash_fields = ('request_type', 'stream_id', 'api_key', 'session_token')
+
     def __init__(self, request_type, stream_id=None, api_key=None, session_token=None):
 
         self.request_type = request_type
@@ -39,12 +45,13 @@ class Request(EqualFunc, metaclass=RequestMeta):
                 RequestConstant.API_KEY: self.api_key,
                 RequestConstant.SESSION_TOKEN: self.session_token}
 
-    def serialize(self):
+    def serialize(self, codec=None):
         """
         convert Request to str
-        :return: str
+        :param codec: codec to use instead of the json one, e.g. msgpack
+        :return: str, or bytes for a binary codec
         """
-        return json.dumps(self.to_object())
+        return (codec or get_codec()).dumps(self.to_object())
 
     @classmethod
     def check_version(cls, msg):
@@ -76,15 +83,20 @@ class PublishRequest(Request):
     Publish request class
     """
 
+    __slots__ = ('content', 'timestamp', 'partition_key', 'publisher_address',
+                 'signature_type', 'signature', 'content_type')
+
     TYPE = 'publish'
 
     def __init__(self, stream_id, api_key, session_token, content,
                  timestamp=None, partition_key=None,
                  publisher_address=None, signature_type=None,
-                 signature=None):
+                 signature=None, content_type=ContentType.JSON):
         super().__init__(self.TYPE, stream_id, api_key, session_token)
         if content is None:
             raise ValueError('No content given')
+        if content_type != ContentType.JSON and get_content_encoder(content_type) is None:
+            raise ValueError('Unknown content type: %s' % content_type)
 
         self.content = content
         self.timestamp = timestamp
@@ -92,6 +104,7 @@ class PublishRequest(Request):
         self.publisher_address = publisher_address
         self.signature_type = signature_type
         self.signature = signature
+        self.content_type = content_type
 
     def get_timestamp_as_number(self):
         """
@@ -102,26 +115,45 @@ class PublishRequest(Request):
             return tparser(self.timestamp)
         return None
 
-    def get_serialized_content(self):
+    def get_serialized_content(self, binary=False):
         """
-        serialize content
-        :return: str
+        serialize content. only json content goes through the json codec
+        :param binary: whether the request is sent in a binary wire format,
+                       raw content is then kept as bytes
+        :return: str, or bytes for raw content with binary
         """
+        if self.content_type != ContentType.JSON:
+            return get_content_encoder(self.content_type)(self.content, binary)
         if isinstance(self.content, str):
             return self.content
         elif isinstance(self.content, (list, dict)):
-            return json.dumps(self.content)
+            return get_codec().dumps(self.content)
 
         raise ValueError('Stream payload can only be object')
 
-    def to_object(self):
+    def serialize(self, codec=None):
+        """
+        convert PublishRequest to str with the cached serializer of its stream
+        :param codec: codec to use instead of the json one, e.g. msgpack
+        :return: str, or bytes for a binary codec
+        """
+        codec = codec or get_codec()
+        if codec.BINARY:
+            return codec.dumps(self.to_object(True))
+        return get_publish_serializer(self.stream_id, self.api_key, self.session_token, codec).serialize(self)
+
+    def to_object(self, binary=False):
         """
         convert PublishRequest to object
+        :param binary: keep raw content as bytes for a binary wire format
         :return: dict
         """
+        content = {RequestConstant.SERIALIZED_CONTENT: self.get_serialized_content(binary)}
+        if self.content_type != ContentType.JSON:
+            content[RequestConstant.CONTENT_TYPE] = self.content_type
         return {**super().to_object(),
-                **{RequestConstant.SERIALIZED_CONTENT: self.get_serialized_content(),
-                   RequestConstant.TIMESTAMP: self.get_timestamp_as_number(),
+                **content,
+                **{RequestConstant.TIMESTAMP: self.get_timestamp_as_number(),
                    RequestConstant.PARTITION_KEY: self.partition_key,
                    RequestConstant.PUBLISHER_ADDRESS: self.publisher_address,
                    RequestConstant.SIGNATURE_TYPE: self.signature_type,
@@ -134,21 +166,31 @@ class PublishRequest(Request):
         :param msg: dict
         :return: list
         """
+        content = msg.get(RequestConstant.SERIALIZED_CONTENT, None)
+        content_type = msg.get(RequestConstant.CONTENT_TYPE, ContentType.JSON)
+        decoder = get_content_decoder(content_type)
+        if content is not None and decoder is not None:
+            # e.g. raw content arrives base64 encoded in a json frame
+            content = decoder(content)
         return [msg.get(RequestConstant.STREAM_ID, None),
                 msg.get(RequestConstant.API_KEY, None),
                 msg.get(RequestConstant.SESSION_TOKEN, None),
-                msg.get(RequestConstant.SERIALIZED_CONTENT, None),
+                content,
                 msg.get(RequestConstant.TIMESTAMP, None),
                 msg.get(RequestConstant.PARTITION_KEY, None),
                 msg.get(RequestConstant.PUBLISHER_ADDRESS, None),
                 msg.get(RequestConstant.SIGNATURE_TYPE, None),
-                msg.get(RequestConstant.SIGNATURE, None)]
+                msg.get(RequestConstant.SIGNATURE, None),
+                content_type]
 
 
 class ResendRequest(Request):
     """
     Resend Request
     """
+
+    __slots__ = ('stream_partition', 'sub_id', 'resend_option')
+
     TYPE = 'resend'
 
     def __init__(self, stream_id, stream_partition=0, sub_id=None,
@@ -157,7 +199,8 @@ class ResendRequest(Request):
         super().__init__(self.TYPE, stream_id, api_key, session_token)
 
         if not isinstance(resend_option, Option) or \
-                (not resend_option.resend_all and not resend_option.resend_from_time):
+                (not resend_option.resend_all and not resend_option.resend_from_time and
+                 resend_option.resend_from is None and resend_option.resend_last is None):
             raise ValueError('Invalid resend option')
 
         if not sub_id:
@@ -196,6 +239,9 @@ class SubscribeRequest(Request):
     """
     Subscribe Request
     """
+
+    __slots__ = ('stream_partition',)
+
     TYPE = 'subscribe'
 
     def __init__(self, stream_id, stream_partition=0, api_key=None, session_token=None):
@@ -228,6 +274,9 @@ class UnsubscribeRequest(Request):
     """
     Unsubscribe Request class
     """
+
+    __slots__ = ('stream_partition',)
+
     TYPE = 'unsubscribe'
 
     def __init__(self, stream_id, stream_partition=0, api_key=None, session_token=None):
@@ -253,3 +302,103 @@ class UnsubscribeRequest(Request):
                 msg.get(RequestConstant.STREAM_PARTITION, None),
                 msg.get(RequestConstant.API_KEY, None),
                 msg.get(RequestConstant.SESSION_TOKEN, None)]
+
+
+class PublishSerializer:
+    """
+    serializer of PublishRequest frames for one stream, api key and session token.
+    the invariant part of the frame is encoded once, only the content,
+    timestamp, partition key and signature fields are encoded per publish
+    """
+
+    def __init__(self, stream_id, api_key, session_token, codec):
+        self.codec = codec
+        sample = codec.dumps({'a': 1, 'b': 2})
+        key_separator = sample[4:sample.index('1')]
+        self.item_separator = sample[sample.index('1') + 1:sample.index('"b"')]
+
+        def key(name):
+            return self.item_separator + codec.dumps(name) + key_separator
+
+        self.content_type_key = key(RequestConstant.CONTENT_TYPE)
+        self.head = '{' + codec.dumps(RequestConstant.TYPE) + key_separator + codec.dumps(PublishRequest.TYPE) + \
+            key(RequestConstant.STREAM_ID) + codec.dumps(stream_id) + \
+            key(RequestConstant.API_KEY) + codec.dumps(api_key) + \
+            key(RequestConstant.SESSION_TOKEN) + codec.dumps(session_token) + \
+            key(RequestConstant.SERIALIZED_CONTENT)
+        self.timestamp_key = key(RequestConstant.TIMESTAMP)
+        self.partition_key_key = key(RequestConstant.PARTITION_KEY)
+        self.publisher_address_key = key(RequestConstant.PUBLISHER_ADDRESS)
+        self.signature_type_key = key(RequestConstant.SIGNATURE_TYPE)
+        self.signature_key = key(RequestConstant.SIGNATURE)
+        self.unsigned_tail = self.publisher_address_key + 'null' + \
+            self.signature_type_key + 'null' + self.signature_key + 'null}'
+
+    def literal(self, value):
+        """
+        encode a single json value
+        :param value: None, int, float or str
+        :return: str
+        """
+        if value is None:
+            return 'null'
+        if type(value) is int:
+            return str(value)
+        if type(value) is str:
+            return self.codec.dumps_str(value)
+        return self.codec.dumps(value)
+
+    def serialize(self, request):
+        """
+        convert a PublishRequest to str
+        :param request: PublishRequest for the stream of this serializer
+        :return: str
+        """
+        frame = self.head + self.codec.dumps_str(request.get_serialized_content())
+        if request.content_type != ContentType.JSON:
+            frame += self.content_type_key + self.literal(request.content_type)
+        frame += self.timestamp_key + self.literal(request.get_timestamp_as_number()) + \
+            self.partition_key_key + self.literal(request.partition_key)
+        if request.publisher_address is None and request.signature_type is None and request.signature is None:
+            return frame + self.unsigned_tail
+        return frame + self.publisher_address_key + self.literal(request.publisher_address) + \
+            self.signature_type_key + self.literal(request.signature_type) + \
+            self.signature_key + self.literal(request.signature) + '}'
+
+
+MAX_PUBLISH_SERIALIZERS = 1024
+
+_publish_serializers = {}
+
+
+def get_publish_serializer(stream_id, api_key, session_token, codec=None):
+    """
+    return the cached serializer for a stream, api key and session token
+    :param stream_id: str
+    :param api_key: str
+    :param session_token: str
+    :param codec: json codec, the current one by default
+    :return: PublishSerializer
+    """
+    codec = codec or get_codec()
+    key = (stream_id, api_key, session_token, codec.NAME)
+    serializer = _publish_serializers.get(key, None)
+    if serializer is None or serializer.codec is not codec:
+        if len(_publish_serializers) >= MAX_PUBLISH_SERIALIZERS:
+            _publish_serializers.clear()
+        serializer = PublishSerializer(stream_id, api_key, session_token, codec)
+        _publish_serializers[key] = serializer
+    return serializer
+
+
+def invalidate_publish_serializers(session_token=None):
+    """
+    drop the cached serializers of a session token, e.g. after it was rotated
+    :param session_token: str, or None to drop all of them
+    :return: None
+    """
+    if session_token is None:
+        _publish_serializers.clear()
+        return
+    for key in [key for key in _publish_serializers if key[2] == session_token]:
+        _publish_serializers.pop(key, None)
@@ -2,12 +2,12 @@
 This doc provides the response classes
 """
 
-import json
-
 from streamr.util.compare import EqualFunc
 from streamr.protocol.payload import StreamMessage, StreamAndPartition, ResendResponsePayload, ErrorPayload
 from streamr.protocol.util.meta import ResponseMeta
+from streamr.protocol.util.codec import get_codec
 from streamr.protocol.util.parser import jparser
+from streamr.protocol.util.frame import split_message_frame
 from streamr.protocol.errors.error import UnSupportedPayloadError, AbstractFunctionError, UnsupportedVersionError
 
 
@@ -22,6 +22,8 @@ class Response(EqualFunc, metaclass=ResponseMeta):
     Response class
     """
 
+    __slots__ = ('response_type', 'payload', 'sub_id')
+
     def __init__(self, response_type, payload=None, sub_id=None):
         self.response_type = response_type
         self.payload = payload
@@ -48,26 +50,32 @@ class Response(EqualFunc, metaclass=ResponseMeta):
         """
         raise AbstractFunctionError(type(cls))
 
-    def to_object(self, version=0, payload_version=28):
+    def to_object(self, version=0, payload_version=28, parsed_content=False):
         """
         convert Response to dict
         :param version: 0 by default
         :param payload_version: 28 or 29
+        :param parsed_content: embed the parsed content of a StreamMessage payload
         :return: dict
         """
         if version == 0:
-            return [version, self.response_type, self.sub_id, self.payload.to_object(payload_version)]
+            payload = self.payload.to_object(payload_version, True) if parsed_content \
+                else self.payload.to_object(payload_version)
+            return [version, self.response_type, self.sub_id, payload]
         else:
             raise UnsupportedVersionError(version, 'Supported versions: [0]')
 
-    def serialize(self, version=0, payload_version=28):
+    def serialize(self, version=0, payload_version=28, codec=None):
         """
         serialize Response object
         :param version: 0 by default
         :param payload_version: 28 or 29
-        :return: str
+        :param codec: codec to use instead of the json one, e.g. msgpack
+        :return: str, or bytes for a binary codec
         """
-        return json.dumps(self.to_object(version, payload_version))
+        codec = codec or get_codec()
+        parsed_content = codec.BINARY and isinstance(self.payload, StreamMessage)
+        return codec.dumps(self.to_object(version, payload_version, parsed_content))
 
     @classmethod
     def check_version(cls, version):
@@ -81,14 +89,34 @@ class Response(EqualFunc, metaclass=ResponseMeta):
 
     # [version, response_type, sub_id, payload]
     @classmethod
-    def deserialize(cls, ori_msg):
+    def deserialize(cls, ori_msg, content_slice=False, codec=None):
         """
         deserialize from msg to response object
-        :param ori_msg: str or dict
+        :param ori_msg: str or dict, or bytes for a binary codec
+        :param content_slice: keep the content of data frames as a slice of ori_msg
+        :param codec: codec to use instead of the json one, e.g. msgpack
         :return: response object
         """
-        version, response_type, sub_id, payload_msg = jparser(ori_msg)
+        if content_slice and isinstance(ori_msg, str):
+            split = split_message_frame(ori_msg)
+            if split is not None:
+                return decode_sliced_message(ori_msg, *split)
+
+        version, response_type, sub_id, payload_msg = jparser(ori_msg, codec)
         cls.check_version(version)
+        if response_type in MESSAGE_RESPONSE_TYPES:
+            return decode_message(response_type, sub_id, jparser(payload_msg, codec))
+        return cls.deserialize_payload(response_type, sub_id, payload_msg)
+
+    @classmethod
+    def deserialize_payload(cls, response_type, sub_id, payload_msg):
+        """
+        generic path: look up the response class and validate its payload
+        :param response_type: int
+        :param sub_id: str or None
+        :param payload_msg: list or dict
+        :return: response object
+        """
         response_class = cls.response_class_by_response_type[response_type]
         payload = response_class.get_payload_class().deserialize(payload_msg)
         args = response_class.get_constructor_arguments(sub_id, payload)
@@ -99,6 +127,8 @@ class BroadcastMessage(Response):
     """
     BroadcastMessage response class
     """
+
+    __slots__ = ()
     TYPE = 0
 
     def __init__(self, payload):
@@ -135,6 +165,8 @@ class ErrorResponse(Response):
     """
     Error response class
     """
+
+    __slots__ = ()
     TYPE = 7
 
     def __init__(self, payload):
@@ -172,6 +204,8 @@ class ResendResponse(Response):
     ResendResponse class
     """
 
+    __slots__ = ()
+
     def __init__(self, response_type, stream_id, stream_partition, sub_id):
         super().__init__(response_type, ResendResponsePayload(stream_id, stream_partition, sub_id))
 
@@ -198,6 +232,8 @@ class ResendResponseNoResend(ResendResponse):
     """
     ResendResponseNoResend class
     """
+
+    __slots__ = ()
     TYPE = 6
 
     def __init__(self, stream_id, stream_partition, sub_id):
@@ -216,6 +252,8 @@ class ResendResponseResending(ResendResponse):
     """
     ResendResponseResending class
     """
+
+    __slots__ = ()
     TYPE = 4
 
     def __init__(self, stream_id, stream_partition, sub_id):
@@ -234,6 +272,8 @@ class ResendResponseResent(ResendResponse):
     """
     ResendResponseResent class
     """
+
+    __slots__ = ()
     TYPE = 5
 
     def __init__(self, stream_id, stream_partition, sub_id):
@@ -252,6 +292,8 @@ class SubscribeResponse(Response):
     """
     SubscribeResponse class
     """
+
+    __slots__ = ()
     TYPE = 2
 
     def __init__(self, stream_id, stream_partition=0):
@@ -288,6 +330,8 @@ class UnicastMessage(Response):
     """
     UnicastMessage class
     """
+
+    __slots__ = ()
     TYPE = 1
 
     def __init__(self, payload, sub_id):
@@ -324,6 +368,8 @@ class UnsubscribeResponse(Response):
     """
     UnsubscribeResponse class
     """
+
+    __slots__ = ()
     TYPE = 3
 
     def __init__(self, stream_id, stream_partition=0):
@@ -354,3 +400,51 @@ class UnsubscribeResponse(Response):
         :return: list
         """
         return [payload.stream_id, payload.stream_partition]
+
+
+# BroadcastMessage and UnicastMessage, which carry almost all of the traffic
+MESSAGE_RESPONSE_TYPES = (BroadcastMessage.TYPE, UnicastMessage.TYPE)
+MESSAGE_VERSIONS = (28, 29)
+
+
+def decode_message(response_type, sub_id, payload_msg):
+    """
+    fast path for data frames: build the StreamMessage straight from the
+    frame list, skipping the class lookup and payload isinstance check.
+    the content is left unparsed until get_parsed_content is called
+    :param response_type: BroadcastMessage.TYPE or UnicastMessage.TYPE
+    :param sub_id: str or None
+    :param payload_msg: list [version, stream_id, ...]
+    :return: BroadcastMessage or UnicastMessage
+    """
+    if payload_msg[0] not in MESSAGE_VERSIONS:
+        raise UnsupportedVersionError(payload_msg[0], 'Supported version: [ 28, 29]')
+    return _wrap_message(response_type, sub_id, StreamMessage(*payload_msg[1:]))
+
+
+def decode_sliced_message(frame, response_type, sub_id, fields, content_start, content_end):
+    """
+    build a data frame whose content stays a slice of the frame until it is used
+    :param frame: str
+    :param response_type: BroadcastMessage.TYPE or UnicastMessage.TYPE
+    :param sub_id: str or None
+    :param fields: StreamMessage constructor arguments
+    :param content_start: index of the first character of the escaped content
+    :param content_end: index of the closing quote of the content
+    :return: BroadcastMessage or UnicastMessage
+    """
+    payload = StreamMessage(*fields)
+    payload.set_content_slice(frame, content_start, content_end)
+    return _wrap_message(response_type, sub_id, payload)
+
+
+def _wrap_message(response_type, sub_id, payload):
+    if response_type == BroadcastMessage.TYPE:
+        msg = object.__new__(BroadcastMessage)
+        msg.sub_id = None
+    else:
+        msg = object.__new__(UnicastMessage)
+        msg.sub_id = sub_id
+    msg.response_type = response_type
+    msg.payload = payload
+    return msg
@@ -0,0 +1,321 @@
+"""
+provide TableSink, a subscription sink accumulating messages as columns
+for Arrow and pandas
+
+the sink keeps the timestamp, offset and previous offset of the messages
+and one column per content field. the fields and their types come from the
+stream field config, or are inferred from the first received messages.
+the json contents of a batch are decoded by a single codec call and the
+columns are filled one field at a time, instead of a callback handling a
+dict per message. numbers, timestamps and offsets are kept in typed arrays
+which numpy and Arrow wrap without a copy.
+
+numpy, pyarrow and pandas are optional dependencies, each is only needed
+by the export method using it
+"""
+
+
+import json
+from array import array
+from collections import OrderedDict
+
+from streamr.protocol.errors.error import InvalidJsonError
+from streamr.protocol.schema import ContentSchema
+from streamr.protocol.util.codec import get_codec
+from streamr.protocol.util.content import ContentType, get_content_decoder
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+__all__ = ['TableSink']
+
+
+METADATA_COLUMNS = ('timestamp', 'offset', 'previous_offset')
+
+NAN = float('nan')
+
+# value types a column of a field type stores without checking each value
+ALLOWED_TYPES = {'number': {int, float},
+                 'boolean': {bool, type(None)},
+                 'string': {str, type(None)}}
+
+
+def _field_type(value):
+    if type(value) is bool:
+        return 'boolean'
+    if type(value) in (int, float):
+        return 'number'
+    if type(value) is str:
+        return 'string'
+    if isinstance(value, dict):
+        return 'map'
+    if isinstance(value, list):
+        return 'list'
+    return None
+
+
+def infer_fields(contents):
+    """
+    infer a field config from parsed contents. fields are ordered by first
+    appearance, a field seen with several types gets the type 'any'
+    :param contents: list of parsed contents
+    :return: list of {'name': str, 'type': str}, empty when no content is an object
+    """
+    type_by_name = OrderedDict()
+    for content in contents:
+        if not isinstance(content, dict):
+            continue
+        for name, value in content.items():
+            value_type = _field_type(value)
+            known = type_by_name.get(name, None)
+            if known is None:
+                type_by_name[name] = value_type
+            elif value_type is not None and value_type != known:
+                type_by_name[name] = 'any'
+    return [{'name': name, 'type': value_type or 'any'} for name, value_type in type_by_name.items()]
+
+
+def parse_contents(stream_id, contents, content_types):
+    """
+    parse the contents of messages, the json ones by a single codec call
+    :param stream_id: str, for the error of an invalid content
+    :param contents: list of contents
+    :param content_types: list of int
+    :return: list of parsed contents
+    """
+    codec = get_codec()
+    texts = [content for content, content_type in zip(contents, content_types)
+             if content_type == ContentType.JSON and type(content) is str]
+    parsed = iter(())
+    if texts:
+        try:
+            values = codec.loads('[' + ','.join(texts) + ']')
+            parsed = iter(values) if len(values) == len(texts) else None
+        except codec.decode_error:
+            parsed = None
+        if parsed is None:
+            # an invalid content breaks or shifts the joined array, parse one by one to find it
+            values = []
+            for text in texts:
+                try:
+                    values.append(codec.loads(text))
+                except codec.decode_error as e:
+                    raise InvalidJsonError(stream_id, text, e, None)
+            parsed = iter(values)
+    if len(texts) == len(contents):
+        return list(parsed)
+    result = []
+    for content, content_type in zip(contents, content_types):
+        if content_type != ContentType.JSON:
+            decoder = get_content_decoder(content_type)
+            if decoder is None:
+                raise ValueError('content type: %s cannot be parsed.' % content_type)
+            result.append(decoder(content))
+        elif type(content) is str:
+            result.append(next(parsed))
+        else:
+            result.append(content)
+    return result
+
+
+class TableSink:
+    """
+    accumulates the messages of a subscription as columns.
+    pass add_batch as batch_callback of a subscription, or the sink itself
+    as callback, and flush the columns with to_arrow, to_pandas or to_columns
+    """
+
+    def __init__(self, schema=None, infer_rows=100):
+        """
+        init function
+        :param schema: ContentSchema of the content, e.g. from Client.get_content_schema.
+                       inferred from the first infer_rows messages when None
+        :param infer_rows: number of messages the schema is inferred from
+        """
+        if not isinstance(infer_rows, int) or infer_rows <= 0:
+            raise ValueError('infer_rows should be a positive int. Given : %s' % infer_rows)
+        self.infer_rows = infer_rows
+        self.schema = None
+        self.names = ()
+        self.checks = ()
+        self.whole_content = False
+        self.pending = []
+        self.columns = []
+        self.timestamps = array('q')
+        self.offsets = array('q')
+        self.previous_offsets = array('q')
+        if schema is not None:
+            self.set_schema(schema)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def set_schema(self, schema):
+        """
+        set the content schema and move the messages received before into the columns
+        :param schema: ContentSchema, or None for a single 'content' column
+                       holding the whole contents
+        :return: None
+        """
+        self.whole_content = schema is None
+        if schema is None:
+            schema = ContentSchema([{'name': 'content', 'type': 'any'}])
+        self.schema = schema
+        self.names = tuple('content.' + name if name in METADATA_COLUMNS else name for name in schema.names)
+        self.checks = schema.checks
+        self.columns = [self.new_column(field_type) for field_type in schema.types]
+        pending, self.pending = self.pending, []
+        self.append_contents(pending)
+
+    @staticmethod
+    def new_column(field_type):
+        return array('d') if field_type == 'number' else []
+
+    def infer_schema(self):
+        """
+        infer the schema from the first messages received
+        :return: None
+        """
+        fields = infer_fields(self.pending[:self.infer_rows])
+        self.set_schema(ContentSchema(fields) if fields else None)
+
+    def append_contents(self, contents):
+        """
+        append the fields of parsed contents to the columns, one field at a
+        time. values not matching the type of their field are stored as missing
+        :param contents: list of dict or other json values
+        :return: None
+        """
+        if self.whole_content:
+            self.columns[0].extend(contents)
+            return
+        for name, field_type, check, column in zip(self.schema.names, self.schema.types,
+                                                   self.checks, self.columns):
+            values = [content.get(name, None) if type(content) is dict else None for content in contents]
+            allowed = ALLOWED_TYPES.get(field_type, None)
+            if allowed is None or set(map(type, values)) <= allowed:
+                column.extend(values)
+            else:
+                missing = NAN if field_type == 'number' else None
+                column.extend([value if value is not None and check(value) else missing for value in values])
+
+    def add(self, timestamps, offsets, previous_offsets, contents):
+        """
+        add parsed messages
+        :param timestamps: list of int, milliseconds
+        :param offsets: list of int
+        :param previous_offsets: list of int or None
+        :param contents: list of parsed contents
+        :return: None
+        """
+        self.timestamps.extend(timestamps)
+        self.offsets.extend(offsets)
+        self.previous_offsets.extend([-1 if offset is None else offset for offset in previous_offsets])
+        if self.schema is not None:
+            self.append_contents(contents)
+            return
+        self.pending.extend(contents)
+        if len(self.pending) >= self.infer_rows:
+            self.infer_schema()
+
+    def __call__(self, content, msg):
+        """
+        subscription callback
+        :param content: parsed content, dict or record
+        :param msg: StreamMessage
+        :return: None
+        """
+        if hasattr(content, '_asdict'):
+            content = content._asdict()
+        self.add((msg.timestamp,), (msg.offset,), (msg.previous_offset,), (content,))
+
+    def add_batch(self, batch):
+        """
+        subscription batch callback. the json contents of the batch are
+        decoded by one call of the codec
+        :param batch: MessageBatch
+        :return: None
+        """
+        self.add(batch.timestamps, batch.offsets, batch.previous_offsets,
+                 parse_contents(batch.stream_id, batch.contents, batch.content_types))
+
+    def flush(self):
+        """
+        take the accumulated columns and start new ones. without messages to
+        infer the schema from, there are no content columns yet
+        :return: (timestamps, offsets, previous_offsets, content columns) arrays and lists
+        """
+        if self.schema is None and self.pending:
+            self.infer_schema()
+        flushed = (self.timestamps, self.offsets, self.previous_offsets, self.columns)
+        self.timestamps, self.offsets, self.previous_offsets = array('q'), array('q'), array('q')
+        if self.schema is not None:
+            self.columns = [self.new_column(field_type) for field_type in self.schema.types]
+        return flushed
+
+    def to_columns(self):
+        """
+        flush the accumulated messages as numpy arrays, without copying the
+        typed arrays. timestamp is datetime64[ms], a missing previous offset
+        is -1 and a missing number is nan; the other fields are lists
+        :return: OrderedDict of column name to numpy array or list
+        """
+        if np is None:
+            raise ImportError('numpy is required for columnar message export')
+        timestamps, offsets, previous_offsets, contents = self.flush()
+        columns = OrderedDict([('timestamp', np.frombuffer(timestamps, dtype=np.int64).view('datetime64[ms]')),
+                               ('offset', np.frombuffer(offsets, dtype=np.int64)),
+                               ('previous_offset', np.frombuffer(previous_offsets, dtype=np.int64))])
+        for name, column in zip(self.names, contents):
+            columns[name] = np.frombuffer(column, dtype=np.float64) if type(column) is array else column
+        return columns
+
+    def to_arrow(self):
+        """
+        flush the accumulated messages as an Arrow record batch. timestamps,
+        offsets and numbers are wrapped without a copy; map, list and any
+        fields are stored as json strings
+        :return: pyarrow.RecordBatch
+        """
+        if pa is None:
+            raise ImportError('pyarrow is required for Arrow export')
+        columns = self.to_columns()
+        types = self.schema.types if self.schema is not None else ()
+        previous_offset = columns['previous_offset']
+        arrays = [pa.array(columns['timestamp']),
+                  pa.array(columns['offset']),
+                  pa.array(previous_offset, mask=previous_offset < 0)]
+        for name, field_type in zip(self.names, types):
+            column = columns[name]
+            if field_type == 'number':
+                arrays.append(pa.array(column, from_pandas=True))
+            elif field_type == 'boolean':
+                arrays.append(pa.array(column, type=pa.bool_()))
+            elif field_type == 'string':
+                arrays.append(pa.array(column, type=pa.string()))
+            else:
+                arrays.append(pa.array([value if value is None or type(value) is str else json.dumps(value)
+                                        for value in column], type=pa.string()))
+        return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+    def to_pandas(self):
+        """
+        flush the accumulated messages as a DataFrame
+        :return: pandas.DataFrame
+        """
+        if pd is None:
+            raise ImportError('pandas is required for DataFrame export')
+        return pd.DataFrame(self.to_columns(), copy=False)
@@ -3,4 +3,5 @@ protocol.util package
 
 meta module: Meta class for creating the class of request and response
 parser module: the parser of timestamp and json
+codec module: the pluggable json codecs used by parser and serialize
 """
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""
+provide the json codecs used to encode and decode messages
+
+the stdlib json module is always available and is used by default.
+orjson, rapidjson and ujson are used when they are installed and selected,
+either by name or by 'auto' which picks the fastest one available.
+
+msgpack is registered as a binary codec. it is only used for the wire
+format of a connection that negotiated it, never for message content.
+"""
+
+
+import json
+from json.encoder import encode_basestring_ascii
+
+from streamr.protocol.errors.error import AbstractFunctionError
+
+
+__all__ = ['JsonCodec', 'StdlibCodec', 'OrjsonCodec', 'RapidjsonCodec',
+           'UjsonCodec', 'MsgpackCodec', 'register_codec', 'get_codec', 'set_codec',
+           'available_codecs']
+
+
+class JsonCodec:
+    """
+    base class of json codec
+    """
+
+    NAME = None
+
+    # whether dumps returns bytes to be sent in binary websocket frames
+    BINARY = False
+
+    # exception raised by loads when the input is not valid json
+    decode_error = ValueError
+
+    @classmethod
+    def is_available(cls):
+        """
+        whether the backing library can be imported
+        :return: bool
+        """
+        return True
+
+    def loads(self, msg):
+        """
+        decode a json str or bytes
+        :param msg: str or bytes
+        :return: list or dict
+        """
+        raise AbstractFunctionError(type(self))
+
+    def dumps(self, obj):
+        """
+        encode an object to a json str
+        :param obj: list or dict
+        :return: str
+        """
+        raise AbstractFunctionError(type(self))
+
+    def load(self, fp):
+        """
+        decode the content of a file-like object
+        :param fp: object with a read method
+        :return: list or dict
+        """
+        return self.loads(fp.read())
+
+    def dumps_str(self, value):
+        """
+        encode a single str to a json string literal
+        :param value: str
+        :return: str
+        """
+        return self.dumps(value)
+
+
+class StdlibCodec(JsonCodec):
+    """
+    codec backed by the json module of the standard library
+    """
+
+    NAME = 'json'
+
+    decode_error = json.JSONDecodeError
+
+    def loads(self, msg):
+        """
+        decode a json str or bytes
+        :param msg: str or bytes
+        :return: list or dict
+        """
+        return json.loads(msg)
+
+    def dumps(self, obj):
+        """
+        encode an object to a json str
+        :param obj: list or dict
+        :return: str
+        """
+        return json.dumps(obj)
+
+    def load(self, fp):
+        """
+        decode the content of a file-like object
+        :param fp: object with a read method
+        :return: list or dict
+        """
+        return json.load(fp)
+
+    def dumps_str(self, value):
+        """
+        encode a single str to a json string literal, as dumps would
+        :param value: str
+        :return: str
+        """
+        return encode_basestring_ascii(value)
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    codec backed by orjson
+    """
+
+    NAME = 'orjson'
+
+    @classmethod
+    def is_available(cls):
+        """
+        whether orjson can be imported
+        :return: bool
+        """
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        import orjson
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+        self.decode_error = orjson.JSONDecodeError
+
+    def loads(self, msg):
+        """
+        decode a json str or bytes
+        :param msg: str or bytes
+        :return: list or dict
+        """
+        return self._loads(msg)
+
+    def dumps(self, obj):
+        """
+        encode an object to a json str
+        :param obj: list or dict
+        :return: str
+        """
+        return self._dumps(obj).decode('utf-8')
+
+
+class RapidjsonCodec(JsonCodec):
+    """
+    codec backed by python-rapidjson
+    """
+
+    NAME = 'rapidjson'
+
+    @classmethod
+    def is_available(cls):
+        """
+        whether rapidjson can be imported
+        :return: bool
+        """
+        try:
+            import rapidjson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        import rapidjson
+        self._loads = rapidjson.loads
+        self._dumps = rapidjson.dumps
+
+    def loads(self, msg):
+        """
+        decode a json str or bytes
+        :param msg: str or bytes
+        :return: list or dict
+        """
+        return self._loads(msg)
+
+    def dumps(self, obj):
+        """
+        encode an object to a json str
+        :param obj: list or dict
+        :return: str
+        """
+        return self._dumps(obj)
+
+
+class UjsonCodec(JsonCodec):
+    """
+    codec backed by ujson
+    """
+
+    NAME = 'ujson'
+
+    @classmethod
+    def is_available(cls):
+        """
+        whether ujson can be imported
+        :return: bool
+        """
+        try:
+            import ujson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        import ujson
+        self._loads = ujson.loads
+        self._dumps = ujson.dumps
+
+    def loads(self, msg):
+        """
+        decode a json str or bytes
+        :param msg: str or bytes
+        :return: list or dict
+        """
+        return self._loads(msg)
+
+    def dumps(self, obj):
+        """
+        encode an object to a json str
+        :param obj: list or dict
+        :return: str
+        """
+        return self._dumps(obj)
+
+
+class MsgpackCodec(JsonCodec):
+    """
+    binary codec backed by msgpack
+    """
+
+    NAME = 'msgpack'
+
+    BINARY = True
+
+    @classmethod
+    def is_available(cls):
+        """
+        whether msgpack can be imported
+        :return: bool
+        """
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self):
+        import msgpack
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+
+    def loads(self, msg):
+        """
+        decode msgpack bytes
+        :param msg: bytes
+        :return: list or dict
+        """
+        return self._unpackb(msg, raw=False)
+
+    def dumps(self, obj):
+        """
+        encode an object to msgpack bytes
+        :param obj: list or dict
+        :return: bytes
+        """
+        return self._packb(obj, use_bin_type=True)
+
+
+# registered codec classes, in order of preference for 'auto'
+codec_class_by_name = {}
+AUTO_PREFERENCE = ['orjson', 'rapidjson', 'ujson', 'json']
+
+_codec_by_name = {}
+_current_codec = StdlibCodec()
+
+
+def register_codec(clazz):
+    """
+    register a codec class under its NAME
+    :param clazz: subclass of JsonCodec
+    :return: the registered class
+    """
+    if not isinstance(clazz, type) or not issubclass(clazz, JsonCodec) or not clazz.NAME:
+        raise ValueError('codec should be a JsonCodec subclass with a NAME. Given : %s' % clazz)
+    codec_class_by_name[clazz.NAME] = clazz
+    _codec_by_name.pop(clazz.NAME, None)
+    return clazz
+
+
+for _clazz in (StdlibCodec, OrjsonCodec, RapidjsonCodec, UjsonCodec, MsgpackCodec):
+    register_codec(_clazz)
+
+
+def available_codecs(binary=False):
+    """
+    return the names of the registered codecs whose library is installed
+    :param binary: list the binary wire codecs instead of the json ones
+    :return: list of str
+    """
+    return [name for name, clazz in codec_class_by_name.items()
+            if clazz.BINARY == binary and clazz.is_available()]
+
+
+def get_codec(name=None):
+    """
+    return a codec instance
+    :param name: codec name, 'auto', or None for the codec currently in use
+    :return: JsonCodec
+    """
+    if name is None:
+        return _current_codec
+
+    if name == 'auto':
+        for candidate in AUTO_PREFERENCE:
+            clazz = codec_class_by_name.get(candidate, None)
+            if clazz is not None and clazz.is_available():
+                name = candidate
+                break
+
+    if name not in _codec_by_name:
+        clazz = codec_class_by_name.get(name, None)
+        if clazz is None:
+            raise ValueError('Unknown json codec: %s. Registered: %s' % (name, list(codec_class_by_name)))
+        if not clazz.is_available():
+            raise ValueError('json codec %s is registered but its library is not installed' % name)
+        _codec_by_name[name] = clazz()
+    return _codec_by_name[name]
+
+
+def set_codec(name):
+    """
+    select the codec used by jparser and every serialize() method
+    :param name: codec name, 'auto', or a JsonCodec instance
+    :return: the selected JsonCodec
+    """
+    global _current_codec
+    codec = name if isinstance(name, JsonCodec) else get_codec(name)
+    if codec.BINARY:
+        raise ValueError('%s is a binary wire codec and cannot be used for json' % codec.NAME)
+    _current_codec = codec
+    return _current_codec
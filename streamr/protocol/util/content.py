@@ -0,0 +1,113 @@
+"""
+provide the decoders and encoders of the content types other than json
+
+the content of a json message is parsed with the json codec. any other
+content type is handed to the decoder registered for it, so raw bytes and
+plain text never go through a json pass.
+
+on a binary wire format the content is carried as it is. a json text frame
+can only carry a string, so raw bytes are base64 encoded there.
+"""
+
+
+import base64
+
+
+__all__ = ['ContentType', 'register_content_type', 'unregister_content_type', 'get_content_decoder',
+           'get_content_encoder', 'registered_content_types']
+
+
+class ContentType:
+    """
+    store the constant value
+    """
+    JSON = 27
+    RAW = 30
+    TEXT = 31
+
+
+def _decode_raw(content):
+    if isinstance(content, (bytes, bytearray)):
+        return bytes(content)
+    return base64.b64decode(content)
+
+
+def _encode_raw(value, binary=False):
+    if not isinstance(value, (bytes, bytearray)):
+        raise ValueError('raw content should be bytes. Given : %s' % type(value))
+    if binary:
+        return bytes(value)
+    return base64.b64encode(value).decode('ascii')
+
+
+def _decode_text(content):
+    if isinstance(content, (bytes, bytearray)):
+        return bytes(content).decode('utf-8')
+    return content
+
+
+def _encode_text(value, binary=False):
+    if not isinstance(value, str):
+        raise ValueError('text content should be a str. Given : %s' % type(value))
+    return value
+
+
+_decoder_by_content_type = {}
+_encoder_by_content_type = {}
+
+
+def register_content_type(content_type, decoder, encoder):
+    """
+    register how a content type is decoded and encoded
+    :param content_type: int, different from ContentType.JSON
+    :param decoder: function(content) -> value, content is a str from a json
+                    frame or bytes from a binary frame
+    :param encoder: function(value, binary) -> str, or bytes when binary is True
+    :return: None
+    """
+    if content_type == ContentType.JSON:
+        raise ValueError('json content is decoded by the json codec, see set_codec')
+    if not hasattr(decoder, '__call__') or not hasattr(encoder, '__call__'):
+        raise ValueError('decoder and encoder should be callable')
+    _decoder_by_content_type[content_type] = decoder
+    _encoder_by_content_type[content_type] = encoder
+
+
+def unregister_content_type(content_type):
+    """
+    forget the decoder and encoder of a content type
+    :param content_type: int
+    :return: None
+    """
+    _decoder_by_content_type.pop(content_type, None)
+    _encoder_by_content_type.pop(content_type, None)
+
+
+def get_content_decoder(content_type):
+    """
+    return the decoder of a content type
+    :param content_type: int
+    :return: function or None if the content type is not registered
+    """
+    return _decoder_by_content_type.get(content_type, None)
+
+
+def get_content_encoder(content_type):
+    """
+    return the encoder of a content type
+    :param content_type: int
+    :return: function or None if the content type is not registered
+    """
+    return _encoder_by_content_type.get(content_type, None)
+
+
+def registered_content_types():
+    """
+    return the content types with a registered decoder
+    :return: list of int
+    """
+    return list(_decoder_by_content_type)
+
+
+register_content_type(ContentType.RAW, _decode_raw, _encode_raw)
+register_content_type(ContentType.TEXT, _decode_text, _encode_text)
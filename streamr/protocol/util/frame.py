@@ -0,0 +1,127 @@
+"""
+provide a scanner that splits a BroadcastMessage or UnicastMessage frame
+without decoding its content
+
+the content of a StreamMessage is a json string nested in the json frame.
+instead of decoding the whole frame, only the fields before and after the
+content are parsed and the content is kept as (start, end) offsets into
+the original frame, to be unescaped and parsed once when it is needed.
+
+the same header is used to peek at the routing fields of a frame so that
+duplicates can be dropped before the frame is decoded at all.
+"""
+
+
+import json
+import re
+
+
+__all__ = ['split_message_frame', 'unescape_content', 'peek_message_header']
+
+
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_NUMBER = r'null|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'
+
+# [0, type, sub_id, [version, stream_id, partition, timestamp, ttl, offset, previous_offset, content_type, "
+_HEADER = re.compile(
+    r'\s*\[\s*0\s*,\s*([01])\s*,\s*(null|' + _STRING + r')\s*,\s*'
+    r'\[\s*(28|29)\s*,\s*(' + _STRING + r')\s*,\s*(' + _NUMBER + r')\s*,\s*(' + _NUMBER + r')\s*,\s*'
+    r'(' + _NUMBER + r')\s*,\s*(' + _NUMBER + r')\s*,\s*(' + _NUMBER + r')\s*,\s*(\d+)\s*,\s*"')
+
+# "]] closing a version 28 payload
+_TAIL_28 = re.compile(r'"\s*\]\s*\]\s*$')
+
+# ", signature_type, address, signature]] closing a version 29 payload
+_TAIL_29 = re.compile(
+    r'"\s*,\s*(' + _NUMBER + r')\s*,\s*(null|"[^"\\]*")\s*,\s*(null|"[^"\\]*")\s*\]\s*\]\s*$')
+
+# the version 29 tail is looked for in the last TAIL_WINDOW characters only
+TAIL_WINDOW = 1024
+
+
+def _value(token):
+    if token == 'null':
+        return None
+    if token[0] == '"':
+        return token[1:-1] if '\\' not in token else json.loads(token)
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def _is_escaped(frame, index):
+    count = 0
+    index -= 1
+    while frame[index] == '\\':
+        count += 1
+        index -= 1
+    return count % 2 == 1
+
+
+def split_message_frame(frame):
+    """
+    parse the fields of a data frame, except its content
+    :param frame: str
+    :return: (response_type, sub_id, fields, content_start, content_end) or None
+             if the frame is not a data frame this scanner understands.
+             fields are the constructor arguments of StreamMessage with the
+             content left as None. frame[content_start:content_end] is the
+             still escaped content, without its quotes.
+    """
+    header = _HEADER.match(frame)
+    if header is None:
+        return None
+
+    content_start = header.end()
+    version = header.group(3)
+    if version == '28':
+        quote = frame.rfind('"')
+        if quote < content_start or _TAIL_28.match(frame, quote) is None or _is_escaped(frame, quote):
+            return None
+        tail = ()
+    else:
+        tail_match = None
+        pos = max(content_start, len(frame) - TAIL_WINDOW)
+        while True:
+            tail_match = _TAIL_29.search(frame, pos)
+            if tail_match is None or not _is_escaped(frame, tail_match.start()):
+                break
+            pos = tail_match.start() + 1
+        if tail_match is None:
+            return None
+        quote = tail_match.start()
+        tail = tuple(_value(token) for token in tail_match.groups())
+
+    fields = [_value(token) for token in header.group(4, 5, 6, 7, 8, 9, 10)]
+    fields.append(None)
+    fields.extend(tail)
+    return int(header.group(1)), _value(header.group(2)), fields, content_start, quote
+
+
+def peek_message_header(frame):
+    """
+    read the routing fields of a data frame without decoding it
+    :param frame: str
+    :return: (response_type, sub_id, stream_id, stream_partition, offset, previous_offset)
+             or None if the frame is not a data frame this scanner understands
+    """
+    header = _HEADER.match(frame)
+    if header is None:
+        return None
+    return (int(header.group(1)), _value(header.group(2)), _value(header.group(4)),
+            _value(header.group(5)), _value(header.group(8)), _value(header.group(9)))
+
+
+def unescape_content(frame, start, end):
+    """
+    unescape the content kept as a slice of the frame
+    :param frame: str
+    :param start: index of the first character of the content
+    :param end: index of the closing quote of the content
+    :return: str
+    """
+    content, stop = json.decoder.scanstring(frame, start)
+    if stop != end + 1:
+        raise ValueError('content string ends at %s, expected %s' % (stop - 1, end))
+    return content
@@ -0,0 +1,80 @@
+"""
+provide a bounded intern table for the identifiers repeated in messages
+
+every decoded frame carries a fresh copy of its stream id and publisher
+address although a subscription sees the same few values over and over.
+the decoders replace them with the copy kept in the intern table, so the
+messages held in queues and buffers share one string per value.
+
+sys.intern is not used since the strings it interns are never released,
+the table here is cleared when it reaches its size limit.
+"""
+
+
+__all__ = ['InternTable', 'intern_string', 'get_intern_table']
+
+
+MAX_INTERNED = 4096
+
+
+class InternTable:
+    """
+    bounded table of interned strings
+    """
+
+    def __init__(self, max_size=MAX_INTERNED):
+        """
+        init function
+        :param max_size: number of strings kept, 0 disables interning
+        """
+        if not isinstance(max_size, int) or max_size < 0:
+            raise ValueError('max_size should be a positive int. Given : %s' % max_size)
+        self.max_size = max_size
+        self.strings = {}
+
+    def intern(self, value):
+        """
+        return the interned copy of a string
+        :param value: str, other values are returned as they are
+        :return: str
+        """
+        interned = self.strings.get(value, None)
+        if interned is not None:
+            return interned
+        if type(value) is not str or self.max_size == 0:
+            return value
+        if len(self.strings) >= self.max_size:
+            self.strings.clear()
+        self.strings[value] = value
+        return value
+
+    def resize(self, max_size):
+        """
+        change the size limit and drop the interned strings
+        :param max_size: number of strings kept, 0 disables interning
+        :return: None
+        """
+        if not isinstance(max_size, int) or max_size < 0:
+            raise ValueError('max_size should be a positive int. Given : %s' % max_size)
+        self.max_size = max_size
+        self.strings = {}
+
+
+_table = InternTable()
+
+
+def get_intern_table():
+    """
+    return the intern table used by the decoders
+    :return: InternTable
+    """
+    return _table
+
+
+def intern_string(value):
+    """
+    intern a string with the table used by the decoders
+    :param value: str or None
+    :return: str or None
+    """
+    return _table.intern(value)
@@ -2,14 +2,19 @@
 Metaclass of Response and Request
 """
 
+from streamr.util.compare import EqualMeta
 
-class ResponseMeta(type):
+
+class ResponseMeta(EqualMeta):
     """
     Meta class of Response
     """
 
     response_class_by_response_type = {}
 
+    # the registered classes indexed by response type, None for unused types
+    response_classes = ()
+
     @classmethod
     def register(mcs, clazz, typez):
         """
@@ -19,6 +24,8 @@ class ResponseMeta(type):
         :return: None
         """
         mcs.response_class_by_response_type[typez] = clazz
+        mcs.response_classes = tuple(mcs.response_class_by_response_type.get(i, None)
+                                     for i in range(max(mcs.response_class_by_response_type) + 1))
 
     def __new__(mcs, name, base, attrs):
 
@@ -28,7 +35,7 @@ class ResponseMeta(type):
         return clazz
 
 
-class RequestMeta(type):
+class RequestMeta(EqualMeta):
     """
     Meta class of Request
     """
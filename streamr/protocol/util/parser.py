@@ -3,23 +3,25 @@ provide parser to parse json object and time object
 """
 
 
-import json
 import logging
 
+from streamr.protocol.util.codec import get_codec
+
 
 __all__ = ['jparser', 'tparser']
 
 
-def jparser(msg):
+def jparser(msg, codec=None):
     """
-    json parser
-    :param msg: str file list dict
+    json parser, decodes with the codec selected by set_codec
+    :param msg: str bytes file list dict
+    :param codec: codec to use instead, e.g. the binary codec of a connection
     :return: list or dict
     """
-    if isinstance(msg, str):
-        return json.loads(msg)
+    if isinstance(msg, (str, bytes, bytearray)):
+        return (codec or get_codec()).loads(msg)
     elif hasattr(msg, 'read'):
-        return json.load(msg)
+        return (codec or get_codec()).load(msg)
     elif isinstance(msg, (list, dict)):
         return msg
     else:
@@ -0,0 +1,165 @@
+"""
+provide incremental readers of frames from files, sockets and ndjson
+
+a capture of websocket traffic is a sequence of json frames: one per line
+(ndjson), simply concatenated, or the elements of one top level array.
+instead of loading the whole capture, the source is read in chunks and
+each complete frame is cut out of a buffer holding at most one frame and
+one chunk, so memory stays bounded by the largest frame.
+"""
+
+
+import codecs
+import re
+
+from streamr.protocol.response import Response
+from streamr.protocol.payload import StreamMessage
+
+
+__all__ = ['iter_frames', 'iter_responses', 'iter_stream_messages']
+
+
+CHUNK_SIZE = 64 * 1024
+
+# a quote or a bracket, searched outside of strings
+_TOKEN = re.compile(r'["\[\]{}]')
+# the characters of a string up to its closing quote, or up to the end of the buffer
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*')
+_SPACE = re.compile(r'[\s,]*')
+_PAYLOAD = re.compile(r'\s*\[\s*(?:28|29)\s*,')
+
+
+def _chunks(source, chunk_size):
+    """
+    read a source in chunks
+    :param source: file-like object with read, socket-like object with recv,
+                   or an iterable of str or bytes chunks
+    :param chunk_size: int
+    :return: generator of str or bytes
+    """
+    if hasattr(source, 'read'):
+        read = source.read
+    elif hasattr(source, 'recv'):
+        read = source.recv
+    else:
+        yield from source
+        return
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = decoder.decode(bytes(chunk))
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_frames(source, chunk_size=CHUNK_SIZE, max_frame_size=None):
+    """
+    cut the json frames of a source without decoding them
+    :param source: file-like object, socket-like object or iterable of chunks,
+                   in text or utf-8 bytes
+    :param chunk_size: number of characters or bytes read at once
+    :param max_frame_size: raise ValueError when a frame gets longer, None for no limit
+    :return: generator of str frames
+    """
+    buffer = ''
+    pos = 0
+    # index of the opening bracket of the frame being read, None between frames
+    start = None
+    depth = 0
+    in_string = False
+    # -1 before the first value, 1 inside a top level array of frames, 0 otherwise
+    outer = -1
+    for chunk in _text(_chunks(source, chunk_size)):
+        buffer = buffer[start if start is not None else pos:] + chunk
+        pos = pos - start if start is not None else 0
+        start = 0 if start is not None else None
+        while True:
+            if start is None:
+                pos = _SPACE.match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                if outer == 1 and buffer[pos] == ']':
+                    outer = 0
+                    pos += 1
+                    continue
+                if buffer[pos] not in '[{':
+                    raise ValueError('Expected a json frame at: %s' % buffer[pos:pos + 32])
+                if outer == -1:
+                    following = _SPACE.match(buffer, pos + 1).end()
+                    if following == len(buffer):
+                        break
+                    if buffer[pos] == '[' and buffer[following] == '[':
+                        outer = 1
+                        pos += 1
+                        continue
+                    outer = 0
+                start = pos
+                depth = 0
+
+            if in_string:
+                pos = _STRING_BODY.match(buffer, pos).end()
+                if pos == len(buffer) or buffer[pos] != '"':
+                    break
+                pos += 1
+                in_string = False
+                continue
+            token = _TOKEN.search(buffer, pos)
+            if token is None:
+                pos = len(buffer)
+                break
+            pos = token.end()
+            if token.group() == '"':
+                in_string = True
+            elif token.group() in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    yield buffer[start:pos]
+                    start = None
+        if max_frame_size is not None and start is not None and len(buffer) - start > max_frame_size:
+            raise ValueError('Frame longer than %s characters' % max_frame_size)
+    if start is not None or (outer == 1):
+        raise ValueError('Source ended inside a frame')
+
+
+def iter_responses(source, content_slice=False, chunk_size=CHUNK_SIZE, max_frame_size=None):
+    """
+    decode the response frames of a source one at a time
+    :param source: see iter_frames
+    :param content_slice: keep the content of data frames as a slice of their frame
+    :param chunk_size: see iter_frames
+    :param max_frame_size: see iter_frames
+    :return: generator of Response
+    """
+    for frame in iter_frames(source, chunk_size, max_frame_size):
+        yield Response.deserialize(frame, content_slice)
+
+
+def iter_stream_messages(source, chunk_size=CHUNK_SIZE, max_frame_size=None):
+    """
+    decode the StreamMessages of a source holding data frames or bare
+    StreamMessage payloads, control responses are skipped
+    :param source: see iter_frames
+    :param chunk_size: see iter_frames
+    :param max_frame_size: see iter_frames
+    :return: generator of StreamMessage
+    """
+    for frame in iter_frames(source, chunk_size, max_frame_size):
+        if _PAYLOAD.match(frame):
+            yield StreamMessage.deserialize(frame, False)
+            continue
+        response = Response.deserialize(frame)
+        if isinstance(response.payload, StreamMessage):
+            yield response.payload
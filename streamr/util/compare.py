@@ -1,15 +1,100 @@
 """
 provide a __eq__ func for comparing two message payloads
+
+classes declaring __slots__ get an __eq__ and a __hash__ generated for
+their fields by EqualMeta when they are defined. the others are compared
+through their __dict__
 """
 
 
-class EqualFunc:
+def slot_fields(clazz):
+    """
+    return the slots of a class and of its bases, bases first
+    :param clazz: class
+    :return: tuple of str
+    """
+    fields = []
+    for base in reversed(clazz.__mro__):
+        slots = base.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name not in ('__dict__', '__weakref__') and name not in fields:
+                fields.append(name)
+    return tuple(fields)
+
+
+def _compile(source, name):
+    namespace = {}
+    exec(source, namespace)
+    return namespace[name]
+
+
+def generate_eq(fields):
+    """
+    generate an __eq__ comparing the given attributes
+    :param fields: tuple of attribute names
+    :return: function
+    """
+    comparisons = ' and '.join('self.%s == another.%s' % (field, field) for field in fields) or 'True'
+    return _compile('def __eq__(self, another):\n'
+                    '    if not isinstance(another, type(self)):\n'
+                    '        return False\n'
+                    '    return %s\n' % comparisons, '__eq__')
+
+
+def generate_hash(fields):
+    """
+    generate a __hash__ over the given attributes
+    :param fields: tuple of attribute names
+    :return: function
+    """
+    values = ''.join('self.%s, ' % field for field in fields)
+    return _compile('def __hash__(self):\n'
+                    '    return hash((type(self), %s))\n' % values, '__hash__')
+
+
+class EqualMeta(type):
+    """
+    metaclass of EqualFunc, generating the __eq__ and __hash__ of the
+    slotted classes. a metaclass rather than __init_subclass__, which
+    python 3.5 does not call
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super().__init__(name, bases, attrs)
+        if '__slots__' not in attrs or not any(isinstance(base, EqualMeta) for base in bases):
+            return
+        fields = attrs.get('eq_fields', None)
+        if fields is None:
+            fields = tuple(field for field in slot_fields(cls) if field not in cls.eq_exclude)
+        if '__eq__' not in attrs:
+            cls.__eq__ = generate_eq(fields)
+        if attrs.get('__hash__', None) is None:
+            cls.__hash__ = generate_hash(cls.hash_fields if cls.hash_fields is not None else fields)
+
+
+class EqualFunc(metaclass=EqualMeta):
     """
     eq function for comparing two message payloads
     """
+
+    __slots__ = ()
+
+    # attributes that do not take part in the comparison
+    eq_exclude = ()
+
+    # attributes compared by a slotted class, its slots minus eq_exclude by default
+    eq_fields = None
+
+    # attributes hashed by a slotted class, its compared attributes by default
+    hash_fields = None
+
     def __eq__(self, another):
         if isinstance(another, type(self)):
             for key in self.__dict__:
+                if key in self.eq_exclude:
+                    continue
                 if self.__dict__[key] != another.__dict__[key]:
                     return False
             else:
@@ -84,6 +84,7 @@ class RequestConstant:
     API_KEY = 'authKey'
     SESSION_TOKEN = 'sessionToken'
     SERIALIZED_CONTENT = 'msg'
+    CONTENT_TYPE = 'contentType'
     TIMESTAMP = 'ts'
     PARTITION_KEY = 'pkey'
     PUBLISHER_ADDRESS = 'addr'
@@ -127,6 +128,37 @@ class OptionConstant:
     RESEND_TO = 'resend_to'
     RESEND_FROM_TIME = 'resend_from_time'
     RESEND_ALL = 'resend_all'
+    JSON_CODEC = 'jsonCodec'
+    CONTENT_SLICE = 'contentSlice'
+    WIRE_FORMAT = 'wireFormat'
+    SKIP_DUPLICATE_FRAMES = 'skipDuplicateFrames'
+    DISPATCH_SHARDS = 'dispatchShards'
+    DISPATCH_QUEUE_SIZE = 'dispatchQueueSize'
+    MAX_QUEUED_MESSAGES = 'maxQueuedMessages'
+    MAX_QUEUED_BYTES = 'maxQueuedBytes'
+
+
+class WireConstant:
+    """
+    store the websocket subprotocols used to negotiate the wire format
+    """
+
+    JSON = 'json'
+    SUBPROTOCOL_BY_WIRE_FORMAT = {'json': 'streamr-json',
+                                  'msgpack': 'streamr-msgpack'}
+
+
+class OverflowConstant:
+    """
+    store the policies applied when a message buffer is full
+    """
+
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    CONFLATE = 'conflate'
+    SPILL = 'spill'
+    POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, CONFLATE, SPILL)
 
 
 class EventConstant:
@@ -27,7 +27,11 @@ class Option(EqualFunc):
                  session_token_refresh_interval=7200, auth=None,
                  auth_key=None, stream_id=None, stream_partition=None,
                  resend_all=None, resend_from=None, resend_to=None,
-                 resend_last=None, resend_from_time=None):
+                 resend_last=None, resend_from_time=None,
+                 json_codec=None, content_slice=False, wire_format=None,
+                 skip_duplicate_frames=False, dispatch_shards=0,
+                 dispatch_queue_size=1000, max_queued_messages=None,
+                 max_queued_bytes=None):
 
         self.api_key = api_key
         self.url = url
@@ -44,6 +48,22 @@ class Option(EqualFunc):
         self.resend_to = resend_to
         self.resend_last = resend_last
         self.resend_from_time = resend_from_time
+        # name of the json codec, 'auto' picks the fastest installed one
+        self.json_codec = json_codec
+        # keep message content as a slice of the received frame until it is used
+        self.content_slice = content_slice
+        # binary codec, e.g. 'msgpack', offered to the server for the websocket frames
+        self.wire_format = wire_format
+        # drop already received data frames after peeking at their offsets
+        self.skip_duplicate_frames = skip_duplicate_frames
+        # number of worker threads handling the received messages by stream partition,
+        # 0 handles them on the websocket thread
+        self.dispatch_shards = dispatch_shards
+        # bound of the queue of each worker, the websocket thread waits when it is full
+        self.dispatch_queue_size = dispatch_queue_size
+        # bounds of the messages buffered by all the subscriptions together, None for no bound
+        self.max_queued_messages = max_queued_messages
+        self.max_queued_bytes = max_queued_bytes
 
     def to_object(self):
         """
@@ -64,7 +84,15 @@ class Option(EqualFunc):
                OptionConstant.RESEND_FROM: self.resend_from,
                OptionConstant.RESEND_TO: self.resend_to,
                OptionConstant.RESEND_LAST: self.resend_last,
-               OptionConstant.RESEND_FROM_TIME: self.resend_from_time}
+               OptionConstant.RESEND_FROM_TIME: self.resend_from_time,
+               OptionConstant.JSON_CODEC: self.json_codec,
+               OptionConstant.CONTENT_SLICE: self.content_slice,
+               OptionConstant.WIRE_FORMAT: self.wire_format,
+               OptionConstant.SKIP_DUPLICATE_FRAMES: self.skip_duplicate_frames,
+               OptionConstant.DISPATCH_SHARDS: self.dispatch_shards,
+               OptionConstant.DISPATCH_QUEUE_SIZE: self.dispatch_queue_size,
+               OptionConstant.MAX_QUEUED_MESSAGES: self.max_queued_messages,
+               OptionConstant.MAX_QUEUED_BYTES: self.max_queued_bytes}
         for k, v in dic:
             if v is None:
                 dic.pop(k)
@@ -109,7 +137,15 @@ class Option(EqualFunc):
                 msg.get(OptionConstant.RESEND_FROM),
                 msg.get(OptionConstant.RESEND_TO),
                 msg.get(OptionConstant.RESEND_LAST),
-                msg.get(OptionConstant.RESEND_FROM_TIME)]
+                msg.get(OptionConstant.RESEND_FROM_TIME),
+                msg.get(OptionConstant.JSON_CODEC),
+                msg.get(OptionConstant.CONTENT_SLICE, False),
+                msg.get(OptionConstant.WIRE_FORMAT),
+                msg.get(OptionConstant.SKIP_DUPLICATE_FRAMES, False),
+                msg.get(OptionConstant.DISPATCH_SHARDS, 0),
+                msg.get(OptionConstant.DISPATCH_QUEUE_SIZE, 1000),
+                msg.get(OptionConstant.MAX_QUEUED_MESSAGES),
+                msg.get(OptionConstant.MAX_QUEUED_BYTES)]
         return Option(*args)
 
     @classmethod
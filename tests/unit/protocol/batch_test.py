@@ -0,0 +1,64 @@
+"""
+test MessageBatch
+"""
+
+
+import json
+
+from streamr.protocol.batch import MessageBatch
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.response import Response
+
+
+def payload(offset, previous_offset, content='{"a": 1}', content_type=StreamMessage.ContentType.JSON):
+    return [28, 'stream_id', 0, 1529549961116 + offset, 0, offset, previous_offset, content_type, content]
+
+
+def test_from_payloads():
+    batch = MessageBatch.from_payloads([payload(1, None), payload(2, 1)])
+    assert batch.stream_id == 'stream_id'
+    assert batch.offsets == [1, 2]
+    assert batch.previous_offsets == [None, 1]
+    assert batch.timestamps == [1529549961117, 1529549961118]
+    assert batch.parsed_contents() == [{'a': 1}, {'a': 1}]
+
+    messages = batch.get_messages()
+    assert all(isinstance(msg, StreamMessage) for msg in messages)
+    assert [msg.offset for msg in messages] == [1, 2]
+
+
+def test_from_messages():
+    messages = [StreamMessage(*payload(offset, offset - 1)[1:]) for offset in (3, 4)]
+    batch = MessageBatch.from_messages(messages)
+    assert batch.offsets == [3, 4]
+    assert batch.get_messages() == messages
+
+
+def test_from_messages_keeps_sliced_contents():
+    contents = ['{"a": 1}', '{"_bye": true}']
+    messages = [Response.deserialize(json.dumps([0, 0, None, payload(offset, None, content)]), True).payload
+                for offset, content in enumerate(contents)]
+    batch = MessageBatch.from_messages(messages)
+    assert batch.content_size() == sum(msg.content_size() for msg in messages)
+    assert batch.take([0]).has_bye_message() is False
+    assert messages[0].get_content_slice() is not None
+    assert batch.has_bye_message() is True
+    assert batch.contents == contents
+
+
+def test_dedup_and_gaps():
+    batch = MessageBatch.from_payloads([payload(offset, previous_offset) for offset, previous_offset in
+                                        [(1, None), (2, 1), (2, 1), (3, 2), (6, 5), (7, 6), (9, 8)]])
+    batch = batch.take(batch.new_message_indexes(1))
+    assert batch.offsets == [2, 3, 6, 7, 9]
+    assert batch.first_gap(1) == (2, 4, 5)
+    assert batch.gaps(1) == [(4, 5), (8, 8)]
+    assert batch.take(range(2)).first_gap(1) is None
+
+
+def test_bye_and_raw_contents():
+    batch = MessageBatch.from_payloads([payload(1, None, b'\x00', StreamMessage.ContentType.RAW),
+                                        payload(2, 1, '{"_bye": true}')])
+    assert batch.parsed_contents() == [b'\x00', {'_bye': True}]
+    assert batch.has_bye_message() is True
+    assert MessageBatch.from_payloads([payload(1, None)]).has_bye_message() is False
@@ -0,0 +1,58 @@
+"""
+test json codecs
+"""
+
+
+from streamr.protocol.util.codec import get_codec, set_codec, available_codecs, StdlibCodec
+from streamr.protocol.util.parser import jparser
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.request import SubscribeRequest
+from streamr.protocol.errors.error import InvalidJsonError
+
+
+def test_default_codec():
+    assert isinstance(get_codec(), StdlibCodec)
+    assert 'json' in available_codecs()
+
+
+def test_unknown_codec():
+    try:
+        set_codec('not_a_codec')
+    except ValueError as e:
+        assert 'not_a_codec' in str(e)
+    else:
+        raise AssertionError('ValueError expected')
+    assert isinstance(get_codec(), StdlibCodec)
+
+
+def test_codecs_round_trip():
+    frame = [0, 0, None, [28, 'streamId', 0, 1529549961116, 0, 2, 1,
+                          StreamMessage.ContentType.JSON, '{"valid": "json"}']]
+    try:
+        for name in available_codecs():
+            codec = set_codec(name)
+            assert codec.NAME == name
+            assert jparser(codec.dumps(frame)) == frame
+            assert jparser(codec.dumps(frame).encode('utf-8')) == frame
+
+            request = SubscribeRequest('streamId', 0, 'apiKey', 'sessionToken')
+            assert jparser(request.serialize()) == request.to_object()
+
+            msg = StreamMessage('streamId', 0, 1529549961116, 0, 2, 1,
+                                StreamMessage.ContentType.JSON, '{"invalid\njson"}')
+            try:
+                msg.get_parsed_content()
+            except InvalidJsonError as e:
+                assert e.stream_id == 'streamId'
+            else:
+                raise AssertionError('InvalidJsonError expected with codec %s' % name)
+    finally:
+        set_codec('json')
+
+
+def test_auto_codec():
+    try:
+        codec = set_codec('auto')
+        assert codec.NAME in available_codecs()
+    finally:
+        set_codec('json')
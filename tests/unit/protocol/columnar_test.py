@@ -0,0 +1,50 @@
+"""
+test columnar decoding of resent messages
+"""
+
+
+import pytest
+
+from streamr.protocol.payload import StreamMessage
+
+np = pytest.importorskip('numpy')
+
+from streamr.protocol.columnar import ColumnarMessages  # noqa: E402
+
+
+def payload(offset, previous_offset, content='{"valid": "json"}'):
+    return [28, 'stream_id', 0, 1529549961116 + offset, 0, offset, previous_offset,
+            StreamMessage.ContentType.JSON, content]
+
+
+def test_from_payloads():
+    batch = ColumnarMessages.from_payloads([payload(1, None), payload(2, 1), payload(3, 2, '[1]')])
+    assert len(batch) == 3
+    assert batch.stream_id == 'stream_id'
+    assert batch.offset.tolist() == [1, 2, 3]
+    assert batch.previous_offset.tolist() == [-1, 1, 2]
+    assert batch.timestamp.tolist() == [1529549961117, 1529549961118, 1529549961119]
+    assert batch.parsed_contents() == [{'valid': 'json'}, {'valid': 'json'}, [1]]
+
+    unknown = payload(4, 3)
+    unknown[7] = 99
+    with pytest.raises(ValueError):
+        ColumnarMessages.from_payloads([payload(1, None), unknown]).parsed_contents()
+
+    empty = ColumnarMessages.from_payloads([], 'stream_id')
+    assert len(empty) == 0
+    assert empty.gaps() == []
+
+
+def test_new_message_mask():
+    batch = ColumnarMessages.from_payloads([payload(1, None), payload(2, 1), payload(2, 1),
+                                            payload(3, 2), payload(1, None), payload(4, 3)])
+    assert batch.new_message_mask().tolist() == [True, True, False, True, False, True]
+    assert batch.new_message_mask(2).tolist() == [False, False, False, True, False, True]
+
+
+def test_gaps():
+    batch = ColumnarMessages.from_payloads([payload(3, 2), payload(4, 3), payload(8, 6), payload(9, 8)])
+    assert batch.gaps() == [(5, 6)]
+    assert batch.gaps(0) == [(1, 2), (5, 6)]
+    assert batch.take(np.array([0, 1])).gaps(2) == []
@@ -0,0 +1,70 @@
+"""
+test the data frame scanner
+"""
+
+
+from streamr.protocol.response import Response, BroadcastMessage, UnicastMessage
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.util.frame import split_message_frame, peek_message_header
+from streamr.protocol.errors.error import InvalidJsonError
+import json
+
+
+CONTENTS = [{'valid': 'json'},
+            {'quote': 'say "hi"', 'slash': 'a\\b', 'unicode': 'é中'},
+            {'ends_with_slash': '\\'},
+            ['a', 1, None, 2.5]]
+
+
+def test_split_matches_full_decode():
+    for content in CONTENTS:
+        frames = [[0, 0, None, [28, 'stream"Id', 0, 1529549961116, 0, 2, 1,
+                                StreamMessage.ContentType.JSON, json.dumps(content)]],
+                  [0, 1, 'sub_id', [29, 'streamId', 3, 1529549961116.5, 10, 2, None,
+                                    StreamMessage.ContentType.JSON, json.dumps(content),
+                                    1, '0xabc', '0xdef']],
+                  [0, 1, 'sub_id', [29, 'streamId', 3, 1529549961116, 10, 2, 1,
+                                    StreamMessage.ContentType.JSON, json.dumps(content),
+                                    None, None, None]]]
+        for frame in frames:
+            for serialized in (json.dumps(frame), json.dumps(frame, separators=(',', ':'))):
+                assert split_message_frame(serialized) is not None
+                sliced = Response.deserialize(serialized, True)
+                full = Response.deserialize(serialized)
+                assert isinstance(sliced, (BroadcastMessage, UnicastMessage))
+                assert sliced.payload._content_slice is not None
+                assert sliced.payload.get_parsed_content() == content
+                assert full.payload.get_parsed_content() == content
+                assert sliced == full
+                assert sliced.sub_id == full.sub_id
+
+
+def test_split_rejects_other_frames():
+    assert split_message_frame(json.dumps([0, 2, None, {'stream': 'id', 'partition': 0}])) is None
+    assert split_message_frame('[0, 0, null, [30, "id", 0, 1, 0, 2, 1, 27, "{}"]]') is None
+    assert split_message_frame('[0, 0, null, [28, "id", 0, 1, 0, 2, 1, 27, "{}"]') is None
+
+    result = Response.deserialize(json.dumps([0, 2, None, {'stream': 'id', 'partition': 0}]), True)
+    assert result.payload.stream_id == 'id'
+
+
+def test_invalid_escape_raises_invalid_json_error():
+    result = Response.deserialize('[0, 0, null, [28, "id", 0, 1, 0, 2, 1, 27, "{\\q}"]]', True)
+    try:
+        result.payload.get_parsed_content()
+    except InvalidJsonError as e:
+        assert e.stream_id == 'id'
+    else:
+        raise AssertionError('InvalidJsonError expected')
+
+
+def test_peek_message_header():
+    frame = json.dumps([0, 1, 'sub_id', [29, 'streamId', 3, 1529549961116, 10, 5, 4,
+                                         StreamMessage.ContentType.JSON, '{}', 1, '0xabc', '0xdef']])
+    assert peek_message_header(frame) == (1, 'sub_id', 'streamId', 3, 5, 4)
+
+    frame = json.dumps([0, 0, None, [28, 'streamId', 0, 1529549961116, 0, 1, None,
+                                     StreamMessage.ContentType.JSON, '{}']])
+    assert peek_message_header(frame) == (0, None, 'streamId', 0, 1, None)
+
+    assert peek_message_header(json.dumps([0, 7, None, {'error': 'foo'}])) is None
@@ -0,0 +1,38 @@
+"""
+test the intern table of the decoders
+"""
+
+
+import json
+
+import pytest
+
+from streamr.protocol.response import Response
+from streamr.protocol.util.intern import InternTable
+
+
+def test_decoded_messages_share_identifiers():
+    frames = [json.dumps([0, 0, None, [29, 'stream_id', 0, 0, 0, offset, None, 27, '{}', 1, 'address', 'sig']])
+              for offset in (1, 2)]
+    first, second = (Response.deserialize(frame).payload for frame in frames)
+    assert first.stream_id is second.stream_id
+    assert first.publisher_address is second.publisher_address
+
+
+def test_intern_table_is_bounded():
+    table = InternTable(2)
+    a = table.intern(''.join(['a', 'b']))
+    assert table.intern(''.join(['a', 'b'])) is a
+    table.intern('c')
+    table.intern('d')
+    assert len(table.strings) == 1
+    assert table.intern(None) is None
+    assert table.intern(1) == 1
+
+
+def test_intern_table_disabled():
+    table = InternTable(0)
+    table.intern('a')
+    assert table.strings == {}
+    with pytest.raises(ValueError):
+        InternTable(-1)
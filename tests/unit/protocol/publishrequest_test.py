@@ -3,7 +3,9 @@ test PublishRequest
 """
 
 
-from streamr.protocol.request import PublishRequest
+from streamr.protocol.request import PublishRequest, get_publish_serializer, invalidate_publish_serializers
+from streamr.protocol.util.codec import available_codecs, set_codec
+from streamr.protocol.util.content import ContentType
 import json
 
 
@@ -56,3 +58,48 @@ def test_publish_request():
     dic = json.loads(serial)
 
     assert msg == dic
+
+
+def test_publish_serializer_matches_codec_output():
+    requests = [PublishRequest('stream_id', 'authKey', 'sessionToken', {'foo': 'bar "baz"'}),
+                PublishRequest('stream_id', 'authKey', 'sessionToken', [1, 2.5, None], '1533924184016', 'deviceId'),
+                PublishRequest('stream_id', 'authKey', 'sessionToken', '{}', 1533924184016.5, None,
+                               'publisherAddress', 1, 'signature')]
+    try:
+        for name in available_codecs():
+            codec = set_codec(name)
+            for request in requests:
+                assert request.serialize() == codec.dumps(request.to_object())
+    finally:
+        set_codec('json')
+
+
+def test_publish_serializer_cache():
+    first = get_publish_serializer('stream_id', 'authKey', 'sessionToken')
+    assert get_publish_serializer('stream_id', 'authKey', 'sessionToken') is first
+    assert get_publish_serializer('stream_id', 'authKey', 'rotatedToken') is not first
+
+    invalidate_publish_serializers('sessionToken')
+    assert get_publish_serializer('stream_id', 'authKey', 'sessionToken') is not first
+
+
+def test_publish_raw_content():
+    request = PublishRequest('stream_id', 'authKey', 'sessionToken', b'\x00\x01', 1533924184016,
+                             content_type=ContentType.RAW)
+    serial = request.serialize()
+    assert serial == json.dumps(request.to_object())
+    assert json.loads(serial)['msg'] == 'AAE='
+    assert json.loads(serial)['contentType'] == ContentType.RAW
+    assert PublishRequest.deserialize(serial).content_type == ContentType.RAW
+    assert 'contentType' not in PublishRequest('stream_id', 'authKey', 'sessionToken', {}).to_object()
+
+
+def test_publish_content_round_trip():
+    for content, content_type in [(b'\x00\x01', ContentType.RAW), ('plain text', ContentType.TEXT)]:
+        request = PublishRequest('stream_id', 'authKey', 'sessionToken', content, 1533924184016,
+                                 content_type=content_type)
+        serial = request.serialize()
+        result = PublishRequest.deserialize(serial)
+        assert result.content == content
+        assert result == request
+        assert result.serialize() == serial
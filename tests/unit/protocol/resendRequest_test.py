@@ -6,6 +6,7 @@ test ResendRequest
 from streamr.protocol.request import ResendRequest
 from streamr.util.option import Option
 import json
+import pytest
 
 
 def test_resend_request():
@@ -44,3 +45,13 @@ def test_resend_request():
     
     dic = json.loads(serialized)
     assert dic == msg
+
+
+def test_resend_request_validation():
+    for option in (Option(resend_all=True), Option(resend_from=0), Option(resend_last=1),
+                   Option(resend_from_time=1529549961116)):
+        assert ResendRequest('id', 0, 'subId', option).resend_option == option
+
+    for option in (None, Option(), Option(resend_all=False)):
+        with pytest.raises(ValueError):
+            ResendRequest('id', 0, 'subId', option)
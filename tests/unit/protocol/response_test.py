@@ -118,3 +118,29 @@ def test_response():
     serialized = Response.deserialize(examples_by_type['7']).serialize()
     assert isinstance(serialized, str)
     assert examples_by_type['7'] == json.loads(serialized)
+
+
+def test_message_fast_path_matches_generic_path():
+    broadcast = [0, 0, None, [29, 'TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116, 0,
+                              941516902, 941499898, StreamMessage.ContentType.JSON,
+                              '{"valid": "json"}', 1, 'address', 'signature']]
+    unicast = [0, 1, 'sub_id', [28, 'TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116, 0,
+                                941516902, 941499898, StreamMessage.ContentType.JSON,
+                                '{"valid": "json"}']]
+
+    for frame in (broadcast, unicast):
+        fast = Response.deserialize(json.dumps(frame))
+        generic = Response.deserialize_payload(frame[1], frame[2], frame[3])
+        assert type(fast) is type(generic)
+        assert fast.payload.get_parsed_content() == {'valid': 'json'}
+        assert fast == generic
+        assert fast.sub_id == generic.sub_id
+
+
+def test_message_content_is_not_parsed_on_deserialize():
+    frame = [0, 0, None, [28, 'TsvTbqshTsuLg_HyUjxigA', 0, 1529549961116, 0,
+                          941516902, 941499898, StreamMessage.ContentType.JSON,
+                          '{"invalid\njson"}']]
+    result = Response.deserialize(json.dumps(frame))
+    assert result.payload.parsed_content is None
+    assert result.payload.content == '{"invalid\njson"}'
@@ -0,0 +1,77 @@
+"""
+test typed content decoding
+"""
+
+
+from streamr.protocol.schema import ContentSchema
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.errors.error import InvalidJsonError
+from streamr.protocol.util.codec import StdlibCodec, available_codecs, get_codec
+import json
+
+
+STREAM = {'id': 'stream_id', 'config': {'fields': [{'name': 'temperature', 'type': 'number'},
+                                                   {'name': 'on', 'type': 'boolean'},
+                                                   {'name': 'device', 'type': 'string'},
+                                                   {'name': 'tags', 'type': 'list'}]}}
+
+
+def test_from_stream():
+    assert ContentSchema.from_stream({'id': 'stream_id', 'config': {'fields': []}}) is None
+    assert ContentSchema.from_stream({'id': 'stream_id'}) is None
+    assert ContentSchema.from_stream(None) is None
+    assert ContentSchema.from_stream(STREAM).names == ('temperature', 'on', 'device', 'tags')
+
+
+def test_typed_decoding():
+    schema = ContentSchema.from_stream(STREAM)
+
+    record = schema.loads('{"device": "a", "temperature": 21.5, "on": true, "tags": ["x"]}')
+    assert isinstance(record, schema.record_class)
+    assert record == (21.5, True, 'a', ['x'])
+    assert record.temperature == 21.5
+    assert json.loads(schema.dumps(record)) == {'device': 'a', 'temperature': 21.5, 'on': True, 'tags': ['x']}
+
+    # fall back to generic json when the content does not match
+    assert schema.loads('{"temperature": "hot", "on": true, "device": "a", "tags": []}') == \
+        {'temperature': 'hot', 'on': True, 'device': 'a', 'tags': []}
+    assert schema.loads('{"temperature": true, "on": true, "device": "a", "tags": []}')['temperature'] is True
+    assert schema.loads('{"temperature": 1}') == {'temperature': 1}
+    assert schema.loads('[1, 2]') == [1, 2]
+
+
+def test_stream_message_with_schema():
+    schema = ContentSchema.from_stream(STREAM)
+    msg = StreamMessage('stream_id', 0, 1529549961116, 0, 1, None, StreamMessage.ContentType.JSON,
+                        '{"temperature": 1, "on": false, "device": "a", "tags": null}')
+    assert msg.get_parsed_content(schema).device == 'a'
+    assert msg.is_bye_message() is False
+
+    msg = StreamMessage('stream_id', 0, 1529549961116, 0, 1, None, StreamMessage.ContentType.JSON, '{"invalid')
+    try:
+        msg.get_parsed_content(schema)
+    except InvalidJsonError as e:
+        assert e.stream_id == 'stream_id'
+    else:
+        raise AssertionError('InvalidJsonError expected')
+
+
+def test_decoding_through_the_codec():
+    schema = ContentSchema([{'name': 'temperature', 'type': 'number'}], codec=StdlibCodec())
+    assert schema.loads('{"temperature": 1}') == (1,)
+    assert schema.loads('{"temperature": 1}').temperature == 1
+    assert schema.loads('{"temperature": 1, "on": true}') == {'temperature': 1, 'on': True}
+    assert schema.decode_error is StdlibCodec.decode_error
+
+    # only the top-level object becomes a record
+    assert schema.loads('[{"temperature": 1}]') == [{'temperature': 1}]
+
+    for name in available_codecs():
+        schema.codec = get_codec(name)
+        assert schema.loads('{"temperature": 2.5}').temperature == 2.5
+        try:
+            schema.loads('{"invalid')
+        except schema.decode_error:
+            pass
+        else:
+            raise AssertionError('%s decode error expected' % name)
@@ -0,0 +1,64 @@
+"""
+test the incremental frame readers
+"""
+
+
+import io
+import json
+
+import pytest
+
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.response import BroadcastMessage, SubscribeResponse
+from streamr.protocol.util.source import iter_frames, iter_responses, iter_stream_messages
+
+
+PAYLOAD = [28, 'stream_id', 0, 1529549961116, 0, 2, 1, 27, json.dumps({'a': '[{"}] \\ é', 'b': [1, 2]})]
+FRAMES = [json.dumps([0, 0, None, PAYLOAD]),
+          json.dumps([0, 2, None, {'stream': 'stream_id', 'partition': 0}]),
+          json.dumps([0, 1, 'sub', PAYLOAD], ensure_ascii=False)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 4096])
+@pytest.mark.parametrize('layout', ['\n', '', ' , '])
+def test_iter_frames(chunk_size, layout):
+    text = layout.join(FRAMES) + '\n'
+    assert list(iter_frames(io.StringIO(text), chunk_size)) == FRAMES
+    assert list(iter_frames(io.BytesIO(text.encode('utf-8')), chunk_size)) == FRAMES
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 4096])
+def test_iter_frames_of_an_array(chunk_size):
+    text = '[' + ',\n'.join(FRAMES) + ']'
+    assert list(iter_frames(io.BytesIO(text.encode('utf-8')), chunk_size)) == FRAMES
+
+
+def test_iter_frames_of_chunks():
+    data = '\n'.join(FRAMES).encode('utf-8')
+    chunks = [data[i:i + 10] for i in range(0, len(data), 10)]
+    assert list(iter_frames(chunks)) == FRAMES
+
+
+def test_iter_frames_errors():
+    with pytest.raises(ValueError):
+        list(iter_frames(io.StringIO(FRAMES[0][:-3])))
+    with pytest.raises(ValueError):
+        list(iter_frames(io.StringIO('nope')))
+    with pytest.raises(ValueError):
+        list(iter_frames(io.StringIO(FRAMES[0]), 4, max_frame_size=16))
+
+
+def test_iter_responses():
+    responses = list(iter_responses(io.StringIO('\n'.join(FRAMES)), True))
+    assert isinstance(responses[0], BroadcastMessage)
+    assert isinstance(responses[1], SubscribeResponse)
+    assert responses[0].payload.get_parsed_content() == json.loads(PAYLOAD[8])
+
+
+def test_iter_stream_messages():
+    text = '\n'.join(FRAMES + [json.dumps(PAYLOAD)])
+    messages = list(iter_stream_messages(io.StringIO(text), 8))
+    assert len(messages) == 3
+    for msg in messages:
+        assert isinstance(msg, StreamMessage)
+        assert msg.get_parsed_content() == json.loads(PAYLOAD[8])
@@ -5,6 +5,9 @@ test streamMessage class
 
 from streamr.protocol.payload import StreamMessage
 from streamr.protocol.errors.error import InvalidJsonError, UnsupportedVersionError
+from streamr.protocol.schema import ContentSchema
+from streamr.protocol.util.content import register_content_type, registered_content_types, unregister_content_type
+import pytest
 import json
 import time
 
@@ -180,3 +183,52 @@ def test_to_ojbect_compact_is_true():
     dic = msg.to_object(28, True, False)
 
     assert dic == obj
+
+
+def test_raw_and_text_content():
+    raw = StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, StreamMessage.ContentType.RAW, b'\x00\x01')
+    assert raw.get_serialized_content() == 'AAE='
+    assert raw.get_serialized_content(True) == b'\x00\x01'
+    assert StreamMessage.deserialize(raw.serialize()).get_parsed_content() == b'\x00\x01'
+
+    text = StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, StreamMessage.ContentType.TEXT, '{not json')
+    assert StreamMessage.deserialize(text.serialize()).get_parsed_content() == '{not json'
+    assert text.is_bye_message() is False
+
+
+def test_registered_content_type():
+    register_content_type(100, lambda content: content.split(','), lambda value, binary: ','.join(value))
+    try:
+        msg = StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, 100, ['a', 'b'])
+        assert msg.get_serialized_content() == 'a,b'
+        assert StreamMessage.deserialize(msg.serialize()).get_parsed_content() == ['a', 'b']
+    finally:
+        unregister_content_type(100)
+    assert 100 not in registered_content_types()
+
+    with pytest.raises(ValueError):
+        register_content_type(StreamMessage.ContentType.JSON, str, str)
+
+
+def test_slots_equality_and_hash():
+    msg = StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, StreamMessage.ContentType.JSON, '{"a": 1}')
+    sliced = StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, StreamMessage.ContentType.JSON, None)
+    frame = '"{\\"a\\": 1}"'
+    sliced.set_content_slice(frame, 1, len(frame) - 1)
+    sliced.raw_frame = frame
+
+    assert not hasattr(msg, '__dict__')
+    assert msg == sliced
+    assert hash(msg) == hash(sliced)
+    assert len({msg, sliced}) == 1
+    assert msg != StreamMessage('stream_id', 0, 1529549961116, 0, 3, 2, StreamMessage.ContentType.JSON, '{}')
+
+
+def test_schema_parse_is_not_cached():
+    schema = ContentSchema([{'name': 'a', 'type': 'number'}])
+    msg = StreamMessage('stream_id', 0, 1529549961116, 0, 2, 1, StreamMessage.ContentType.JSON, '{"a": 1}')
+    record = msg.get_parsed_content(schema)
+    assert isinstance(record, schema.record_class)
+    assert msg.get_parsed_content() == {'a': 1}
+    assert isinstance(msg.get_parsed_content(schema), schema.record_class)
+    assert msg.parsed_content == {'a': 1}
@@ -0,0 +1,107 @@
+"""
+test accumulating messages as columns
+"""
+
+
+import math
+
+import pytest
+
+from streamr.protocol.batch import MessageBatch
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.schema import ContentSchema
+from streamr.protocol.errors.error import InvalidJsonError
+
+np = pytest.importorskip('numpy')
+
+from streamr.protocol.table import TableSink, infer_fields  # noqa: E402
+
+
+def payload(offset, previous_offset, content):
+    return [28, 'stream_id', 0, 1529549961116 + offset, 0, offset, previous_offset,
+            StreamMessage.ContentType.JSON, content]
+
+
+def test_infer_fields():
+    assert infer_fields([{'a': 1, 'b': None}, {'b': 'x', 'c': [1]}, {'a': 'y'}, [1]]) == [
+        {'name': 'a', 'type': 'any'}, {'name': 'b', 'type': 'string'}, {'name': 'c', 'type': 'list'}]
+    assert infer_fields([1, 'a']) == []
+
+
+def test_add_batch_infers_schema():
+    sink = TableSink(infer_rows=2)
+    sink.add_batch(MessageBatch.from_payloads([
+        payload(1, None, '{"temperature": 1.5, "on": true, "offset": "x"}'),
+        payload(2, 1, '{"temperature": 2, "on": false, "offset": "y"}'),
+        payload(3, 2, '{"temperature": 3, "on": true, "offset": "z"}'),
+        payload(4, 3, '{"temperature": "hot"}'),
+        payload(5, 4, '[1]')]))
+    assert len(sink) == 5
+    assert sink.names == ('temperature', 'on', 'content.offset')
+
+    columns = sink.to_columns()
+    assert list(columns) == ['timestamp', 'offset', 'previous_offset', 'temperature', 'on', 'content.offset']
+    assert columns['timestamp'].dtype == np.dtype('datetime64[ms]')
+    assert columns['timestamp'].view(np.int64).tolist() == [1529549961117 + i for i in range(5)]
+    assert columns['offset'].tolist() == [1, 2, 3, 4, 5]
+    assert columns['previous_offset'].tolist() == [-1, 1, 2, 3, 4]
+    assert columns['temperature'].tolist()[:3] == [1.5, 2.0, 3.0]
+    assert math.isnan(columns['temperature'][3]) and math.isnan(columns['temperature'][4])
+    assert columns['on'] == [True, False, True, None, None]
+    assert columns['content.offset'] == ['x', 'y', 'z', None, None]
+
+    assert len(sink) == 0
+    sink.add_batch(MessageBatch.from_payloads([payload(6, 5, '{"temperature": 6, "on": true, "offset": "w"}')]))
+    assert sink.to_columns()['temperature'].tolist() == [6.0]
+
+
+def test_callback_with_schema():
+    schema = ContentSchema([{'name': 'value', 'type': 'number'}])
+    sink = TableSink(schema)
+    for offset in range(3):
+        msg = StreamMessage('stream_id', 0, 1000 + offset, 0, offset, None,
+                            StreamMessage.ContentType.JSON, '{"value": %d}' % offset)
+        sink(msg.get_parsed_content(schema), msg)
+    columns = sink.to_columns()
+    assert columns['value'].tolist() == [0.0, 1.0, 2.0]
+    assert columns['previous_offset'].tolist() == [-1, -1, -1]
+
+
+def test_whole_content_column():
+    sink = TableSink()
+    sink.add_batch(MessageBatch.from_payloads([payload(1, None, '[1]'), payload(2, 1, '"a"')]))
+    assert sink.to_columns()['content'] == [[1], 'a']
+
+
+def test_flush_before_any_message_keeps_inferring():
+    sink = TableSink(infer_rows=1)
+    assert list(sink.to_columns()) == ['timestamp', 'offset', 'previous_offset']
+    sink.add_batch(MessageBatch.from_payloads([payload(1, None, '{"value": 1}')]))
+    assert sink.to_columns()['value'].tolist() == [1.0]
+
+
+def test_to_arrow():
+    pa = pytest.importorskip('pyarrow')
+    sink = TableSink(infer_rows=1)
+    sink.add_batch(MessageBatch.from_payloads([payload(1, None, '{"v": 1, "tags": {"a": 1}}'),
+                                               payload(2, 1, '{"v": null, "tags": {"b": 2}}')]))
+    record_batch = sink.to_arrow()
+    assert record_batch.schema.field('timestamp').type == pa.timestamp('ms')
+    assert record_batch.column('previous_offset').to_pylist() == [None, 1]
+    assert record_batch.column('v').to_pylist() == [1.0, None]
+    assert record_batch.column('tags').to_pylist() == ['{"a": 1}', '{"b": 2}']
+
+
+def test_to_pandas():
+    pytest.importorskip('pandas')
+    sink = TableSink(infer_rows=1)
+    sink.add_batch(MessageBatch.from_payloads([payload(1, None, '{"v": 1}'), payload(2, 1, '{"v": 2}')]))
+    frame = sink.to_pandas()
+    assert frame['v'].tolist() == [1.0, 2.0]
+    assert frame['offset'].tolist() == [1, 2]
+
+
+def test_invalid_json_content():
+    sink = TableSink()
+    with pytest.raises(InvalidJsonError):
+        sink.add_batch(MessageBatch.from_payloads([payload(1, None, '1'), payload(2, 1, '2,3')]))
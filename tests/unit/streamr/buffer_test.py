@@ -0,0 +1,153 @@
+"""
+test the bounded message buffers and their overflow policies
+"""
+
+
+import threading
+import time
+
+import pytest
+
+from streamr.client.buffer import QueueLimit, BufferBudget, MessageBuffer
+from streamr.client.executor import ThreadExecutor
+from streamr.client.subscription import Subscription
+from streamr.protocol.payload import StreamMessage
+from streamr.util.constant import EventConstant
+
+
+def create_msg(offset, previous_offset=None, content=None):
+    if content is None:
+        content = {'offset': offset}
+    return StreamMessage('stream', 0, 1000 + offset, 0, offset, previous_offset,
+                         StreamMessage.ContentType.JSON, content)
+
+
+def offsets(buffer):
+    return [msg.offset for msg in buffer]
+
+
+def test_drop_oldest_and_drop_newest():
+    oldest = MessageBuffer(QueueLimit(max_messages=3))
+    newest = MessageBuffer(QueueLimit(max_messages=3, policy='drop_newest'))
+    for offset in range(1, 6):
+        oldest.append(create_msg(offset))
+        newest.append(create_msg(offset))
+    assert offsets(oldest) == [3, 4, 5]
+    assert offsets(newest) == [1, 2, 3]
+    assert oldest.metrics()['dropped'] == 2
+    assert newest.metrics()['overflows'] == 2
+    assert newest.metrics()['high_water'] == 3
+
+
+def test_bound_in_bytes():
+    buffer = MessageBuffer(QueueLimit(max_bytes=30))
+    for offset in range(1, 6):
+        buffer.append(create_msg(offset, content='x' * 10))
+    assert offsets(buffer) == [3, 4, 5]
+    assert buffer.metrics()['bytes'] == 30
+
+
+def test_conflate_keeps_the_latest_message_of_a_key():
+    buffer = MessageBuffer(QueueLimit(max_messages=2, policy='conflate',
+                                      conflate_key=lambda msg: msg.get_parsed_content()['symbol']))
+    for offset, symbol in [(1, 'a'), (2, 'b'), (3, 'a'), (4, 'c')]:
+        buffer.append(create_msg(offset, content={'symbol': symbol}))
+    # 3 replaces 1, c has no buffered message and drops the oldest
+    assert offsets(buffer) == [3, 4]
+    metrics = buffer.metrics()
+    assert (metrics['conflated'], metrics['dropped']) == (1, 1)
+
+
+def test_spill_keeps_order_until_drained(tmp_path):
+    buffer = MessageBuffer(QueueLimit(max_messages=2, policy='spill', spill_dir=str(tmp_path)))
+    buffer.extend([create_msg(offset) for offset in range(1, 6)])
+    assert len(buffer) == 5
+    assert buffer.metrics()['spilled_messages'] == 3
+    assert [msg.offset for msg in buffer.drain()] == [1, 2, 3, 4, 5]
+    assert len(buffer) == 0
+    buffer.append(create_msg(6))
+    assert offsets(buffer) == [6]
+
+
+def test_budget_is_shared():
+    budget = BufferBudget(max_messages=3)
+    first = MessageBuffer(None, budget)
+    second = MessageBuffer(QueueLimit(policy='drop_newest'), budget)
+    first.extend([create_msg(1), create_msg(2)])
+    second.extend([create_msg(3), create_msg(4)])
+    assert (offsets(first), offsets(second)) == ([1, 2], [3])
+    first.append(create_msg(5))
+    assert offsets(first) == [2, 5]
+    first.drain()
+    assert budget.messages == 1
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        QueueLimit(max_messages=0)
+    with pytest.raises(ValueError):
+        QueueLimit(policy='conflate')
+    with pytest.raises(ValueError):
+        Subscription('stream', 0, 'api_key', lambda content, msg: None, queue_limit=QueueLimit(policy='block'))
+    with pytest.raises(ValueError):
+        ThreadExecutor(limit=QueueLimit(max_messages=1, policy='spill'))
+    with pytest.raises(ValueError):
+        Subscription('stream', 0, 'api_key', lambda content, msg: None, delivery_limit=QueueLimit(max_messages=1))
+
+
+def test_block_waits_for_the_consumer():
+    release = threading.Event()
+    received = []
+
+    def callback(content, msg):
+        release.wait()
+        received.append(msg.offset)
+
+    sub = Subscription('stream', 0, 'api_key', callback, executor='thread',
+                       delivery_limit=QueueLimit(max_messages=2))
+
+    def reader():
+        for offset in range(1, 6):
+            sub.handle_message(create_msg(offset, offset - 1 if offset > 1 else None))
+    thread = threading.Thread(target=reader)
+    thread.start()
+    time.sleep(0.2)
+    assert thread.is_alive()
+    release.set()
+    thread.join(5)
+    sub.close()
+    sub.executor.thread.join(5)
+    assert received == [1, 2, 3, 4, 5]
+    metrics = sub.queue_metrics()['delivery']
+    assert metrics['blocked'] >= 1 and metrics['dropped'] == 0
+
+
+def test_dropped_queue_messages_are_resent_as_a_gap():
+    received = []
+    gaps = []
+    sub = Subscription('stream', 0, 'api_key', lambda content, msg: received.append(msg.offset),
+                       queue_limit=QueueLimit(max_messages=2))
+    sub.on(EventConstant.GAP, lambda from_, to_: gaps.append((from_, to_)))
+    sub.handle_message(create_msg(1))
+    sub.set_resending(True)
+    for offset in range(2, 6):
+        sub.handle_message(create_msg(offset, offset - 1))
+    assert offsets(sub.queue) == [4, 5]
+    sub.emit(EventConstant.RESENT)
+    assert gaps[0] == (2, 3)
+    assert sub.queue_metrics()['queue']['dropped'] == 2
+
+
+def test_removed_subscription_frees_the_budget():
+    budget = BufferBudget(max_messages=2)
+    closed = Subscription('stream', 0, 'api_key', lambda content, msg: None, budget=budget)
+    unsubscribed = Subscription('stream', 1, 'api_key', lambda content, msg: None, budget=budget)
+    for sub in (closed, unsubscribed):
+        sub.handle_message(create_msg(1))
+        sub.set_resending(True)
+        sub.handle_message(create_msg(2, 1))
+    assert budget.messages == 2
+    closed.close()
+    unsubscribed.emit(EventConstant.UNSUBSCRIBED)
+    assert budget.messages == 0
+    assert len(closed.queue) == 0 and len(unsubscribed.queue) == 0
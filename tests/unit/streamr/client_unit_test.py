@@ -180,3 +180,36 @@ def test_subscribe_and_unsubscribe():
     assert len(cli.sub_by_sub_id) == 0
 
     cli.disconnect()
+
+
+def test_keep_raw_frame_follows_raw_subscriptions():
+    cli, conn = init()
+    cli.connect()
+
+    conn.expect(SubscribeRequest('stream1', api_key=cli.option.api_key, session_token=cli.session_token))
+    conn.expect(SubscribeRequest('stream2', api_key=cli.option.api_key, session_token=cli.session_token))
+    raw_sub = cli.subscribe('stream1', lambda frame, msg: None, raw=True)
+    sub = cli.subscribe('stream2', lambda content, msg: None)
+    conn.check()
+    assert conn.keep_raw_frame is True
+
+    cli.unsubscribe(sub)
+    assert conn.keep_raw_frame is True
+    cli.unsubscribe(raw_sub)
+    assert conn.keep_raw_frame is False
+
+    cli.disconnect()
+
+
+def test_disconnect_closes_subscriptions():
+    cli, conn = init()
+    cli.connect()
+
+    conn.expect(SubscribeRequest('stream1', api_key=cli.option.api_key, session_token=cli.session_token))
+    sub = cli.subscribe('stream1', lambda content, msg: None, executor='thread')
+    conn.check()
+
+    cli.disconnect()
+    sub.executor.thread.join(5)
+    assert not sub.executor.thread.is_alive()
+    assert len(cli.sub_by_sub_id) == 0
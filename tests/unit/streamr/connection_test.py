@@ -0,0 +1,210 @@
+"""
+test connection against a local stand-in server
+"""
+
+
+import io
+import json
+import threading
+
+import pytest
+from websocket._abnf import ABNF
+
+from streamr.client.connection import Connection
+from streamr.util.option import Option
+from streamr.util.constant import EventConstant
+from streamr.protocol.request import SubscribeRequest, PublishRequest
+from streamr.protocol.response import BroadcastMessage, SubscribeResponse
+from streamr.protocol.util.codec import available_codecs
+from streamr.protocol.payload import StreamMessage
+
+from stand_in_server import StandInServer
+
+
+def exchange(server, wire_format, request=None):
+    """
+    connect, subscribe and publish one message
+    :param server: StandInServer
+    :param wire_format: None or name of a binary codec
+    :param request: PublishRequest to send instead of a json one
+    :return: (connection, received BroadcastMessage)
+    """
+    conn = Connection(Option(url=server.url, wire_format=wire_format))
+    connected = threading.Event()
+    subscribed = threading.Event()
+    received = []
+    conn.on(EventConstant.CONNECTED, connected.set)
+    conn.on('SubscribeResponse', lambda _: subscribed.set())
+    conn.on('BroadcastMessage', received.append)
+
+    conn.connect()
+    try:
+        assert connected.wait(5)
+        conn.send(SubscribeRequest('stream_id', 0, 'api_key', 'session_token'))
+        assert subscribed.wait(5)
+        conn.send(request or PublishRequest('stream_id', 'api_key', 'session_token', {'foo': 'bar'}, 1533924184016))
+        for _ in range(50):
+            if received:
+                break
+            threading.Event().wait(0.1)
+    finally:
+        conn.disconnect()
+    assert len(received) == 1
+    return conn, received[0]
+
+
+def test_json_wire_format():
+    server = StandInServer()
+    try:
+        conn, msg = exchange(server, None)
+        assert conn.wire_codec is None
+        assert server.received_opcodes == [ABNF.OPCODE_TEXT, ABNF.OPCODE_TEXT]
+        assert isinstance(msg, BroadcastMessage)
+        assert msg.payload.get_parsed_content() == {'foo': 'bar'}
+    finally:
+        server.close()
+
+
+@pytest.mark.skipif('msgpack' not in available_codecs(True), reason='msgpack is not installed')
+def test_msgpack_wire_format():
+    server = StandInServer()
+    try:
+        conn, msg = exchange(server, 'msgpack')
+        assert conn.wire_codec.NAME == 'msgpack'
+        assert server.received_opcodes == [ABNF.OPCODE_BINARY, ABNF.OPCODE_BINARY]
+        assert isinstance(msg, BroadcastMessage)
+        assert msg.payload.content == {'foo': 'bar'}
+        assert msg.payload.get_parsed_content() == {'foo': 'bar'}
+    finally:
+        server.close()
+
+
+@pytest.mark.skipif('msgpack' not in available_codecs(True), reason='msgpack is not installed')
+def test_msgpack_refused_by_server():
+    server = StandInServer(accept_binary=False)
+    try:
+        conn, msg = exchange(server, 'msgpack')
+        assert conn.wire_codec is None
+        assert server.received_opcodes == [ABNF.OPCODE_TEXT, ABNF.OPCODE_TEXT]
+        assert msg.payload.get_parsed_content() == {'foo': 'bar'}
+    finally:
+        server.close()
+
+
+@pytest.mark.parametrize('wire_format', [None, 'msgpack'])
+def test_raw_content(wire_format):
+    if wire_format is not None and wire_format not in available_codecs(True):
+        pytest.skip('%s is not installed' % wire_format)
+    server = StandInServer()
+    try:
+        request = PublishRequest('stream_id', 'api_key', 'session_token', b'\x00\xffraw',
+                                 content_type=StreamMessage.ContentType.RAW)
+        _, msg = exchange(server, wire_format, request)
+        assert msg.payload.content_type == StreamMessage.ContentType.RAW
+        assert msg.payload.get_parsed_content() == b'\x00\xffraw'
+        if wire_format is not None:
+            assert msg.payload.content == b'\x00\xffraw'
+    finally:
+        server.close()
+
+
+def test_wire_format_must_be_binary():
+    with pytest.raises(ValueError):
+        Connection(Option(url='ws://127.0.0.1:1', wire_format='orjson'))
+
+
+def test_collect_payloads():
+    conn = Connection(Option(url='ws://127.0.0.1:1'))
+    received = []
+    conn.on('UnicastMessage', received.append)
+    conn.on('BroadcastMessage', received.append)
+
+    frame = [0, 1, 'sub_id', [28, 'stream_id', 0, 1529549961116, 0, 2, 1, 27, '{}']]
+    conn.collect_payloads('sub_id')
+    conn.socket.on_message(conn.socket, json.dumps(frame))
+    conn.socket.on_message(conn.socket, json.dumps([0, 0, None, frame[3]]))
+    assert conn.pop_payloads('sub_id') == [frame[3]]
+    assert len(received) == 1
+
+    conn.socket.on_message(conn.socket, json.dumps(frame))
+    assert len(received) == 2
+    assert conn.pop_payloads('sub_id') == []
+
+
+def test_other_frames_keep_the_fast_path_while_collecting():
+    conn = Connection(Option(url='ws://127.0.0.1:1', content_slice=True))
+    received = []
+    conn.on('UnicastMessage', received.append)
+    conn.on('BroadcastMessage', received.append)
+
+    payload = [28, 'stream_id', 0, 1529549961116, 0, 2, 1, 27, '{"a": 1}']
+    conn.collect_payloads('sub_id')
+    conn.socket.on_message(conn.socket, json.dumps([0, 0, None, payload]))
+    conn.socket.on_message(conn.socket, json.dumps([0, 1, 'other_sub_id', payload]))
+    conn.socket.on_message(conn.socket, json.dumps([0, 1, 'sub_id', payload]))
+    assert [msg.payload.get_content_slice() is not None for msg in received] == [True, True]
+    assert conn.pop_payloads('sub_id') == [payload]
+
+
+def test_frame_filter():
+    conn = Connection(Option(url='ws://127.0.0.1:1'))
+    received = []
+    conn.on('BroadcastMessage', received.append)
+    conn.frame_filter = lambda response_type, sub_id, stream_id, partition, offset, previous_offset: offset <= 2
+
+    for offset in (1, 2, 3):
+        frame = [0, 0, None, [28, 'stream_id', 0, 1529549961116, 0, offset, offset - 1, 27, '{}']]
+        conn.socket.on_message(conn.socket, json.dumps(frame))
+    conn.socket.on_message(conn.socket, json.dumps([0, 2, None, {'stream': 'stream_id', 'partition': 0}]))
+
+    assert [msg.payload.offset for msg in received] == [3]
+    assert conn.decode_stats.received == 4
+    assert conn.decode_stats.peeked == 3
+    assert conn.decode_stats.skipped == 2
+    assert conn.decode_stats.skipped_bytes > 0
+
+
+def test_keep_raw_frame():
+    conn = Connection(Option(url='ws://127.0.0.1:1'))
+    received = []
+    conn.on('BroadcastMessage', received.append)
+
+    frame = json.dumps([0, 0, None, [28, 'stream_id', 0, 1529549961116, 0, 1, None, 27, '{}']])
+    conn.socket.on_message(conn.socket, frame)
+    conn.keep_raw_frame = True
+    conn.socket.on_message(conn.socket, frame)
+
+    assert received[0].payload.raw_frame is None
+    assert received[1].payload.raw_frame is frame
+    assert received[0].payload == received[1].payload
+
+
+def test_dispatch_by_response_type():
+    conn = Connection(Option(url='ws://127.0.0.1:1'))
+    received = []
+    once = []
+    conn.on('SubscribeResponse', received.append)
+    conn.once('SubscribeResponse', once.append)
+    assert len(conn.handlers_by_response_type[SubscribeResponse.TYPE]) == 2
+
+    frame = json.dumps([0, 2, None, {'stream': 'stream_id', 'partition': 0}])
+    conn.socket.on_message(conn.socket, frame)
+    conn.socket.on_message(conn.socket, frame)
+    assert len(received) == 2
+    assert len(once) == 1
+
+    conn.off('SubscribeResponse', received.append)
+    assert conn.handlers_by_response_type[SubscribeResponse.TYPE] == ()
+    conn.socket.on_message(conn.socket, frame)
+    assert len(received) == 2
+
+
+def test_replay():
+    conn = Connection(Option(url='ws://127.0.0.1:1'))
+    received = []
+    conn.on('BroadcastMessage', received.append)
+
+    frames = [json.dumps([0, 0, None, [28, 'stream_id', 0, 1529549961116, 0, offset, offset - 1, 27, '{}']])
+              for offset in (1, 2, 3)]
+    assert conn.replay(io.StringIO('\n'.join(frames)), 16) == 3
+    assert [msg.payload.offset for msg in received] == [1, 2, 3]
@@ -0,0 +1,79 @@
+"""
+test event
+"""
+
+
+import threading
+
+from streamr.client.event import Event
+
+
+def test_on_off_emit():
+    event = Event()
+    received = []
+    event.on('name', received.append)
+    event.on('name', received.append)
+    event.emit('name', 1)
+    assert received == [1]
+
+    event.off('name', received.append)
+    event.off('name', received.append)
+    event.emit('name', 2)
+    event.emit('other', 3)
+    assert received == [1]
+
+
+def test_once():
+    event = Event()
+    received = []
+    event.on('name', lambda x: received.append(('on', x)))
+    event.once('name', lambda x: received.append(('once', x)))
+    event.emit('name', 1)
+    event.emit('name', 2)
+    assert received == [('on', 1), ('once', 1), ('on', 2)]
+
+
+def test_listener_changes_during_emit():
+    event = Event()
+    received = []
+
+    def first(x):
+        received.append(('first', x))
+        event.off('name', second)
+        event.on('name', third)
+        event.once('name', third)
+
+    def second(x):
+        received.append(('second', x))
+
+    def third(x):
+        received.append(('third', x))
+
+    event.on('name', first)
+    event.on('name', second)
+    event.emit('name', 1)
+    assert received == [('first', 1), ('second', 1)]
+    del received[:]
+    event.emit('name', 2)
+    assert received == [('first', 2), ('third', 2), ('third', 2)]
+    assert event.handlers('name') == (first, third)
+
+
+def test_listener_added_by_another_thread_during_emit():
+    event = Event()
+    received = []
+
+    def first(x):
+        received.append(('first', x))
+        thread = threading.Thread(target=event.on, args=('name', second))
+        thread.start()
+        thread.join()
+
+    def second(x):
+        received.append(('second', x))
+
+    event.on('name', first)
+    event.emit('name', 1)
+    assert event.handlers('name') == (first, second)
+    event.emit('name', 2)
+    assert received == [('first', 1), ('first', 2), ('second', 2)]
@@ -0,0 +1,155 @@
+"""
+test the executors running subscription callbacks
+"""
+
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from streamr.client.buffer import BufferBudget
+from streamr.client.executor import ThreadExecutor, OrderedPoolExecutor, ShardedExecutor, get_executor
+from streamr.client.subscription import Subscription
+from streamr.protocol.payload import StreamMessage
+from streamr.util.constant import EventConstant
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+def test_thread_executor_keeps_order():
+    executor = ThreadExecutor()
+    received = []
+    for i in range(100):
+        executor.submit('key', received.append, i)
+    executor.shutdown()
+    assert received == list(range(100))
+    assert not executor.thread.is_alive()
+
+
+def test_ordered_pool_executor_keeps_order_per_key():
+    executor = OrderedPoolExecutor(4)
+    received = {key: [] for key in range(8)}
+
+    def task(key, i):
+        if i % 10 == 0:
+            time.sleep(0.001)
+        received[key].append(i)
+
+    for i in range(200):
+        for key in received:
+            executor.submit(key, task, key, i)
+    executor.shutdown()
+    assert all(values == list(range(200)) for values in received.values())
+    assert executor.qsize() == 0
+
+
+def test_sharded_executor():
+    executor = ShardedExecutor(3, max_queue=2)
+    release = threading.Event()
+    received = []
+    key = ('stream_id', 0)
+    executor.submit(key, release.wait)
+    executor.submit(key, received.append, 1)
+    executor.submit(key, received.append, 2)
+    assert wait_for(lambda: executor.shard(key).qsize() == 2)
+    assert sorted(executor.queue_depths()) == [0, 0, 2]
+
+    blocked = threading.Thread(target=executor.submit, args=(key, received.append, 3))
+    blocked.start()
+    blocked.join(0.05)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join()
+    executor.shutdown()
+    assert received == [1, 2, 3]
+    assert executor.qsize() == 0
+
+
+def test_failing_task_does_not_stop_executor():
+    executor = ThreadExecutor()
+    received = []
+    executor.submit('key', lambda: 1 / 0)
+    executor.submit('key', received.append, 1)
+    executor.shutdown()
+    assert received == [1]
+
+
+def test_get_executor():
+    assert get_executor(None) == (None, False)
+    assert get_executor('inline') == (None, False)
+    executor, owned = get_executor('thread')
+    assert isinstance(executor, ThreadExecutor) and owned
+    executor.shutdown()
+    pool = ThreadPoolExecutor(2)
+    executor, owned = get_executor(pool)
+    assert isinstance(executor, OrderedPoolExecutor) and executor.executor is pool and not owned
+    pool.shutdown()
+    with pytest.raises(ValueError):
+        get_executor('process')
+
+
+def test_subscription_delivers_on_executor():
+    reader = threading.current_thread()
+    received = []
+
+    def callback(content, msg):
+        assert threading.current_thread() is not reader
+        received.append((content, msg.offset))
+
+    sub = Subscription('stream_id', 0, 'api_key', callback, executor='thread')
+    for offset in range(1, 51):
+        msg = StreamMessage('stream_id', 0, offset, 0, offset, offset - 1 if offset > 1 else None,
+                            StreamMessage.ContentType.JSON, '{"i": %d}' % offset)
+        sub.handle_message(msg)
+    assert sub.last_received_offset == 50
+    assert wait_for(lambda: len(received) == 50)
+    assert received == [({'i': offset}, offset) for offset in range(1, 51)]
+    sub.close()
+    assert sub.owns_executor is False
+
+
+def test_invalid_json_on_executor_keeps_offsets():
+    release = threading.Event()
+    errors = []
+    gaps = []
+    received = []
+
+    def callback(content, msg):
+        received.append(msg.offset)
+
+    sub = Subscription('stream_id', 0, 'api_key', callback, executor='thread')
+    sub.on(EventConstant.ERROR, lambda e: errors.append(e))
+    sub.on(EventConstant.GAP, lambda from_, to_: gaps.append((from_, to_)))
+    # hold the worker until the reader has accepted the following messages
+    sub.executor.submit(sub.key, release.wait)
+    contents = ['{invalid', '{"i": 2}', '{"i": 3}']
+    for offset, content in enumerate(contents, 1):
+        sub.handle_message(StreamMessage('stream_id', 0, offset, 0, offset, offset - 1 if offset > 1 else None,
+                                         StreamMessage.ContentType.JSON, content))
+    release.set()
+    assert wait_for(lambda: received == [2, 3])
+    assert len(errors) == 1 and errors[0].stream_message.offset == 1
+    assert sub.last_received_offset == 3
+    sub.handle_message(StreamMessage('stream_id', 0, 4, 0, 4, 3, StreamMessage.ContentType.JSON, '{"i": 4}'))
+    assert wait_for(lambda: received == [2, 3, 4])
+    assert gaps == []
+    sub.close()
+
+
+def test_sharded_executor_counts_in_budget():
+    budget = BufferBudget(max_messages=10)
+    executor = ShardedExecutor(2, budget=budget)
+    release = threading.Event()
+    executor.submit('key', release.wait)
+    executor.submit('key', lambda: None)
+    assert wait_for(lambda: budget.messages == 1)
+    release.set()
+    executor.shutdown()
+    assert budget.messages == 0
@@ -0,0 +1,97 @@
+"""
+test the history kept by a subscription for local replay
+"""
+
+
+import pytest
+
+from streamr.client.history import MessageHistory
+from streamr.client.subscription import Subscription
+from streamr.protocol.payload import StreamMessage
+from streamr.util.option import Option
+from streamr.util.constant import EventConstant
+
+
+def create_msg(offset, previous_offset, content='{"a": 1}'):
+    return StreamMessage('stream_id', 0, 1000 + offset, 0, offset, previous_offset,
+                         StreamMessage.ContentType.JSON, content)
+
+
+def filled(offsets, max_messages=10, max_bytes=None):
+    history = MessageHistory(max_messages, max_bytes)
+    previous = None
+    for offset in offsets:
+        history.append(create_msg(offset, previous))
+        previous = offset
+    return history
+
+
+def test_bounds():
+    history = filled(range(1, 6), max_messages=3)
+    assert [msg.offset for msg in history.messages] == [3, 4, 5]
+
+    history = filled(range(1, 6), max_bytes=20)
+    assert [msg.offset for msg in history.messages] == [4, 5]
+    assert history.bytes == 16
+
+    with pytest.raises(ValueError):
+        MessageHistory(0)
+
+
+def test_split_resend_last():
+    history = filled(range(1, 6))
+    local, remaining = history.split_resend(Option(resend_last=2))
+    assert [msg.offset for msg in local] == [4, 5] and remaining is None
+    option = Option(resend_last=6)
+    assert history.split_resend(option) == ([], option)
+
+
+def test_split_resend_from():
+    history = filled(range(3, 6), max_messages=3)
+    local, remaining = history.split_resend(Option(resend_from=4))
+    assert [msg.offset for msg in local] == [4, 5] and remaining is None
+
+    history = filled(range(1, 6), max_messages=3)
+    local, remaining = history.split_resend(Option(resend_from=1))
+    assert [msg.offset for msg in local] == [3, 4, 5]
+    assert remaining == Option(resend_from=1, resend_to=2)
+
+
+def test_split_resend_from_time():
+    history = filled(range(3, 6), max_messages=3)
+    local, remaining = history.split_resend(Option(resend_from_time=1004))
+    assert [msg.offset for msg in local] == [4, 5] and remaining is None
+
+    # earlier messages with the first timestamp may be missing from the buffer
+    for resend_from_time in (1003, 1002):
+        option = Option(resend_from_time=resend_from_time)
+        assert history.split_resend(option) == ([], option)
+
+
+def test_split_resend_all():
+    local, remaining = filled(range(1, 4)).split_resend(Option(resend_all=True))
+    assert [msg.offset for msg in local] == [1, 2, 3] and remaining is None
+
+    local, remaining = filled(range(1, 6), max_messages=2).split_resend(Option(resend_all=True))
+    assert [msg.offset for msg in local] == [4, 5]
+    assert remaining == Option(resend_from=0, resend_to=3)
+
+    option = Option(resend_from=1, resend_to=3)
+    assert filled(range(1, 4)).split_resend(option) == ([], option)
+
+    option = Option(resend_all=False)
+    assert filled(range(1, 4)).split_resend(option) == ([], option)
+
+
+def test_replay_history():
+    received = []
+    events = []
+    sub = Subscription('stream_id', 0, 'api_key', lambda content, msg: received.append(msg.offset),
+                       history=MessageHistory(5))
+    sub.on(EventConstant.RESENT, lambda: events.append(EventConstant.RESENT))
+    history = filled(range(1, 4))
+    sub.replay_history(list(history.messages))
+    assert received == [1, 2, 3]
+    assert events == [EventConstant.RESENT]
+    assert sub.resending is False
+    assert [msg.offset for msg in sub.history.messages] == [1, 2, 3]
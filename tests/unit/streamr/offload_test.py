@@ -0,0 +1,63 @@
+"""
+test decoding messages and running a callback in worker processes
+"""
+
+
+import json
+import time
+
+import pytest
+
+pytest.importorskip('multiprocessing.shared_memory')
+
+from streamr.client.offload import ProcessOffload  # noqa: E402
+from streamr.client.subscription import Subscription  # noqa: E402
+from streamr.protocol.batch import MessageBatch  # noqa: E402
+from streamr.protocol.response import Response  # noqa: E402
+
+
+def double(content, msg):
+    """
+    callback run in the workers
+    :param content: parsed content
+    :param msg: StreamMessage
+    :return: (offset, doubled value)
+    """
+    return msg.offset, content['value'] * 2
+
+
+def frame(offset, previous_offset):
+    return json.dumps([0, 0, None, [28, 'stream_id', 0, 1529549961116, 0, offset, previous_offset,
+                                    27, json.dumps({'value': offset})]])
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_offload_keeps_bookkeeping_and_result_order():
+    results = []
+    offload = ProcessOffload(double, processes=2, result_callback=results.extend, batch_size=3)
+    sub = Subscription('stream_id', 0, 'api_key', batch_callback=offload.submit, offload=offload)
+    messages = []
+    for offset in [1, 2, 2, 3, 4, 5, 6, 7]:
+        raw_frame = frame(offset, offset - 1 if offset > 1 else None)
+        msg = Response.deserialize(raw_frame, True).payload
+        msg.raw_frame = raw_frame
+        sub.handle_message(msg)
+        messages.append(msg)
+    payloads = [[28, 'stream_id', 0, 1529549961116, 0, offset, offset - 1, 27, json.dumps({'value': offset})]
+                for offset in (8, 9)]
+    sub.handle_batch(MessageBatch.from_payloads(payloads), True)
+    sub.close()
+    assert sub.offload is None
+    assert wait_for(lambda: offload.pending() == 0)
+    assert sub.last_received_offset == 9
+    assert offload.shipped_frames == 9
+    assert offload.shipped_batches == 3
+    assert results == [(offset, offset * 2) for offset in range(1, 10)]
+    # the contents were only unescaped in the workers
+    assert all(msg.get_content_slice() is not None for msg in messages)
@@ -0,0 +1,189 @@
+"""
+a local stand-in for the streamr websocket api
+
+it accepts one client at a time, negotiates the json or msgpack wire format
+through the websocket subprotocol, answers subscribe requests and
+broadcasts every published message back to the client
+"""
+
+
+import base64
+import hashlib
+import socket
+import struct
+import threading
+
+from websocket._abnf import ABNF
+
+from streamr.util.constant import WireConstant
+from streamr.protocol.request import Request, PublishRequest, SubscribeRequest
+from streamr.protocol.response import SubscribeResponse, BroadcastMessage
+from streamr.protocol.payload import StreamMessage
+from streamr.protocol.util.codec import get_codec
+
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class StandInServer:
+    """
+    minimal websocket server speaking the streamr protocol
+    """
+
+    def __init__(self, accept_binary=True):
+        self.accept_binary = accept_binary
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(1)
+        self.url = 'ws://127.0.0.1:%d/api/v1/ws' % self.sock.getsockname()[1]
+        self.received_opcodes = []
+        self.requests = []
+        self.offset = 0
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """
+        stop listening
+        :return: None
+        """
+        self.sock.close()
+
+    def serve(self):
+        """
+        serve clients until the server socket is closed
+        :return: None
+        """
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                self.handle(conn)
+            except (OSError, ConnectionError):
+                pass
+            finally:
+                conn.close()
+
+    def handle(self, conn):
+        """
+        handshake and answer the requests of one client
+        :param conn: socket
+        :return: None
+        """
+        codec = self.handshake(conn)
+        while True:
+            opcode, data = self.read_frame(conn)
+            if opcode is None or opcode == ABNF.OPCODE_CLOSE:
+                return
+            self.received_opcodes.append(opcode)
+            request = Request.deserialize(codec.loads(data))
+            self.requests.append(request)
+            for response in self.respond(request):
+                if codec.BINARY:
+                    self.write_frame(conn, ABNF.OPCODE_BINARY, response.serialize(codec=codec))
+                else:
+                    self.write_frame(conn, ABNF.OPCODE_TEXT, response.serialize().encode('utf-8'))
+
+    def respond(self, request):
+        """
+        build the responses to a request
+        :param request: Request
+        :return: list of Response
+        """
+        if isinstance(request, SubscribeRequest):
+            return [SubscribeResponse(request.stream_id, request.stream_partition)]
+        if isinstance(request, PublishRequest):
+            self.offset += 1
+            content = request.get_serialized_content() \
+                if request.content_type == StreamMessage.ContentType.JSON else request.content
+            payload = StreamMessage(request.stream_id, 0, request.get_timestamp_as_number() or 0, 0,
+                                    self.offset, self.offset - 1 if self.offset > 1 else None,
+                                    request.content_type, content)
+            return [BroadcastMessage(payload)]
+        return []
+
+    def handshake(self, conn):
+        """
+        answer the http upgrade request and pick the wire format
+        :param conn: socket
+        :return: codec of the negotiated wire format
+        """
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError('client closed during handshake')
+            request += chunk
+        headers = {}
+        for line in request.decode('utf-8').split('\r\n')[1:]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(hashlib.sha1(
+            (headers['sec-websocket-key'] + GUID).encode('utf-8')).digest()).decode('utf-8')
+        response = ['HTTP/1.1 101 Switching Protocols', 'Upgrade: websocket',
+                    'Connection: Upgrade', 'Sec-WebSocket-Accept: %s' % accept]
+
+        codec = get_codec('json')
+        offered = [p.strip() for p in headers.get('sec-websocket-protocol', '').split(',') if p.strip()]
+        if offered:
+            chosen = WireConstant.SUBPROTOCOL_BY_WIRE_FORMAT[WireConstant.JSON]
+            for wire_format, name in WireConstant.SUBPROTOCOL_BY_WIRE_FORMAT.items():
+                if name in offered and wire_format != WireConstant.JSON and self.accept_binary:
+                    chosen = name
+                    codec = get_codec(wire_format)
+                    break
+            response.append('Sec-WebSocket-Protocol: %s' % chosen)
+
+        conn.sendall(('\r\n'.join(response) + '\r\n\r\n').encode('utf-8'))
+        return codec
+
+    @staticmethod
+    def recv_exactly(conn, length):
+        """
+        read exactly length bytes
+        :param conn: socket
+        :param length: int
+        :return: bytes or None if the client closed the socket
+        """
+        data = b''
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def read_frame(self, conn):
+        """
+        read one masked client frame
+        :param conn: socket
+        :return: (opcode, payload bytes)
+        """
+        header = self.recv_exactly(conn, 2)
+        if header is None:
+            return None, None
+        opcode = header[0] & 0x0f
+        length = header[1] & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', self.recv_exactly(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.recv_exactly(conn, 8))[0]
+        mask_key = self.recv_exactly(conn, 4)
+        data = self.recv_exactly(conn, length)
+        return opcode, ABNF.mask(mask_key, data)
+
+    @staticmethod
+    def write_frame(conn, opcode, data):
+        """
+        write one unmasked server frame
+        :param conn: socket
+        :param opcode: ABNF opcode
+        :param data: bytes
+        :return: None
+        """
+        conn.sendall(ABNF(1, 0, 0, 0, opcode, 0, data).format())
@@ -3,9 +3,15 @@ test subscription
 """
 
 
+import threading
+import time
+
+import pytest
+
 from streamr.client.subscription import Subscription
 from streamr.protocol.payload import StreamMessage
-import time
+from streamr.protocol.response import BroadcastMessage
+from streamr.protocol.batch import MessageBatch
 
 from streamr.util.option import Option
 from streamr.util.constant import EventConstant
@@ -472,3 +478,186 @@ def test_event_handling_no_resent():
     assert count == 1
 
 
+def test_invalid_json_content_is_parsed_lazily():
+    count = 0
+    errors = []
+
+    def callback(_, __):
+        nonlocal count
+        count += 1
+
+    sub = Subscription(stream_id, stream_partition, 'api_key', callback)
+    sub.on(EventConstant.ERROR, errors.append)
+
+    msg1 = create_msg(1, None, '{"invalid\njson"}')
+    msg2 = create_msg(2, 1)
+    assert msg1.parsed_content is None
+
+    sub.handle_message(msg1)
+    assert count == 0
+    assert len(errors) == 1
+    assert isinstance(errors[0], InvalidJsonError)
+    assert sub.last_received_offset == 1
+
+    sub.handle_message(msg2)
+    assert count == 1
+
+
+def test_handle_resend_batch():
+    np = pytest.importorskip('numpy')
+    from streamr.protocol.columnar import ColumnarMessages
+
+    batches = []
+    sub = Subscription(stream_id, stream_partition, 'api_key', lambda _, __: None,
+                       resend_batch_callback=batches.append)
+    sub.handle_message(create_msg(2, 1))
+
+    payloads = [[28, stream_id, 0, 0, 0, offset, offset - 1, StreamMessage.ContentType.JSON, '{}']
+                for offset in (1, 2, 3, 4)]
+    sub.handle_resend_batch(ColumnarMessages.from_payloads(payloads))
+
+    assert len(batches) == 1
+    assert batches[0].offset.tolist() == [3, 4]
+    assert isinstance(batches[0].offset, np.ndarray)
+    assert sub.last_received_offset == 4
+
+
+def test_resend_batch_gap_is_asked_again():
+    pytest.importorskip('numpy')
+    from streamr.protocol.columnar import ColumnarMessages
+
+    batches = []
+    gaps = []
+    done = []
+    sub = Subscription(stream_id, stream_partition, 'api_key', lambda _, __: None,
+                       resend_batch_callback=batches.append)
+    sub.on(EventConstant.GAP, lambda from_, to_: gaps.append((from_, to_)))
+    sub.on(EventConstant.DONE, lambda: done.append(True))
+
+    def payloads(offsets, last=None):
+        return [[28, stream_id, 0, 0, 0, offset, offset - 1, StreamMessage.ContentType.JSON,
+                 '{"_bye": true}' if offset == last else '{}'] for offset in offsets]
+
+    sub.set_resending(True)
+    sub.handle_resend_batch(ColumnarMessages.from_payloads(payloads([1, 2, 5, 6])))
+    assert batches[-1].offset.tolist() == [1, 2]
+    assert sub.last_received_offset == 2
+    sub.emit(EventConstant.RESENT)
+    assert gaps == [(3, 6)]
+
+    # the storage still misses 4, the messages are taken as they are
+    sub.set_resending(True)
+    sub.handle_resend_batch(ColumnarMessages.from_payloads(payloads([3, 5, 6], last=6)))
+    assert batches[-1].offset.tolist() == [3, 5, 6]
+    assert done == [True]
+    sub.emit(EventConstant.RESENT)
+    assert gaps == [(3, 6)]
+
+
+def test_resent_message_batch_gap_is_asked_again():
+    batches = []
+    gaps = []
+    sub = Subscription(stream_id, stream_partition, 'api_key', batch_callback=batches.append)
+
+    def gap_handler(from_, to_):
+        # the client asks the gap, the queue waits for its resend
+        gaps.append((from_, to_))
+        sub.set_resending(True)
+    sub.on(EventConstant.GAP, gap_handler)
+    sub.set_resending(True)
+    sub.handle_batch(MessageBatch.from_messages([create_msg(1, None), create_msg(2, 1), create_msg(5, 4)]), True)
+    sub.handle_message(create_msg(6, 5))
+    assert batches[-1].offsets == [1, 2]
+    sub.emit(EventConstant.RESENT)
+    assert gaps == [(3, 5)]
+    assert sub.last_received_offset == 2
+    assert [msg.offset for msg in sub.queue] == [6]
+
+
+def test_is_duplicate():
+    sub = Subscription(stream_id, stream_partition, 'api_key', lambda _, __: None)
+    assert sub.is_duplicate(1, None) is False
+
+    sub.handle_message(create_msg(2, 1))
+    assert sub.is_duplicate(2, 1) is True
+    assert sub.is_duplicate(1, None, True) is True
+    assert sub.is_duplicate(3, 2) is False
+    # a gap has to reach handle_message to be detected
+    assert sub.is_duplicate(2, 5) is False
+
+    sub.set_resending(True)
+    assert sub.is_duplicate(2, 1) is False
+    assert sub.is_duplicate(2, 1, True) is True
+
+
+def test_raw_subscription():
+    received = []
+    done = []
+    sub = Subscription(stream_id, stream_partition, 'api_key', lambda frame, msg: received.append(frame), raw=True)
+    sub.on(EventConstant.DONE, lambda: done.append(True))
+
+    msg = create_msg(1, None, '{"foo": "bar"}')
+    msg.raw_frame = '[0,0,null,[28,"stream_id",0,0,0,1,null,27,"{\\"foo\\": \\"bar\\"}"]]'
+    sub.handle_message(msg)
+    assert received == [msg.raw_frame]
+    assert msg.parsed_content is None
+
+    bye = create_msg(2, 1, '{"_bye": true}')
+    sub.handle_message(bye)
+    assert received[1] == BroadcastMessage(bye).serialize()
+    assert done == [True]
+
+
+def test_batch_callback():
+    batches = []
+    gaps = []
+    sub = Subscription(stream_id, stream_partition, 'api_key', batch_callback=batches.append)
+    sub.on(EventConstant.GAP, lambda from_, to_: gaps.append((from_, to_)))
+
+    sub.handle_message(create_msg(1, None))
+    sub.handle_message(create_msg(1, None))
+    assert [batch.offsets for batch in batches] == [[1]]
+
+    sub.handle_batch(MessageBatch.from_messages([create_msg(2, 1), create_msg(3, 2), create_msg(6, 5),
+                                                 create_msg(7, 6)]))
+    assert batches[-1].offsets == [2, 3]
+    assert gaps == [(4, 5)]
+    assert [msg.offset for msg in sub.queue] == [6, 7]
+
+    sub.set_resending(True)
+    sub.handle_batch(MessageBatch.from_messages([create_msg(4, 3), create_msg(5, 4)]), True)
+    sub.emit(EventConstant.RESENT)
+    assert [batch.offsets for batch in batches[-2:]] == [[4, 5], [6, 7]]
+    assert list(sub.queue) == []
+    assert sub.last_received_offset == 7
+
+
+def test_max_batch():
+    batches = []
+    done = threading.Event()
+
+    def batch_callback(batch):
+        batches.append(list(batch.offsets))
+        if batch.offsets[-1] == 7:
+            done.set()
+
+    sub = Subscription(stream_id, stream_partition, 'api_key', batch_callback=batch_callback,
+                       max_batch=3, max_delay_ms=20)
+    for offset in [1, 2, 5]:
+        sub.handle_message(create_msg(offset, offset - 1 if offset > 1 else None))
+    assert batches == []
+    assert [msg.offset for msg in sub.queue] == [5]
+
+    sub.set_resending(True)
+    sub.handle_batch(MessageBatch.from_messages([create_msg(3, 2), create_msg(4, 3)]), True)
+    assert batches == [[1, 2, 3]]
+    sub.set_resending(False)
+    sub.check_queue()
+    for offset in [6, 7]:
+        sub.handle_message(create_msg(offset, offset - 1))
+    assert batches == [[1, 2, 3], [4, 5, 6]]
+    assert done.wait(5)
+    assert batches == [[1, 2, 3], [4, 5, 6], [7]]
+
+    with pytest.raises(ValueError):
+        Subscription(stream_id, stream_partition, 'api_key', lambda content, msg: None, max_batch=3)
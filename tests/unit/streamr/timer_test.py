@@ -0,0 +1,21 @@
+"""
+test the timer service
+"""
+
+
+import threading
+
+from streamr.client.timer import TimerService
+
+
+def test_schedule_and_cancel():
+    timers = TimerService()
+    called = []
+    done = threading.Event()
+    timers.schedule(0.03, called.append, 'late')
+    cancelled = timers.schedule(0.01, called.append, 'cancelled')
+    timers.schedule(0.02, called.append, 'early')
+    timers.schedule(0.04, done.set)
+    timers.cancel(cancelled)
+    assert done.wait(5)
+    assert called == ['early', 'late']